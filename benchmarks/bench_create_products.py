@@ -0,0 +1,119 @@
+"""
+Benchmark large batch payloads for `POST /products/`.
+
+Measures duplicate-name validation in `ProductListCreateSchema` against the
+previous quadratic `names.count` implementation, then each stage of the
+`create_product` path: the `In(Product.name, names)` lookup, the
+`model_dump()` -> `Product(**dict)` construction, `insert_many` and the
+`ProductResponseSchema(**product.model_dump())` response, plus the whole
+request end to end through ASGI.
+
+The in-memory mongomock backend checks unique indexes with a linear scan, so
+its `insert_many` and end-to-end figures grow quadratically with batch size;
+use `--mongo-uri` against a local mongod for representative write timings.
+
+Usage:
+    python -m benchmarks.bench_create_products --sizes 1000,10000,50000
+    python -m benchmarks.bench_create_products --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.common import (
+    build_app,
+    init_benchmark_db,
+    make_products,
+    measure,
+    measure_async,
+)
+from beanie.odm.operators.find.comparison import In
+from httpx import ASGITransport, AsyncClient
+from models.products import Product
+from schemas.products import ProductListCreateSchema, ProductResponseSchema
+
+
+def quadratic_duplicates(payload: dict) -> set:
+    names = [p["name"] for p in payload["products"]]
+    return {name for name in names if names.count(name) > 1}
+
+
+async def bench_size(size: int, repeat: int, mongo_uri, reference_limit: int) -> dict:
+    payload = {"products": make_products(size)}
+    results = {"size": size}
+
+    results["validate"] = measure(
+        lambda: ProductListCreateSchema.model_validate(payload), repeat
+    )
+    if size <= reference_limit:
+        results["duplicates_quadratic_reference"] = measure(
+            lambda: quadratic_duplicates(payload), repeat
+        )
+
+    product_data = ProductListCreateSchema.model_validate(payload)
+    names = [product.name for product in product_data.products]
+
+    async def reset():
+        await init_benchmark_db(mongo_uri)
+
+    await reset()
+    results["existing_lookup"] = await measure_async(
+        lambda: Product.find(In(Product.name, names)).to_list(), repeat
+    )
+
+    def build_documents():
+        return [Product(**product.model_dump()) for product in product_data.products]
+
+    results["build_documents"] = measure(build_documents, repeat)
+
+    products = build_documents()
+    results["build_response"] = measure(
+        lambda: [ProductResponseSchema(**p.model_dump()) for p in products], repeat
+    )
+
+    results["insert_many"] = await measure_async(
+        lambda: Product.insert_many(build_documents()), repeat, setup=reset
+    )
+
+    transport = ASGITransport(app=build_app())
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def post():
+            response = await client.post("/products/", json=payload)
+            assert response.status_code == 201, response.text
+
+        results["end_to_end"] = await measure_async(post, repeat, setup=reset)
+
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument(
+        "--reference-limit",
+        type=int,
+        default=20000,
+        help="Skip the quadratic reference above this batch size",
+    )
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    all_results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        results = await bench_size(size, args.repeat, args.mongo_uri, args.reference_limit)
+        all_results.append(results)
+        print(f"\nbatch size {size}")
+        for stage, stats in results.items():
+            if isinstance(stats, dict):
+                print(f"  {stage:<32} median {stats['median_ms']:>10.2f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(all_results, output, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+Benchmark the list and search read paths.
+
+Compares the previous read path, which decodes every row into a `Product`
+Document and then re-validates `product.model_dump()` into
+`ProductResponseSchema`, with the raw path used by `pagination.fetch_products`
+that validates driver documents once. Both are timed on already fetched
+documents (decode only), including the query, and end to end through ASGI on `GET /products/` and `GET /search/{filter_name}/`,
+with and without a `fields` projection.
+
+Usage:
+    python -m benchmarks.bench_read_path --catalog 5000 --per-page 20
+    python -m benchmarks.bench_read_path --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import json
+from typing import Optional
+
+from benchmarks.common import (
+    build_app,
+    init_benchmark_db,
+    make_products,
+    measure,
+    measure_async,
+)
+
+import pagination
+from httpx import ASGITransport, AsyncClient
+from models.products import Product
+from schemas.products import ProductResponseSchema
+
+SEARCH_FILTER = {
+    "name": "Discounted",
+    "logical_operator": "AND",
+    "conditions": [
+        {
+            "logical_operator": "AND",
+            "conditions": [{"field": "discount", "operator": ">=", "value": 10}],
+        }
+    ],
+}
+
+
+async def fetch_via_documents(
+    query: dict,
+    limit: int,
+    skip: int = 0,
+    sort: Optional[list] = None,
+    projection: Optional[dict] = None,
+) -> list[ProductResponseSchema]:
+    """
+    The previous read path: `Product` documents, then `model_dump()`.
+    """
+    find = Product.find(query)
+    if sort:
+        find = find.sort(sort)
+    products = await find.skip(skip).limit(limit).to_list()
+    return [ProductResponseSchema(**product.model_dump()) for product in products]
+
+
+async def bench(catalog: int, per_page: int, repeat: int, mongo_uri) -> dict:
+    await init_benchmark_db(mongo_uri)
+    await Product.insert_many([Product(**p) for p in make_products(catalog)])
+
+    paths = {"documents": fetch_via_documents, "raw": pagination.fetch_products}
+    results = {"catalog": catalog, "per_page": per_page}
+
+    documents = (
+        await Product.get_pymongo_collection().find({}).limit(per_page).to_list(None)
+    )
+    results["decode_documents"] = measure(
+        lambda: [
+            ProductResponseSchema(**Product.model_validate(dict(d)).model_dump())
+            for d in documents
+        ],
+        repeat,
+    )
+    results["decode_raw"] = measure(
+        lambda: [pagination.document_to_response(dict(d)) for d in documents], repeat
+    )
+
+    for label, fetch in paths.items():
+        results[f"fetch_{label}"] = await measure_async(
+            lambda: fetch({}, per_page), repeat
+        )
+
+    requests = {
+        "list": f"/products/?per_page={per_page}",
+        "list_cursor": f"/products/?cursor=&per_page={per_page}",
+        "list_fields": f"/products/?per_page={per_page}&fields=stock",
+        "search": f"/search/{SEARCH_FILTER['name']}/?per_page={per_page}",
+    }
+
+    transport = ASGITransport(app=build_app())
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/filters/", json=SEARCH_FILTER)
+        assert response.status_code == 201, response.text
+
+        for label, fetch in paths.items():
+            pagination.fetch_products = fetch
+            try:
+                for name, url in requests.items():
+
+                    async def get():
+                        response = await client.get(url)
+                        assert response.status_code == 200, response.text
+
+                    results[f"{name}_{label}"] = await measure_async(get, repeat)
+            finally:
+                pagination.fetch_products = paths["raw"]
+
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--catalog", type=int, default=5000)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = await bench(args.catalog, args.per_page, args.repeat, args.mongo_uri)
+    print(f"\ncatalog {args.catalog}, {args.per_page} products per page")
+    for stage, stats in results.items():
+        if isinstance(stats, dict):
+            print(f"  {stage:<32} median {stats['median_ms']:>10.3f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+import os
+import statistics
+import time
+from typing import Awaitable, Callable, Optional
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGODB_DB_NAME", "benchmark")
+
+from beanie import init_beanie
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import AsyncMongoClient
+
+from cache import caches, product_cache
+from models.filters import Filter
+from models.products import Product
+from routes.filters import router as filters_router
+from routes.products import router as products_router
+from routes.search import router as search_router
+
+
+async def init_benchmark_db(mongo_uri: Optional[str] = None) -> None:
+    """
+    Initialize Beanie against a fresh benchmark database.
+
+    Args:
+        mongo_uri (Optional[str]): URI of a local mongod. When omitted an
+            in-memory mongomock database is used.
+    """
+    if mongo_uri:
+        client = AsyncMongoClient(mongo_uri)
+        await client.drop_database("benchmark")
+        database = client.get_database("benchmark")
+    else:
+        database = AsyncMongoMockClient().benchmark
+
+    await init_beanie(database=database, document_models=[Product, Filter])
+    for cache in caches:
+        cache.clear()
+    await product_cache.clear()
+
+
+def build_app() -> FastAPI:
+    """
+    Build an app with the same routers and prefixes as the test suite.
+    """
+    app = FastAPI()
+    app.include_router(products_router, prefix="/products")
+    app.include_router(filters_router, prefix="/filters")
+    app.include_router(search_router, prefix="/search")
+    return app
+
+
+def make_products(count: int, start: int = 0) -> list[dict]:
+    """
+    Generate product payloads with a few realistic extra fields.
+    """
+    return [
+        {
+            "name": f"Product {i}",
+            "price": round(5 + (i * 7.31) % 995, 2),
+            "stock": i % 250,
+            "discount": i % 40,
+            "features": ["waterproof", "wireless", "compact"][: i % 3 + 1],
+            "description": f"Description of product {i}. " * 8,
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def summarize(samples: list[float]) -> dict:
+    """
+    Summarize timing samples (seconds) in milliseconds.
+    """
+    return {
+        "runs": len(samples),
+        "min_ms": min(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+async def measure_async(
+    func: Callable[[], Awaitable[object]],
+    repeat: int,
+    setup: Optional[Callable[[], Awaitable[object]]] = None,
+) -> dict:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            await setup()
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
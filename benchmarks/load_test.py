@@ -0,0 +1,238 @@
+"""
+Load-test the list, get, search, create and patch endpoints through ASGI.
+
+Seeds `--products` products with realistic extra fields and `--filters`
+filters derived from `filter_schema_example`, then runs each scenario for
+`--requests` requests spread over `--concurrency` concurrent workers and
+reports p50/p95/p99 latency and throughput. Results are written as JSON
+together with the git commit, so runs on different commits can be compared
+with `--compare`.
+
+The in-memory mongomock backend is single-threaded Python, so absolute
+figures mostly reflect its scan costs; use `--mongo-uri` against a local
+mongod for representative numbers.
+
+Usage:
+    python -m benchmarks.load_test --products 5000 --concurrency 16
+    python -m benchmarks.load_test --output before.json
+    python -m benchmarks.load_test --output after.json --compare before.json
+    python -m benchmarks.load_test --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import copy
+import json
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from benchmarks.common import build_app, init_benchmark_db, make_products
+from httpx import ASGITransport, AsyncClient, Response
+from models.products import Product
+from schemas.examples.filters import filter_schema_example
+
+SCENARIOS = ("list", "get", "search", "create", "patch")
+
+
+def make_filters(count: int, compare_prices: bool = True) -> list[dict]:
+    """
+    Generate filters shaped like `filter_schema_example` with varied bounds.
+
+    mongomock cannot compare the Decimal128 `price` field, so with
+    `compare_prices=False` the price condition is left out.
+    """
+    filters = []
+    for i in range(count):
+        filter_ = copy.deepcopy(filter_schema_example)
+        filter_["name"] = f"Filter {i}"
+        price, stock = filter_["conditions"][0]["conditions"]
+        price["value"] = 100 + (i * 97) % 800
+        stock["value"] = (i * 13) % 200
+        if not compare_prices:
+            filter_["conditions"][0]["conditions"] = [stock]
+        feature, discount = filter_["conditions"][1]["conditions"]
+        feature["value"] = ["waterproof", "wireless", "compact"][i % 3]
+        discount["value"] = 5 + i % 30
+        filters.append(filter_)
+    return filters
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(samples: list[float], elapsed: float, errors: int) -> dict:
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "max_ms": max(samples) * 1000,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+    }
+
+
+async def run_scenario(
+    make_request: Callable[[int], Awaitable[Response]],
+    total: int,
+    concurrency: int,
+    expected: int,
+) -> dict:
+    samples: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await make_request(i)
+            samples.append(time.perf_counter() - started)
+            if response.status_code != expected:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return report(samples, time.perf_counter() - started, errors)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def load_test(args: argparse.Namespace) -> dict:
+    await init_benchmark_db(args.mongo_uri)
+    rng = random.Random(args.seed)
+
+    products = [Product(**p) for p in make_products(args.products)]
+    await Product.insert_many(products)
+    product_ids = [str(product.id) for product in products]
+    filters = make_filters(args.filters, compare_prices=bool(args.mongo_uri))
+    pages = max(1, args.products // args.per_page)
+
+    transport = ASGITransport(app=build_app())
+    async with AsyncClient(transport=transport, base_url="http://load") as client:
+        for filter_ in filters:
+            response = await client.post("/filters/", json=filter_)
+            assert response.status_code == 201, response.text
+
+        scenarios = {
+            "list": (
+                lambda i: client.get(
+                    f"/products/?page={rng.randint(1, pages)}&per_page={args.per_page}"
+                ),
+                200,
+            ),
+            "get": (
+                lambda i: client.get(f"/products/{rng.choice(product_ids)}/"),
+                200,
+            ),
+            "search": (
+                lambda i: client.get(
+                    f"/search/{rng.choice(filters)['name']}/?per_page={args.per_page}"
+                ),
+                200,
+            ),
+            "create": (
+                lambda i: client.post(
+                    "/products/",
+                    json={"products": make_products(1, start=args.products + i)},
+                ),
+                201,
+            ),
+            "patch": (
+                lambda i: client.patch(
+                    f"/products/{rng.choice(product_ids)}/",
+                    json={"price": round(rng.uniform(1, 999), 2)},
+                ),
+                200,
+            ),
+        }
+
+        results = {}
+        for name in args.scenarios.split(","):
+            make_request, expected = scenarios[name]
+            results[name] = await run_scenario(
+                make_request, args.requests, args.concurrency, expected
+            )
+            print(
+                f"  {name:<8} p50 {results[name]['p50_ms']:>8.2f} ms"
+                f"  p95 {results[name]['p95_ms']:>8.2f} ms"
+                f"  p99 {results[name]['p99_ms']:>8.2f} ms"
+                f"  {results[name]['throughput_rps']:>8.1f} req/s"
+                f"  errors {results[name]['errors']}"
+            )
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "backend": "mongod" if args.mongo_uri else "mongomock",
+        "config": {
+            "products": args.products,
+            "filters": args.filters,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "per_page": args.per_page,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\nchange against {baseline.get('commit', 'baseline')}")
+    for name, stats in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if before[key]:
+                deltas.append(f"{key} {100 * (stats[key] / before[key] - 1):+.1f}%")
+        print(f"  {name:<8} " + "  ".join(deltas))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--filters", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    parser.add_argument("--compare", default=None, help="Baseline JSON results")
+    args = parser.parse_args()
+
+    print(
+        f"\n{args.products} products, {args.filters} filters, "
+        f"{args.requests} requests per scenario at concurrency {args.concurrency}"
+    )
+    results = await load_test(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            compare(results, json.load(baseline))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
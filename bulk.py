@@ -0,0 +1,155 @@
+import time
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Optional
+
+from bson import ObjectId
+
+from database import to_bson
+from models.products import Product
+from query_optimizer import matches_nothing
+
+
+@dataclass
+class BulkReport:
+    """
+    Progress and outcome of a bulk update or delete.
+
+    Attributes:
+        dry_run (bool): True if nothing was written and `matched` is a count.
+        matched (int): Products selected so far.
+        modified (int): Products changed by an update.
+        deleted (int): Products removed by a delete.
+        batches (int): Write batches sent so far.
+        done (bool): False while batches are still being processed.
+        elapsed_seconds (float): Wall-clock time since the start.
+        documents_per_second (float): Throughput over `matched`.
+    """
+
+    dry_run: bool = False
+    matched: int = 0
+    modified: int = 0
+    deleted: int = 0
+    batches: int = 0
+    done: bool = False
+    elapsed_seconds: float = 0.0
+    documents_per_second: float = 0.0
+
+
+def build_update(set_fields: dict, inc_fields: dict) -> dict:
+    # Bumping `revision` makes concurrent `If-Match` updates fail cleanly.
+    update = {"$inc": {**to_bson(inc_fields), "revision": 1}}
+    if set_fields:
+        update["$set"] = to_bson(set_fields)
+    return update
+
+
+def guard_query(query: dict, inc_fields: dict) -> dict:
+    """
+    Exclude products a negative `price` increment would push below zero,
+    which `ProductCreateSchema` does not allow.
+    """
+    delta = inc_fields.get("price")
+    if delta is None or delta >= 0:
+        return query
+    guard = {"price": {"$gte": to_bson(-delta)}}
+    return {"$and": [query, guard]} if query else guard
+
+
+async def _selections(
+    query: dict, ids: Optional[list], batch_size: int
+) -> AsyncIterator[dict]:
+    """
+    Yield one write selector per batch.
+
+    Explicit IDs are written in chunks as given. Filter selections are
+    walked by keyset on `_id`, so every product is visited at most once,
+    even when the write changes whether it matches, and an `$inc` is
+    never applied twice. Each selector keeps `query`, so a product that
+    stopped matching, or that a guard excludes, since the batch was read
+    is not written.
+    """
+
+    def narrow(batch_ids: list) -> dict:
+        chunk = {"_id": {"$in": batch_ids}}
+        return {"$and": [query, chunk]} if query else chunk
+
+    if ids is not None:
+        for start in range(0, len(ids), batch_size):
+            yield narrow(ids[start:start + batch_size])
+        return
+
+    collection = Product.get_pymongo_collection()
+    last_id: Optional[ObjectId] = None
+    while True:
+        seek = query
+        if last_id is not None:
+            seek = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        batch = await (
+            collection.find(seek, {"_id": 1}).sort("_id", 1).limit(batch_size)
+        ).to_list(None)
+        if not batch:
+            return
+        yield narrow([document["_id"] for document in batch])
+        last_id = batch[-1]["_id"]
+
+
+async def run_bulk(
+    query: dict,
+    update: Optional[dict] = None,
+    ids: Optional[list] = None,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+) -> AsyncIterator[BulkReport]:
+    """
+    Apply `update`, or a delete when it is None, to the selected products.
+
+    Products are selected by `query`, narrowed to `ids` when given, and
+    written with one `update_many`/`delete_many` per batch of `_id`s, so
+    N products cost about N / `batch_size` round trips instead of two per
+    product. A dry run only counts the selection.
+
+    Args:
+        query (dict): MongoDB query selecting the products.
+        update (Optional[dict]): Update document, e.g. from `build_update`.
+        ids (Optional[list]): Explicit product IDs to restrict the write to.
+        batch_size (int): Products per write.
+        dry_run (bool): Count the selection without writing.
+
+    Yields:
+        BulkReport: The running report after each batch, then the final one
+            with `done` set.
+    """
+    report = BulkReport(dry_run=dry_run)
+    started = time.perf_counter()
+    collection = Product.get_pymongo_collection()
+
+    def progress() -> BulkReport:
+        report.elapsed_seconds = time.perf_counter() - started
+        if report.elapsed_seconds:
+            report.documents_per_second = report.matched / report.elapsed_seconds
+        return replace(report)
+
+    if matches_nothing(query):
+        report.done = True
+        yield progress()
+        return
+
+    if dry_run:
+        if ids is not None:
+            query = {"$and": [query, {"_id": {"$in": ids}}]}
+        report.matched = await collection.count_documents(query)
+    else:
+        async for selector in _selections(query, ids, batch_size):
+            report.batches += 1
+            if update is None:
+                result = await collection.delete_many(selector)
+                report.deleted += result.deleted_count
+                report.matched += result.deleted_count
+            else:
+                result = await collection.update_many(selector, update)
+                report.modified += result.modified_count
+                report.matched += result.matched_count
+            yield progress()
+
+    report.done = True
+    yield progress()
@@ -0,0 +1,292 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from settings import settings
+from snapshot import snapshot_engine
+
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries also expire after a fixed TTL.
+
+    Hit, miss and eviction counters are kept so callers can expose them
+    for monitoring. The cache is not thread-safe; it is meant to be used
+    from the single event loop that serves requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheBackend(ABC):
+    """
+    Storage interface used by `ReadThroughCache`.
+
+    Implementations may be in-process or remote (e.g. Redis-compatible);
+    remote backends are responsible for encoding values and for their own
+    expiry policy.
+    """
+
+    @abstractmethod
+    async def get(self, key: Hashable) -> Optional[Any]:
+        """Return the stored value, or None if absent or expired."""
+
+    @abstractmethod
+    async def set(self, key: Hashable, value: Any) -> None:
+        """Store a value under `key`."""
+
+    @abstractmethod
+    async def delete(self, key: Hashable) -> None:
+        """Remove `key` if present."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Remove every entry."""
+
+    def stats(self) -> dict:
+        """Return backend-specific size information, if known."""
+        return {}
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    `CacheBackend` storing values in a process-local `TTLCache`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._cache = TTLCache(name="memory", maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        return self._cache.get(key)
+
+    async def set(self, key: Hashable, value: Any) -> None:
+        self._cache.set(key, value)
+
+    async def delete(self, key: Hashable) -> None:
+        self._cache.invalidate(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        return {
+            "size": stats["size"],
+            "maxsize": stats["maxsize"],
+            "ttl": stats["ttl"],
+            "evictions": stats["evictions"],
+        }
+
+
+class ReadThroughCache:
+    """
+    Read-through cache over a pluggable `CacheBackend`.
+
+    Concurrent misses for the same key are coalesced into a single load
+    (single-flight), so a hot key expiring does not stampede the database.
+    A load that races with an invalidation is returned to its callers but
+    not stored, so writes are never shadowed by stale reads.
+    """
+
+    def __init__(self, name: str, backend: CacheBackend) -> None:
+        self.name = name
+        self.backend = backend
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        """
+        Return the cached value for `key`, loading it on a miss.
+
+        Args:
+            key (Hashable): Cache key.
+            loader (Callable[[], Awaitable[Optional[Any]]]): Fetches the value
+                from the source of truth; None results are not cached.
+
+        Returns:
+            Optional[Any]: The cached or freshly loaded value.
+        """
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        load = self._inflight.get(key)
+        if load is not None:
+            self.coalesced += 1
+        else:
+            load = asyncio.ensure_future(self._load(key, loader, self._generation))
+            # Retrieve the error even if every caller was cancelled.
+            load.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight[key] = load
+        # The load runs in its own task, so a cancelled caller, leader or
+        # not, stops waiting without cancelling it for the others.
+        return await asyncio.shield(load)
+
+    async def _load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Optional[Any]]],
+        generation: int,
+    ) -> Optional[Any]:
+        try:
+            value = await loader()
+            if value is not None and generation == self._generation:
+                await self.backend.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    async def invalidate(self, key: Hashable) -> None:
+        self._generation += 1
+        self._inflight.pop(key, None)
+        await self.backend.delete(key)
+
+    async def clear(self) -> None:
+        self._generation += 1
+        self._inflight.clear()
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": None,
+            "maxsize": None,
+            "ttl": None,
+            "evictions": None,
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+
+def make_backend(kind: str, maxsize: int, ttl: float) -> CacheBackend:
+    if kind == "memory":
+        return InMemoryCacheBackend(maxsize=maxsize, ttl=ttl)
+    raise ValueError(f"Unknown cache backend '{kind}'")
+
+
+compiled_filter_cache = TTLCache(
+    name="compiled_filters",
+    maxsize=settings.FILTER_CACHE_MAXSIZE,
+    ttl=settings.FILTER_CACHE_TTL,
+)
+
+count_cache = TTLCache(
+    name="counts",
+    maxsize=settings.COUNT_CACHE_MAXSIZE,
+    ttl=settings.COUNT_CACHE_TTL,
+)
+
+facet_cache = TTLCache(
+    name="facets",
+    maxsize=settings.FACET_CACHE_MAXSIZE,
+    ttl=settings.FACET_CACHE_TTL,
+)
+
+product_cache = ReadThroughCache(
+    name="products",
+    backend=make_backend(
+        settings.PRODUCT_CACHE_BACKEND,
+        maxsize=settings.PRODUCT_CACHE_MAXSIZE,
+        ttl=settings.PRODUCT_CACHE_TTL,
+    ),
+)
+
+caches: list[TTLCache] = [compiled_filter_cache, count_cache, facet_cache]
+
+
+def cache_stats() -> list[dict]:
+    return [cache.stats() for cache in caches] + [product_cache.stats()]
+
+
+async def invalidate_product_caches(product_ids: Optional[Iterable] = None) -> None:
+    """
+    Drop cached results derived from the products collection.
+
+    Called after product writes so counts and facets are recomputed and,
+    in strict consistency mode, the products snapshot stops being served.
+
+    Args:
+        product_ids (Optional[Iterable]): IDs of the written products. When
+            omitted, e.g. after bulk writes, the whole product cache is cleared.
+    """
+    count_cache.clear()
+    facet_cache.clear()
+    snapshot_engine.mark_dirty()
+    if product_ids is None:
+        await product_cache.clear()
+    else:
+        for product_id in product_ids:
+            await product_cache.invalidate(str(product_id))
@@ -1,25 +1,196 @@
+import inspect
+from decimal import Decimal
+from typing import Any, Optional
 from beanie import init_beanie
-from pymongo import AsyncMongoClient
+from bson import Decimal128
+from pymongo import AsyncMongoClient, monitoring
+from index_advisor import sync_indexes
+from metrics import command_metrics
 from models.filters import Filter
 from models.products import Product
 from settings import settings
 
 
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener keeping live counters for monitoring.
+
+    Attributes:
+        created (int): Connections opened since startup.
+        closed (int): Connections closed since startup.
+        checked_out (int): Connections currently in use by operations.
+        waiting (int): Operations currently waiting for a connection.
+        check_out_failures (int): Checkouts that failed, e.g. on wait timeout.
+        pools_cleared (int): Times a pool was cleared after an error.
+    """
+
+    def __init__(self) -> None:
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.check_out_failures = 0
+        self.pools_cleared = 0
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        self.pools_cleared += 1
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        self.created += 1
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        self.closed += 1
+
+    def connection_check_out_started(self, event) -> None:
+        self.waiting += 1
+
+    def connection_check_out_failed(self, event) -> None:
+        self.waiting -= 1
+        self.check_out_failures += 1
+
+    def connection_checked_out(self, event) -> None:
+        self.waiting -= 1
+        self.checked_out += 1
+
+    def connection_checked_in(self, event) -> None:
+        self.checked_out -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "max_pool_size": settings.MONGODB_MAX_POOL_SIZE,
+            "min_pool_size": settings.MONGODB_MIN_POOL_SIZE,
+            "open": self.created - self.closed,
+            "created": self.created,
+            "closed": self.closed,
+            "checked_out": self.checked_out,
+            "waiting": self.waiting,
+            "check_out_failures": self.check_out_failures,
+            "pools_cleared": self.pools_cleared,
+        }
+
+
+pool_stats = PoolStats()
+client: Optional[AsyncMongoClient] = None
+
+
+def client_options() -> dict:
+    """
+        Build AsyncMongoClient keyword arguments from the pool settings.
+
+        Only options that are set are passed, so driver defaults apply otherwise.
+
+        Returns:
+            dict: Keyword arguments for AsyncMongoClient.
+        """
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "compressors": settings.MONGODB_COMPRESSORS,
+        "readPreference": settings.MONGODB_READ_PREFERENCE,
+        "readConcernLevel": settings.MONGODB_READ_CONCERN,
+    }
+    return {key: value for key, value in options.items() if value is not None}
+
+
 async def init_db() -> None:
     """
         Initialize MongoDB connection and Beanie ODM.
 
-        - Creates an asynchronous MongoDB client using the URI from settings.
+        - Creates an asynchronous MongoDB client using the URI and pool settings.
+        - Registers the command listener feeding `/metrics` when METRICS_ENABLED is set.
         - Initializes Beanie with all registered document models (e.g., Product, Filter).
+        - Builds the indexes needed by stored filters when AUTO_INDEX_FILTERS is set.
         - Must be called at application startup before any database operations.
 
         Raises:
             beanie.exceptions.CollectionWasNotInitialized:
                 If the document models are not properly initialized.
         """
-    client = AsyncMongoClient(settings.MONGODB_URI)
+    global client
+    event_listeners = [pool_stats]
+    if settings.METRICS_ENABLED:
+        event_listeners.append(command_metrics)
+
+    client = AsyncMongoClient(
+        settings.MONGODB_URI,
+        event_listeners=event_listeners,
+        **client_options(),
+    )
 
     await init_beanie(
         database=client.get_database(settings.MONGODB_DB_NAME),
         document_models=[Product, Filter],
     )
+
+    if settings.AUTO_INDEX_FILTERS:
+        await sync_indexes()
+
+
+async def close_db() -> None:
+    """
+        Close the MongoDB client created by `init_db`.
+
+        Must be called at application shutdown so pooled connections are
+        released cleanly.
+        """
+    global client
+    if client is not None:
+        await client.close()
+        client = None
+
+
+async def aggregate(collection, pipeline: list[dict]) -> list[dict]:
+    """
+        Run an aggregation pipeline and return all resulting documents.
+
+        PyMongo's async collections return the cursor from an awaitable
+        `aggregate`, while Motor-compatible collections (such as the
+        mongomock client used by the tests) return it directly; both are
+        supported.
+
+        Args:
+            collection: The collection to aggregate on.
+            pipeline (list[dict]): Aggregation pipeline stages.
+
+        Returns:
+            list[dict]: The aggregation results.
+        """
+    cursor = collection.aggregate(pipeline)
+    if inspect.isawaitable(cursor):
+        cursor = await cursor
+    return await cursor.to_list(None)
+
+
+def to_bson(value: Any) -> Any:
+    """
+        Convert values pydantic produces into their BSON form for raw
+        driver writes: `Decimal` becomes `Decimal128`, recursively through
+        documents and arrays.
+
+        Args:
+            value (Any): A value, document or array.
+
+        Returns:
+            Any: The value with every `Decimal` converted.
+        """
+    if isinstance(value, Decimal):
+        return Decimal128(value)
+    if isinstance(value, dict):
+        return {key: to_bson(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_bson(item) for item in value]
+    return value
@@ -0,0 +1,124 @@
+import hashlib
+from typing import Optional, Sequence, Union
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from responses import dumps
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Compute a strong ETag from a serialized response body.
+
+    Args:
+        body (bytes): The exact bytes sent to the client.
+
+    Returns:
+        str: Quoted ETag value.
+    """
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an `If-None-Match` header against an ETag.
+
+    Uses the weak comparison required for `If-None-Match`: a `W/` prefix
+    on either side is ignored, and `*` matches any representation.
+
+    Args:
+        if_none_match (Optional[str]): Raw header value, if sent.
+        etag (str): Current ETag of the resource.
+
+    Returns:
+        bool: True if the client's copy is still current.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == current
+        for candidate in if_none_match.split(",")
+    )
+
+
+def if_match_satisfied(if_match: Optional[str], etag: str) -> bool:
+    """
+    Check an `If-Match` precondition against the current ETag.
+
+    Uses the strong comparison required for `If-Match`: weak validators
+    never match, and `*` matches any existing representation.
+
+    Args:
+        if_match (Optional[str]): Raw header value, if sent.
+        etag (str): Current ETag of the resource.
+
+    Returns:
+        bool: True if the write may proceed.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip() == etag
+        for candidate in if_match.split(",")
+        if not candidate.strip().startswith("W/")
+    )
+
+
+def revision_filter(expected: int) -> dict:
+    """
+    Query clause matching documents still at revision `expected`.
+
+    Documents written before revisions were tracked have no `revision`
+    field and count as revision 0.
+    """
+    if expected == 0:
+        return {"revision": {"$in": [0, None]}}
+    return {"revision": expected}
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """
+    Build an empty 304 Not Modified response carrying the validators.
+    """
+    return Response(
+        status_code=304, headers={"ETag": etag, "Cache-Control": cache_control}
+    )
+
+
+def json_response(body: bytes, etag: str, cache_control: str) -> Response:
+    """
+    Build a 200 JSON response for a pre-serialized body.
+    """
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+def conditional_response(
+    request: Request,
+    content: Union[BaseModel, Sequence[BaseModel]],
+    cache_control: str,
+) -> Response:
+    """
+    Serialize `content` once with `dumps` and answer with 200 or 304 based
+    on its ETag.
+
+    Args:
+        request (Request): The incoming request.
+        content (Union[BaseModel, Sequence[BaseModel]]): The response model,
+            or a list of models for list endpoints.
+        cache_control (str): Value of the `Cache-Control` header.
+
+    Returns:
+        Response: 304 Not Modified if the client's copy is current, else 200.
+    """
+    body = dumps(content if isinstance(content, BaseModel) else list(content))
+    etag = make_etag(body)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, cache_control)
+    return json_response(body, etag, cache_control)
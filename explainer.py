@@ -0,0 +1,106 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from models.products import Product
+
+SCAN_STAGES = {"COLLSCAN"}
+
+
+@dataclass
+class QueryExplanation:
+    """
+    Diagnostics for one query taken from MongoDB `explain`.
+
+    Attributes:
+        query (dict): The query that was explained.
+        stages (list[str]): Stage names of the winning plan, root first.
+        indexes (list[str]): Names of the indexes the winning plan uses.
+        collection_scan (bool): True if any stage scans the whole collection.
+        returned (int): Documents returned.
+        docs_examined (int): Documents fetched and examined.
+        keys_examined (int): Index keys examined.
+        execution_time_ms (int): Server-side execution time.
+        rejected_plans (int): Candidate plans the planner discarded.
+        winning_plan (dict): The raw winning plan.
+    """
+
+    query: dict
+    stages: list[str] = field(default_factory=list)
+    indexes: list[str] = field(default_factory=list)
+    collection_scan: bool = False
+    returned: int = 0
+    docs_examined: int = 0
+    keys_examined: int = 0
+    execution_time_ms: int = 0
+    rejected_plans: int = 0
+    winning_plan: dict = field(default_factory=dict)
+
+
+def _walk_plan(plan: dict):
+    yield plan
+    if "inputStage" in plan:
+        yield from _walk_plan(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _walk_plan(child)
+
+
+def summarize_explain(query: dict, explain: dict[str, Any]) -> QueryExplanation:
+    """
+    Pick the useful figures out of an `explain("executionStats")` result.
+
+    Args:
+        query (dict): The query that was explained.
+        explain (dict[str, Any]): Raw output of the `explain` command.
+
+    Returns:
+        QueryExplanation: Winning plan, indexes, scan flag and counters.
+    """
+    planner = explain.get("queryPlanner", {})
+    winning_plan = planner.get("winningPlan", {})
+    # The slot-based engine nests the classic plan tree under `queryPlan`.
+    plan = winning_plan.get("queryPlan", winning_plan)
+    stats = explain.get("executionStats", {})
+
+    stages = [stage.get("stage", "") for stage in _walk_plan(plan)]
+    indexes = []
+    for stage in _walk_plan(plan):
+        name: Optional[str] = stage.get("indexName")
+        if name and name not in indexes:
+            indexes.append(name)
+
+    return QueryExplanation(
+        query=query,
+        stages=stages,
+        indexes=indexes,
+        collection_scan=bool(SCAN_STAGES.intersection(stages)),
+        returned=stats.get("nReturned", 0),
+        docs_examined=stats.get("totalDocsExamined", 0),
+        keys_examined=stats.get("totalKeysExamined", 0),
+        execution_time_ms=stats.get("executionTimeMillis", 0),
+        rejected_plans=len(planner.get("rejectedPlans", [])),
+        winning_plan=winning_plan,
+    )
+
+
+async def explain_query(query: dict) -> QueryExplanation:
+    """
+    Run `query` against the `products` collection under
+    `explain("executionStats")`.
+
+    The query is executed in full on the server, so the timings reflect a
+    real run of the search without transferring any documents.
+
+    Args:
+        query (dict): MongoDB query, e.g. a compiled filter's query.
+
+    Returns:
+        QueryExplanation: Diagnostics for the query.
+    """
+    collection = Product.get_pymongo_collection()
+    explain = await collection.database.command(
+        {
+            "explain": {"find": collection.name, "filter": query},
+            "verbosity": "executionStats",
+        }
+    )
+    return summarize_explain(query, explain)
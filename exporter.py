@@ -0,0 +1,129 @@
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, Optional
+
+from bson import Decimal128, ObjectId
+
+from models.products import Product
+from responses import dumps
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def _rename_id(document: dict) -> dict:
+    if "_id" in document:
+        document["id"] = document.pop("_id")
+    return document
+
+
+def _lookup(document: dict, column: str) -> Any:
+    # Follows a dotted column the way the projection does, through nested
+    # documents and across the elements of arrays.
+    value: Any = document
+    for key in column.split("."):
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list):
+            value = [
+                item[key] for item in value if isinstance(item, dict) and key in item
+            ]
+        else:
+            return None
+    return value
+
+
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return dumps(value).decode()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, (ObjectId, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def iter_export(
+    query: dict,
+    export_format: ExportFormat,
+    columns: Optional[list[str]] = None,
+    batch_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    """
+    Stream the products matching `query` as NDJSON or CSV.
+
+    Documents are read straight from the MongoDB cursor in batches of
+    `batch_size` and encoded into chunks of roughly `CHUNK_SIZE` bytes, so
+    memory use stays constant regardless of the result size.
+
+    Args:
+        query (dict): MongoDB query selecting the products.
+        export_format (ExportFormat): Output format.
+        columns (Optional[list[str]]): Fields to export. Required for CSV,
+            where they become the header row; for NDJSON they act as a
+            projection and all fields are exported when omitted.
+        batch_size (int): Number of documents fetched per cursor round trip.
+
+    Yields:
+        bytes: Encoded chunks of the export.
+    """
+    projection = None
+    if columns:
+        projection = {("_id" if column == "id" else column): 1 for column in columns}
+        if "id" not in columns:
+            projection["_id"] = 0
+
+    cursor = Product.get_pymongo_collection().find(
+        query, projection, batch_size=batch_size
+    )
+
+    if export_format == ExportFormat.CSV:
+        async for chunk in _iter_csv(cursor, columns):
+            yield chunk
+        return
+
+    buffer = bytearray()
+    async for document in cursor:
+        buffer += dumps(_rename_id(document))
+        buffer += b"\n"
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+
+async def _iter_csv(cursor, columns: list[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    async for document in cursor:
+        document = _rename_id(document)
+        writer.writerow([_csv_cell(_lookup(document, column)) for column in columns])
+
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
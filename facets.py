@@ -0,0 +1,100 @@
+from decimal import Decimal
+
+from bson import Decimal128
+
+from database import aggregate
+from models.products import Product
+from schemas.facets import (
+    FacetBucketSchema,
+    FacetResponseSchema,
+    FacetSpecSchema,
+    FacetType,
+)
+
+TOTAL_KEY = "total"
+
+
+def _facet_key(index: int) -> str:
+    # User-supplied facet names may contain "." or "$", which MongoDB does not
+    # accept as $facet output names, so positional keys are used instead.
+    return f"facet_{index}"
+
+
+def _facet_stages(spec: FacetSpecSchema) -> list[dict]:
+    if spec.type == FacetType.BUCKET:
+        return [
+            {
+                "$bucket": {
+                    "groupBy": f"${spec.field}",
+                    "boundaries": spec.boundaries,
+                    "default": spec.default,
+                    "output": {"count": {"$sum": 1}},
+                }
+            }
+        ]
+
+    return [
+        {"$unwind": f"${spec.field}"},
+        {"$group": {"_id": f"${spec.field}", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": spec.limit},
+    ]
+
+
+def build_facet_pipeline(query: dict, specs: list[FacetSpecSchema]) -> list[dict]:
+    """
+    Build a single aggregation pipeline computing all requested facets.
+
+    The filter query is applied once in a leading `$match`; every facet then
+    runs as a sub-pipeline of one `$facet` stage, alongside a total count.
+
+    Args:
+        query (dict): MongoDB query, e.g. the output of `build_query`.
+        specs (list[FacetSpecSchema]): Requested facets.
+
+    Returns:
+        list[dict]: Aggregation pipeline for the `products` collection.
+    """
+    facets = {TOTAL_KEY: [{"$group": {"_id": None, "count": {"$sum": 1}}}]}
+    for index, spec in enumerate(specs):
+        facets[_facet_key(index)] = _facet_stages(spec)
+    return [{"$match": query}, {"$facet": facets}]
+
+
+def _plain(value):
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+async def compute_facets(
+    filter_name: str, query: dict, specs: list[FacetSpecSchema]
+) -> FacetResponseSchema:
+    """
+    Run the facet pipeline for `query` in one round trip.
+
+    Args:
+        filter_name (str): Name of the filter the query was compiled from.
+        query (dict): MongoDB query selecting the products.
+        specs (list[FacetSpecSchema]): Requested facets.
+
+    Returns:
+        FacetResponseSchema: Counts per bucket or term for each facet.
+    """
+    pipeline = build_facet_pipeline(query, specs)
+    result = (await aggregate(Product.get_pymongo_collection(), pipeline))[0]
+
+    total = result[TOTAL_KEY]
+    return FacetResponseSchema(
+        filter_name=filter_name,
+        total_items=total[0]["count"] if total else 0,
+        facets={
+            spec.name: [
+                FacetBucketSchema(key=_plain(bucket["_id"]), count=bucket["count"])
+                for bucket in result[_facet_key(index)]
+            ]
+            for index, spec in enumerate(specs)
+        },
+    )
@@ -1,14 +1,66 @@
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Hashable
+from query_optimizer import optimize_query
 from schemas.filters import Operator, LogicalOperator, FilterCreateSchema
 
 
+@dataclass(frozen=True)
+class CompiledFilter:
+    """
+    A saved filter translated into a ready-to-run MongoDB query.
+
+    Attributes:
+        id (Any): `_id` of the source filter document.
+        name (str): Name of the source filter.
+        revision (int): Revision of the filter document it was compiled from.
+        query (dict): MongoDB query dictionary; callers must not mutate it.
+    """
+
+    id: Any
+    name: str
+    revision: int
+    query: dict
+
+    @property
+    def cache_key(self) -> Hashable:
+        """
+        Key for results derived from this filter. A filter deleted and
+        created again under the same name restarts at revision 0, so the
+        name cannot tell the two apart; the `_id` can.
+        """
+        return (self.id, self.revision)
+
+
+def prefix_range(prefix: str) -> dict:
+    """
+    Translate a string prefix into an anchored range MongoDB can answer
+    from an ordinary index on the field.
+
+    Args:
+        prefix (str): The required prefix; matching is case-sensitive.
+
+    Returns:
+        dict: `$gte`/`$lt` bounds covering every string starting with `prefix`.
+    """
+    bounds = {"$gte": prefix}
+    stem = prefix.rstrip(chr(0x10FFFF))
+    if stem:
+        following = ord(stem[-1]) + 1
+        if 0xD800 <= following <= 0xDFFF:
+            following = 0xE000
+        bounds["$lt"] = stem[:-1] + chr(following)
+    return bounds
+
+
 def build_query(filter_data: FilterCreateSchema) -> dict:
     """
     Convert a FilterCreateSchema into a MongoDB query dictionary.
 
     Each group of conditions is combined with its own
     logical operator (AND/OR),and all groups are joined
-    by the filter's top-level logical operator.
+    by the filter's top-level logical operator. The result
+    is passed through `optimize_query`, so it is flattened
+    and may be `MATCH_NOTHING` for contradictory filters.
 
     Args:
         filter_data (FilterCreateSchema): The filter definition.
@@ -31,6 +83,8 @@ def build_query(filter_data: FilterCreateSchema) -> dict:
             Operator.REGEX: lambda val: {
                 field: {"$regex": val, "$options": "i"}
             },
+            Operator.PREFIX: lambda val: {field: prefix_range(val)},
+            Operator.TEXT: lambda val: {"$text": {"$search": val}},
         }
         return operator_map[operator](value)
 
@@ -45,6 +99,7 @@ def build_query(filter_data: FilterCreateSchema) -> dict:
         else:
             groups.append({"$or": sub_queries})
 
-    return {"$and": groups} \
+    query = {"$and": groups} \
         if filter_data.logical_operator == LogicalOperator.AND \
         else {"$or": groups}
+    return optimize_query(query)
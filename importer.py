@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import codecs
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterable, AsyncIterator, Union
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from database import init_db, to_bson
+from models.products import Product
+from schemas.products import ProductCreateSchema
+
+
+# Never taken from a row. Exports write `_id` as `id`, so exported files
+# import again without creating an `id` field or a string `_id`.
+SERVER_FIELDS = {"_id", "id", "revision"}
+
+
+@dataclass
+class RowError:
+    line: int
+    error: str
+
+
+@dataclass
+class ImportReport:
+    """
+    Outcome of a bulk product import.
+
+    Attributes:
+        received (int): Non-empty lines read from the input.
+        inserted (int): Products created by the import.
+        updated (int): Existing products matched by name and overwritten.
+        failed (int): Rows rejected by validation or by the database.
+        errors (list[RowError]): Per-row errors, capped at `max_errors`.
+        elapsed_seconds (float): Wall-clock duration of the import.
+        rows_per_second (float): Throughput over `received` rows.
+    """
+
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: list[RowError] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+
+
+async def iter_lines(
+    chunks: AsyncIterable[Union[bytes, str]],
+) -> AsyncIterator[str]:
+    """
+    Split a stream of byte or text chunks into lines.
+
+    Args:
+        chunks (AsyncIterable[Union[bytes, str]]): e.g. `Request.stream()`.
+
+    Yields:
+        str: Lines without their trailing newline.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+def _record_error(report: ImportReport, line: int, error: str, max_errors: int) -> None:
+    report.failed += 1
+    if len(report.errors) < max_errors:
+        report.errors.append(RowError(line=line, error=error))
+
+
+async def _write_chunk(
+    rows: dict[str, tuple[int, dict]],
+    report: ImportReport,
+    semaphore: asyncio.Semaphore,
+    max_errors: int,
+) -> None:
+    line_numbers = [line for line, _ in rows.values()]
+    operations = [
+        UpdateOne(
+            {"name": name},
+            {"$set": document, "$inc": {"revision": 1}},
+            upsert=True,
+        )
+        for name, (_, document) in rows.items()
+    ]
+
+    try:
+        result = await Product.get_pymongo_collection().bulk_write(
+            operations, ordered=False
+        )
+        details = result.bulk_api_result
+    except BulkWriteError as exc:
+        details = exc.details
+        for write_error in details.get("writeErrors", []):
+            _record_error(
+                report,
+                line_numbers[write_error["index"]],
+                write_error.get("errmsg", "Write failed."),
+                max_errors,
+            )
+    except PyMongoError as exc:
+        details = {}
+        for line in line_numbers:
+            _record_error(report, line, str(exc), max_errors)
+    finally:
+        semaphore.release()
+
+    report.inserted += details.get("nUpserted", 0)
+    report.updated += details.get("nMatched", 0)
+
+
+async def import_products(
+    lines: AsyncIterable[str],
+    chunk_size: int = 1000,
+    concurrency: int = 4,
+    max_errors: int = 1000,
+) -> ImportReport:
+    """
+    Validate and upsert products from an NDJSON stream.
+
+    Rows are validated with `ProductCreateSchema` as they arrive and sent in
+    chunks of `chunk_size` as unordered `bulk_write` upserts keyed on `name`,
+    with at most `concurrency` chunks in flight. Invalid rows and write
+    errors are reported per line without aborting the rest of the import.
+    Within a chunk the last row for a given name wins.
+
+    Args:
+        lines (AsyncIterable[str]): NDJSON lines, one product per line.
+        chunk_size (int): Rows per `bulk_write` call.
+        concurrency (int): Maximum number of concurrent `bulk_write` calls.
+        max_errors (int): Maximum number of row errors kept in the report.
+
+    Returns:
+        ImportReport: Counters, per-row errors and throughput.
+    """
+    report = ImportReport()
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks: set[asyncio.Task] = set()
+    rows: dict[str, tuple[int, dict]] = {}
+    started = time.perf_counter()
+
+    async def flush() -> None:
+        nonlocal rows
+        if not rows:
+            return
+        await semaphore.acquire()
+        task = asyncio.create_task(_write_chunk(rows, report, semaphore, max_errors))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        rows = {}
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        report.received += 1
+
+        try:
+            product = ProductCreateSchema.model_validate_json(line)
+        except ValidationError as exc:
+            errors = exc.errors(include_url=False, include_input=False)
+            message = "; ".join(
+                f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in errors
+            )
+            _record_error(report, line_number, message, max_errors)
+            continue
+
+        document = to_bson(product.model_dump(exclude=SERVER_FIELDS))
+        rows[product.name] = (line_number, document)
+        if len(rows) >= chunk_size:
+            await flush()
+
+    await flush()
+    await asyncio.gather(*tasks)
+
+    report.elapsed_seconds = time.perf_counter() - started
+    if report.elapsed_seconds:
+        report.rows_per_second = report.received / report.elapsed_seconds
+    return report
+
+
+async def import_file(path: str, **options) -> ImportReport:
+    """
+    Import products from an NDJSON file on disk.
+
+    Args:
+        path (str): Path to the NDJSON file.
+        **options: Passed through to `import_products`.
+
+    Returns:
+        ImportReport: Counters, per-row errors and throughput.
+    """
+
+    async def read_lines() -> AsyncIterator[str]:
+        with open(path, encoding="utf-8") as feed:
+            for line in feed:
+                yield line.rstrip("\n")
+
+    return await import_products(read_lines(), **options)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import products from NDJSON.")
+    parser.add_argument("path", help="NDJSON file with one product per line")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-errors", type=int, default=1000)
+    args = parser.parse_args()
+
+    await init_db()
+    report = await import_file(
+        args.path,
+        chunk_size=args.chunk_size,
+        concurrency=args.concurrency,
+        max_errors=args.max_errors,
+    )
+    print(json.dumps(asdict(report), indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
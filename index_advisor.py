@@ -0,0 +1,281 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from pydantic import ValidationError
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from models.filters import Filter
+from models.products import Product
+from schemas.filters import STORED, FilterCreateSchema, LogicalOperator, Operator
+
+logger = logging.getLogger(__name__)
+
+AUTO_INDEX_PREFIX = "auto_"
+
+EQUALITY_OPERATORS = {Operator.EQ, Operator.INCLUDE}
+RANGE_OPERATORS = {
+    Operator.GT,
+    Operator.GTE,
+    Operator.LT,
+    Operator.LTE,
+    Operator.PREFIX,
+}
+INDEXABLE_OPERATORS = EQUALITY_OPERATORS | RANGE_OPERATORS
+
+IndexKeys = tuple[tuple[str, int], ...]
+
+
+@dataclass(frozen=True)
+class IndexProposal:
+    """
+    An index the advisor recommends for the `products` collection.
+
+    Attributes:
+        keys (IndexKeys): Ordered `(field, direction)` pairs.
+        filters (tuple[str, ...]): Names of the filters that need it.
+    """
+
+    keys: IndexKeys
+    filters: tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        return AUTO_INDEX_PREFIX + "_".join(
+            f"{field_}_{direction}" for field_, direction in self.keys
+        )
+
+
+@dataclass
+class IndexReport:
+    """
+    Outcome of an index analysis or synchronisation run.
+
+    Attributes:
+        proposals (list[IndexProposal]): Indexes derived from stored filters.
+        existing (list[str]): Index names present before the run.
+        created (list[str]): Index names created by the run.
+        dropped (list[str]): Advisor-managed indexes no longer needed.
+        failed (dict[str, str]): Index names that could not be built.
+        scanning_filters (list[str]): Filters that still need a collection scan.
+    """
+
+    proposals: list[IndexProposal]
+    existing: list[str]
+    created: list[str] = field(default_factory=list)
+    dropped: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+    scanning_filters: list[str] = field(default_factory=list)
+
+
+def _group_index_keys(conditions, logical_operator: LogicalOperator) -> list[IndexKeys]:
+    """
+    Derive the indexes a single condition group needs.
+
+    AND groups get one compound index ordered equality-first, then range
+    (the ESR rule). At most one `include` field is used since those usually
+    hold arrays and MongoDB cannot index parallel arrays. OR groups need one
+    index per branch, so each indexable field gets its own index.
+    """
+    indexable = [c for c in conditions if c.operator in INDEXABLE_OPERATORS]
+
+    if logical_operator == LogicalOperator.OR:
+        return [((c.field, ASCENDING),) for c in indexable]
+
+    equality, ranges, seen = [], [], set()
+    include_used = False
+    for condition in indexable:
+        if condition.field in seen:
+            continue
+        if condition.operator == Operator.INCLUDE:
+            if include_used:
+                continue
+            include_used = True
+        seen.add(condition.field)
+        if condition.operator in EQUALITY_OPERATORS:
+            equality.append(condition.field)
+        else:
+            ranges.append(condition.field)
+
+    keys = tuple((field_, ASCENDING) for field_ in sorted(equality) + sorted(ranges))
+    return [keys] if keys else []
+
+
+def propose_indexes(filters: Iterable[FilterCreateSchema]) -> list[IndexProposal]:
+    """
+    Analyse condition field/operator combinations across filters.
+
+    Indexes that are a prefix of another proposed index are dropped as
+    redundant, since MongoDB can use the longer index for both.
+
+    Args:
+        filters (Iterable[FilterCreateSchema]): Stored filter definitions.
+
+    Returns:
+        list[IndexProposal]: Proposed indexes, sorted by key.
+    """
+    wanted: dict[IndexKeys, set[str]] = {}
+    for filter_data in filters:
+        for group in filter_data.conditions:
+            for keys in _group_index_keys(group.conditions, group.logical_operator):
+                wanted.setdefault(keys, set()).add(filter_data.name)
+
+    def is_prefix(keys: IndexKeys, other: IndexKeys) -> bool:
+        return len(other) > len(keys) and other[: len(keys)] == keys
+
+    proposals = [
+        keys for keys in wanted if not any(is_prefix(keys, other) for other in wanted)
+    ]
+    return [
+        IndexProposal(
+            keys=keys,
+            filters=tuple(
+                sorted(
+                    name
+                    for other, names in wanted.items()
+                    if other == keys or is_prefix(other, keys)
+                    for name in names
+                )
+            ),
+        )
+        for keys in sorted(proposals)
+    ]
+
+
+def _normalize_keys(keys) -> IndexKeys:
+    return tuple(
+        (field_, int(direction) if isinstance(direction, float) else direction)
+        for field_, direction in keys
+    )
+
+
+def _covers(keys: IndexKeys, proposal: IndexKeys) -> bool:
+    # An index whose leading fields are the proposal's serves the same
+    # predicates; key directions do not matter for filtering.
+    head = keys[: len(proposal)]
+    return len(head) == len(proposal) and all(
+        field_ == wanted and direction in (1, -1)
+        for (field_, direction), (wanted, _) in zip(head, proposal)
+    )
+
+
+def _is_indexed(field_: str, indexes: Iterable[IndexKeys]) -> bool:
+    # Text indexes (direction "text") only serve `$text`, not plain predicates.
+    return any(
+        keys and keys[0][0] == field_ and keys[0][1] in (1, -1) for keys in indexes
+    )
+
+
+def find_scanning_filters(
+    filters: Iterable[FilterCreateSchema], indexes: Iterable[IndexKeys]
+) -> list[str]:
+    """
+    Report the filters MongoDB cannot answer without a collection scan.
+
+    An AND group is served when at least one of its indexable conditions
+    leads an index (text conditions always use the text index); an OR
+    group only when every branch does. The same rule is applied to the
+    groups under the filter's top-level operator.
+
+    Args:
+        filters (Iterable[FilterCreateSchema]): Stored filter definitions.
+        indexes (Iterable[IndexKeys]): Key patterns of the available indexes.
+
+    Returns:
+        list[str]: Names of the filters that still scan.
+    """
+    indexes = list(indexes)
+
+    def condition_served(condition) -> bool:
+        if condition.operator == Operator.TEXT:
+            return True
+        return condition.operator in INDEXABLE_OPERATORS and _is_indexed(
+            condition.field, indexes
+        )
+
+    def combine(results: list[bool], logical_operator: LogicalOperator) -> bool:
+        return all(results) if logical_operator == LogicalOperator.OR else any(results)
+
+    scanning = []
+    for filter_data in filters:
+        groups_served = [
+            combine(
+                [condition_served(c) for c in group.conditions],
+                group.logical_operator,
+            )
+            for group in filter_data.conditions
+        ]
+        if not combine(groups_served, filter_data.logical_operator):
+            scanning.append(filter_data.name)
+    return scanning
+
+
+async def sync_indexes(apply: bool = True) -> IndexReport:
+    """
+    Compare stored filters with the indexes on the `products` collection.
+
+    With `apply=True` the missing proposed indexes are created and
+    advisor-managed indexes (prefixed with `auto_`) that no filter needs any
+    more are dropped. A proposal is not built, and its `auto_` index is
+    dropped, when another index starts with the same fields. Indexes
+    declared on the `Product` model are never touched.
+
+    Args:
+        apply (bool): Build and drop indexes instead of only reporting.
+
+    Returns:
+        IndexReport: Proposals, changes made and filters that still scan.
+    """
+    filters = []
+    for filter_ in await Filter.find_all().to_list():
+        try:
+            filters.append(FilterCreateSchema.model_validate(filter_, context=STORED))
+        except ValidationError as exc:
+            logger.warning("Skipping unreadable filter '%s': %s", filter_.name, exc)
+    collection = Product.get_pymongo_collection()
+    index_info = await collection.index_information()
+
+    proposals = propose_indexes(filters)
+    report = IndexReport(proposals=proposals, existing=sorted(index_info))
+    indexes = {
+        name: _normalize_keys(info["key"]) for name, info in index_info.items()
+    }
+
+    if apply:
+        proposed = {proposal.name for proposal in proposals}
+        # Only indexes that outlive this run can cover a proposal.
+        kept = {
+            name: keys
+            for name, keys in indexes.items()
+            if not name.startswith(AUTO_INDEX_PREFIX) or name in proposed
+        }
+        covered = {
+            proposal.name
+            for proposal in proposals
+            if any(
+                name != proposal.name and _covers(keys, proposal.keys)
+                for name, keys in kept.items()
+            )
+        }
+        for proposal in proposals:
+            if proposal.name in covered or proposal.name in indexes:
+                continue
+            try:
+                await collection.create_index(list(proposal.keys), name=proposal.name)
+            except OperationFailure as exc:
+                logger.warning("Could not build index %s: %s", proposal.name, exc)
+                report.failed[proposal.name] = str(exc)
+                continue
+            indexes[proposal.name] = proposal.keys
+            report.created.append(proposal.name)
+
+        needed = proposed - covered
+        for name in list(indexes):
+            if name.startswith(AUTO_INDEX_PREFIX) and name not in needed:
+                await collection.drop_index(name)
+                del indexes[name]
+                report.dropped.append(name)
+
+    report.scanning_filters = find_scanning_filters(filters, indexes.values())
+    return report
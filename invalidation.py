@@ -0,0 +1,383 @@
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import bson
+from pymongo.errors import OperationFailure, PyMongoError
+
+from cache import compiled_filter_cache, invalidate_product_caches
+from models.filters import Filter
+from models.products import Product
+from settings import settings
+from snapshot import snapshot_engine
+
+logger = logging.getLogger(__name__)
+
+# Server error codes meaning "no change streams here" (standalone mongod)
+# and "resume token no longer in the oplog".
+CHANGE_STREAMS_UNSUPPORTED = {40573}
+CHANGE_STREAM_HISTORY_LOST = {280, 286}
+DOCUMENT_OPERATIONS = {"insert", "update", "replace", "delete"}
+TOKEN_SAVE_EVERY = 100
+# Above this many pending product IDs the whole product cache is cleared.
+DEBOUNCE_MAX_IDS = 1000
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """
+    A write observed on a collection.
+
+    Attributes:
+        collection (str): Name of the collection written to.
+        operation (str): Change stream `operationType`, or `poll` when a
+            polling source only knows that something changed.
+        document_id (Any): `_id` of the written document, or None when the
+            whole collection must be considered changed.
+    """
+
+    collection: str
+    operation: str
+    document_id: Any = None
+
+
+Subscriber = Callable[[ChangeEvent], Awaitable[None]]
+
+
+class InvalidationBus:
+    """
+    In-process publish/subscribe for `ChangeEvent`s, keyed by collection.
+
+    A failing subscriber is logged and does not stop the others.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: dict[str, list[Subscriber]] = {}
+        self.published = 0
+
+    def subscribe(self, collection: str, subscriber: Subscriber) -> None:
+        self._subscribers.setdefault(collection, []).append(subscriber)
+
+    async def publish(self, event: ChangeEvent) -> None:
+        self.published += 1
+        for subscriber in self._subscribers.get(event.collection, []):
+            try:
+                await subscriber(event)
+            except Exception:
+                logger.exception("Invalidation subscriber failed for %s.", event)
+
+
+class ChangeStreamsUnsupported(Exception):
+    """
+    Raised by `ChangeStreamSource` when the deployment has no change streams.
+    """
+
+
+class ResumeTokenStore:
+    """
+    In-memory resume token storage; `MongoResumeTokenStore` persists them.
+    """
+
+    def __init__(self) -> None:
+        self._tokens: dict[str, Any] = {}
+
+    async def load(self, name: str) -> Optional[Any]:
+        return self._tokens.get(name)
+
+    async def save(self, name: str, token: Any) -> None:
+        self._tokens[name] = token
+
+
+class MongoResumeTokenStore(ResumeTokenStore):
+    """
+    Resume tokens kept in a MongoDB collection, one document per watched
+    collection, so a restarted instance continues where it stopped.
+    """
+
+    def __init__(self, collection) -> None:
+        super().__init__()
+        self.collection = collection
+
+    async def load(self, name: str) -> Optional[Any]:
+        document = await self.collection.find_one({"_id": name})
+        return document["token"] if document else None
+
+    async def save(self, name: str, token: Any) -> None:
+        await self.collection.update_one(
+            {"_id": name},
+            {"$set": {"token": token, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+
+def change_to_event(collection: str, change: dict) -> ChangeEvent:
+    operation = change.get("operationType", "")
+    document_id = None
+    if operation in DOCUMENT_OPERATIONS:
+        document_id = change.get("documentKey", {}).get("_id")
+    return ChangeEvent(collection, operation, document_id)
+
+
+class ChangeStreamSource:
+    """
+    Tails a collection's change stream, resuming from the stored token.
+
+    Tokens are saved when the stream goes idle and every
+    `TOKEN_SAVE_EVERY` events rather than after each one. After a restart
+    a few events may therefore be delivered again, which is harmless for
+    invalidation. If the stored token has fallen off the oplog, the stream
+    restarts from now and a collection-wide event is emitted for whatever
+    was missed.
+    """
+
+    def __init__(self, collection, tokens: ResumeTokenStore) -> None:
+        self.collection = collection
+        self.tokens = tokens
+
+    async def events(self) -> AsyncIterator[ChangeEvent]:
+        name = self.collection.name
+        token = await self.tokens.load(name)
+        while True:
+            try:
+                stream = await self.collection.watch(resume_after=token)
+            except NotImplementedError as exc:
+                raise ChangeStreamsUnsupported(str(exc)) from exc
+            except OperationFailure as exc:
+                if exc.code in CHANGE_STREAMS_UNSUPPORTED:
+                    raise ChangeStreamsUnsupported(str(exc)) from exc
+                if token is None or exc.code not in CHANGE_STREAM_HISTORY_LOST:
+                    raise
+                logger.warning("Resume token for '%s' expired; restarting.", name)
+                token = None
+                await self.tokens.save(name, None)
+                yield ChangeEvent(name, "history_lost")
+                continue
+
+            unsaved = 0
+            invalidated = False
+            async with stream:
+                while stream.alive and not invalidated:
+                    change = await stream.try_next()
+                    if change is not None:
+                        event = change_to_event(name, change)
+                        invalidated = event.operation == "invalidate"
+                        yield event
+                        unsaved += 1
+                    token = stream.resume_token
+                    if unsaved and (change is None or unsaved >= TOKEN_SAVE_EVERY):
+                        await self.tokens.save(name, token)
+                        unsaved = 0
+            if invalidated:
+                # An invalidated stream cannot be resumed; start from now.
+                token = None
+                await self.tokens.save(name, None)
+            elif unsaved:
+                await self.tokens.save(name, token)
+
+
+class PollingSource:
+    """
+    Fallback for deployments without change streams.
+
+    Every `interval` seconds the collection fingerprint is compared with
+    the previous one and a collection-wide event is emitted on change. The
+    fingerprint is the server's `dbHash` of the collection, or a hash of
+    all documents where `dbHash` is unavailable. Both read the whole
+    collection and `dbHash` blocks writes while it runs, so polling is only
+    used when configured explicitly.
+    """
+
+    def __init__(self, collection, interval: float) -> None:
+        self.collection = collection
+        self.interval = interval
+
+    async def fingerprint(self) -> str:
+        name = self.collection.name
+        try:
+            result = await self.collection.database.command(
+                "dbHash", collections=[name]
+            )
+            return result["collections"].get(name, "")
+        except (NotImplementedError, OperationFailure, KeyError):
+            digest = hashlib.md5()
+            async for document in self.collection.find({}).sort("_id", 1):
+                digest.update(bson.encode(document))
+            return digest.hexdigest()
+
+    async def events(self) -> AsyncIterator[ChangeEvent]:
+        previous = await self.fingerprint()
+        while True:
+            await asyncio.sleep(self.interval)
+            current = await self.fingerprint()
+            if current != previous:
+                previous = current
+                yield ChangeEvent(self.collection.name, "poll")
+
+
+class LocalChangeSource:
+    """
+    In-process stand-in for a change stream, fed through `emit`.
+
+    Used in tests and anywhere writes are known locally.
+    """
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[ChangeEvent] = asyncio.Queue()
+
+    def emit(self, event: ChangeEvent) -> None:
+        self._queue.put_nowait(event)
+
+    async def events(self) -> AsyncIterator[ChangeEvent]:
+        while True:
+            yield await self._queue.get()
+
+
+class InvalidationWatcher:
+    """
+    Runs one background task per source and publishes its events.
+
+    With `poll_fallback`, a `ChangeStreamSource` that turns out to be
+    unsupported is replaced by a `PollingSource` on the same collection;
+    otherwise that source stops with an error. Other driver errors are
+    logged and the source is reopened after `retry_seconds`.
+    """
+
+    def __init__(
+        self,
+        bus: InvalidationBus,
+        sources: list,
+        poll_seconds: float = 5.0,
+        poll_fallback: bool = True,
+        retry_seconds: float = 1.0,
+    ) -> None:
+        self.bus = bus
+        self.sources = sources
+        self.poll_seconds = poll_seconds
+        self.poll_fallback = poll_fallback
+        self.retry_seconds = retry_seconds
+        self._tasks: list[asyncio.Task] = []
+
+    async def _run(self, source) -> None:
+        while True:
+            try:
+                async for event in source.events():
+                    await self.bus.publish(event)
+            except ChangeStreamsUnsupported:
+                if not self.poll_fallback:
+                    logger.error(
+                        "Change streams unavailable for '%s'; not watching it.",
+                        source.collection.name,
+                    )
+                    return
+                logger.info(
+                    "Change streams unavailable for '%s'; polling every %ss.",
+                    source.collection.name,
+                    self.poll_seconds,
+                )
+                source = PollingSource(source.collection, self.poll_seconds)
+                continue
+            except PyMongoError:
+                logger.exception("Invalidation source failed; retrying.")
+            await asyncio.sleep(self.retry_seconds)
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._run(s)) for s in self.sources]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+class ProductInvalidator:
+    """
+    Bus subscriber that coalesces product events into one invalidation per
+    `delay` seconds.
+
+    Each invalidation clears the count and facet caches and dirties the
+    snapshot, so doing it per event would keep those caches empty for the
+    whole of a bulk import. Instead, the `_id`s seen during the window are
+    dropped from the product cache together; a collection-wide event or
+    more than `max_ids` pending IDs clears it entirely.
+    """
+
+    def __init__(self, delay: float, max_ids: int = DEBOUNCE_MAX_IDS) -> None:
+        self.delay = delay
+        self.max_ids = max_ids
+        self._ids: set = set()
+        self._everything = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def __call__(self, event: ChangeEvent) -> None:
+        if event.document_id is None or len(self._ids) >= self.max_ids:
+            self._everything = True
+            self._ids.clear()
+        elif not self._everything:
+            self._ids.add(event.document_id)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.delay)
+        self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        ids, everything = self._ids, self._everything
+        self._ids, self._everything = set(), False
+        if not ids and not everything:
+            return
+        await invalidate_product_caches(None if everything else ids)
+        snapshot_engine.request_refresh()
+
+
+invalidate_products = ProductInvalidator(settings.INVALIDATION_DEBOUNCE_SECONDS)
+
+
+async def invalidate_filters(event: ChangeEvent) -> None:
+    # Compiled filters are keyed by name, which delete events do not carry.
+    compiled_filter_cache.clear()
+    # The snapshot only holds the fields stored filters use.
+    snapshot_engine.request_refresh()
+
+
+bus = InvalidationBus()
+bus.subscribe(Product.Settings.name, invalidate_products)
+bus.subscribe(Filter.Settings.name, invalidate_filters)
+
+
+def build_watcher(mode: str = settings.INVALIDATION_MODE) -> InvalidationWatcher:
+    """
+    Create the watcher for the `products` and `filters` collections.
+
+    Args:
+        mode (str): `change_stream`, `auto` (change streams, polling where
+            unsupported) or `poll`. Polling reads the whole collection every
+            `INVALIDATION_POLL_SECONDS`, see `PollingSource`.
+
+    Returns:
+        InvalidationWatcher: The watcher, not yet started.
+    """
+    collections = [
+        Product.get_pymongo_collection(),
+        Filter.get_pymongo_collection(),
+    ]
+    if mode == "poll":
+        sources = [
+            PollingSource(c, settings.INVALIDATION_POLL_SECONDS) for c in collections
+        ]
+    else:
+        tokens = MongoResumeTokenStore(
+            collections[0].database[settings.INVALIDATION_TOKEN_COLLECTION]
+        )
+        sources = [ChangeStreamSource(c, tokens) for c in collections]
+    return InvalidationWatcher(
+        bus,
+        sources,
+        poll_seconds=settings.INVALIDATION_POLL_SECONDS,
+        poll_fallback=mode == "auto",
+    )
@@ -2,14 +2,29 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from database import init_db
-from routes import products, filters, search
+from database import close_db, init_db
+from invalidation import build_watcher
+from metrics import MetricsMiddleware
+from routes import admin, export, facets, metrics, products, filters, search
+from settings import settings
+from snapshot import snapshot_engine
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    if settings.SNAPSHOT_ENABLED:
+        snapshot_engine.start()
+    watcher = None
+    if settings.INVALIDATION_MODE != "off":
+        watcher = build_watcher()
+        watcher.start()
     yield
+    if watcher is not None:
+        await watcher.stop()
+    await snapshot_engine.stop()
+    await close_db()
+
 app = FastAPI(title="Product Catalog", lifespan=lifespan)
 
 api_version_prefix = "/api/v1"
@@ -22,4 +37,17 @@ app.include_router(
 )
 app.include_router(
     search.router, prefix=f"{api_version_prefix}/search", tags=["search"]
-)
\ No newline at end of file
+)
+app.include_router(
+    facets.router, prefix=f"{api_version_prefix}/facets", tags=["facets"]
+)
+app.include_router(
+    export.router, prefix=f"{api_version_prefix}/export", tags=["export"]
+)
+app.include_router(
+    admin.router, prefix=f"{api_version_prefix}/admin", tags=["admin"]
+)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router, tags=["metrics"])
@@ -0,0 +1,261 @@
+import time
+from bisect import bisect_left
+from collections.abc import Mapping
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+UNMATCHED_ROUTE = "unmatched"
+
+
+@dataclass
+class RequestStats:
+    """
+    Database work attributed to the request being served.
+
+    Attributes:
+        db_commands (int): MongoDB commands sent.
+        db_seconds (float): Time spent in those commands, as measured by
+            the driver.
+        documents (int): Documents returned by `find`, `getMore` and
+            `aggregate` cursors.
+    """
+
+    db_commands: int = 0
+    db_seconds: float = 0.0
+    documents: int = 0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request", default=None
+)
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus sense.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return result
+
+
+@dataclass
+class RouteMetrics:
+    requests: int = 0
+    db_commands: int = 0
+    db_seconds: float = 0.0
+    documents: int = 0
+    response_bytes: int = 0
+
+
+class MetricsRegistry:
+    """
+    In-process store of per-route request metrics.
+
+    Routes are labelled with their path template (e.g.
+    `/api/v1/products/{product_id}/`), so label cardinality stays bounded.
+    """
+
+    def __init__(self) -> None:
+        self.latency: dict[tuple[str, str, str], Histogram] = {}
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+
+    def record(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        stats: RequestStats,
+        response_bytes: int,
+    ) -> None:
+        key = (method, route, str(status))
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram()
+        histogram.observe(seconds)
+
+        totals = self.routes.get((method, route))
+        if totals is None:
+            totals = self.routes[(method, route)] = RouteMetrics()
+        totals.requests += 1
+        totals.db_commands += stats.db_commands
+        totals.db_seconds += stats.db_seconds
+        totals.documents += stats.documents
+        totals.response_bytes += response_bytes
+
+    def clear(self) -> None:
+        self.latency.clear()
+        self.routes.clear()
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition, ending with a newline.
+        """
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), histogram in sorted(self.latency.items()):
+            labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+            for bound, count in histogram.cumulative():
+                lines.append(
+                    f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                )
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram.sum}")
+            lines.append(
+                f"http_request_duration_seconds_count{{{labels}}} {histogram.count}"
+            )
+
+        counters = (
+            ("mongo_commands_total", "MongoDB commands sent.", "db_commands"),
+            (
+                "mongo_command_duration_seconds_total",
+                "Time spent in MongoDB commands.",
+                "db_seconds",
+            ),
+            (
+                "mongo_documents_returned_total",
+                "Documents returned by MongoDB cursors.",
+                "documents",
+            ),
+            (
+                "http_response_bytes_total",
+                "Serialized response body bytes.",
+                "response_bytes",
+            ),
+        )
+        for name, description, attribute in counters:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for (method, route), totals in sorted(self.routes.items()):
+                labels = f'method="{method}",route="{_escape(route)}"'
+                lines.append(f"{name}{{{labels}}} {getattr(totals, attribute)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = MetricsRegistry()
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Command listener adding each MongoDB round trip to the current request.
+
+    The async driver publishes events from the task running the command,
+    so `current_request` resolves to the request that issued it. Commands
+    run outside a request (startup, CLI tools) are ignored.
+    """
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        stats = current_request.get()
+        if stats is None:
+            return
+        stats.db_commands += 1
+        stats.db_seconds += event.duration_micros / 1_000_000
+        reply = event.reply
+        cursor = reply.get("cursor") if isinstance(reply, Mapping) else None
+        if cursor:
+            batch = cursor.get("firstBatch", cursor.get("nextBatch", []))
+            stats.documents += len(batch)
+
+    def failed(self, event) -> None:
+        stats = current_request.get()
+        if stats is None:
+            return
+        stats.db_commands += 1
+        stats.db_seconds += event.duration_micros / 1_000_000
+
+
+command_metrics = CommandMetrics()
+
+
+def server_timing(stats: RequestStats, elapsed: float) -> str:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.db_commands} commands", '
+        f"app;dur={elapsed * 1000:.2f}"
+    )
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, database work and response size for
+    every HTTP request, and adding a `Server-Timing` header.
+
+    `Server-Timing` is written with the response headers, so for streamed
+    responses it covers the work done before the first byte.
+    """
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry = registry) -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+        response_bytes = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    server_timing(stats, time.perf_counter() - started),
+                )
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            self.registry.record(
+                scope["method"],
+                getattr(route, "path_format", UNMATCHED_ROUTE),
+                status,
+                time.perf_counter() - started,
+                stats,
+                response_bytes,
+            )
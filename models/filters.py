@@ -9,6 +9,7 @@ class Filter(Document):
     name: Indexed(str, unique=True)
     conditions: list[dict[str, Any]]
     logical_operator: LogicalOperator = LogicalOperator.AND
+    revision: int = 0
 
     class Settings:
         name = "filters"
@@ -2,12 +2,14 @@ from decimal import Decimal
 from beanie import Document, Indexed, PydanticObjectId
 from bson import Decimal128
 from pydantic import Field, field_validator
+from pymongo import ASCENDING, TEXT, IndexModel
 
 
 class Product(Document):
     id: PydanticObjectId = Field(default_factory=PydanticObjectId)
     name: Indexed(str, unique=True)
     price: Decimal
+    revision: int = 0
 
     @field_validator("price", mode="before")
     @classmethod
@@ -18,6 +20,11 @@ class Product(Document):
 
     class Settings:
         name = "products"
+        indexes = [
+            IndexModel([("name", TEXT)], name="name_text"),
+            IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price_id"),
+            IndexModel([("price", ASCENDING), ("name", ASCENDING)], name="price_name"),
+        ]
 
     class Config:
         extra = "allow"
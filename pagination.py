@@ -0,0 +1,648 @@
+import base64
+import binascii
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Hashable, Iterable, Optional, Sequence
+from urllib.parse import urlencode
+
+from beanie import SortDirection
+from bson import Decimal128, ObjectId, json_util
+from bson.errors import InvalidId
+from cache import count_cache
+from fastapi import HTTPException
+from models.products import Product
+from query_optimizer import matches_nothing
+from schemas.products import (
+    CountStrategy,
+    ProductListResponseSchema,
+    ProductResponseSchema,
+)
+from settings import settings
+from snapshot import SnapshotMatch, snapshot_engine
+
+logger = logging.getLogger(__name__)
+
+PROJECTION_BASE_FIELDS = ("name", "price")
+MAX_PROJECTION_FIELDS = 50
+MAX_SORT_KEYS = 4
+UNIQUE_SORT_FIELDS = ("_id", "name")
+
+# Types a cursor position may hold per sort key. Other keys, only sortable
+# with `SORT_ALLOW_UNINDEXED`, accept any scalar. Documents and arrays are
+# never accepted: they would reach the query as operators.
+CURSOR_VALUE_TYPES = {
+    "_id": (ObjectId,),
+    "name": (str,),
+    "price": (Decimal128, int, float),
+}
+SCALAR_CURSOR_TYPES = (
+    str, int, float, bool, Decimal128, ObjectId, datetime, type(None)
+)
+
+
+def encode_cursor(after: Sequence[Any], sort: str = "") -> str:
+    """
+    Encode the position after the last returned product as an opaque token.
+
+    Args:
+        after (Sequence[Any]): Values of the sort keys (ending with `_id`)
+            of the last product on the current page.
+        sort (str): The `sort` parameter the position belongs to.
+
+    Returns:
+        str: URL-safe token to pass back as the `cursor` query parameter.
+    """
+    values = [
+        Decimal128(value) if isinstance(value, Decimal) else value for value in after
+    ]
+    payload = {"after": values}
+    if sort:
+        payload["sort"] = sort
+    encoded = json_util.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(encoded.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: str = "") -> list[Any]:
+    """
+    Decode a token produced by `encode_cursor`.
+
+    Args:
+        token (str): The opaque cursor received from a client.
+        sort (str): The `sort` parameter of the current request.
+
+    Returns:
+        list[Any]: Sort key values of the last product the client has seen.
+
+    Raises:
+        ValueError: If the token is malformed or was issued for another sort.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+        if "id" in payload:
+            payload = {"after": [ObjectId(payload["id"])]}
+        after = payload["after"]
+        if not isinstance(after, list) or not after:
+            raise ValueError("Empty cursor position.")
+    except (binascii.Error, ValueError, TypeError, KeyError, InvalidId) as exc:
+        raise ValueError("Invalid pagination cursor.") from exc
+    if payload.get("sort", "") != sort:
+        raise ValueError("Pagination cursor was issued for a different sort.")
+    return after
+
+
+def parse_sort(sort: Optional[str]) -> list[tuple[str, int]]:
+    """
+    Turn a `sort=` query parameter into a MongoDB sort specification.
+
+    Keys are comma-separated, with a leading `-` for descending order; `id`
+    refers to `_id`. `_id` is appended as a tie-breaker unless a unique key
+    already makes the order total, which keyset pagination relies on. The
+    result must be served by one of `sort_indexes()`, read forwards or
+    backwards; otherwise the request is rejected, or only logged when
+    `SORT_ALLOW_UNINDEXED` is set.
+
+    Args:
+        sort (Optional[str]): The raw parameter, if given.
+
+    Returns:
+        list[tuple[str, int]]: `(field, direction)` pairs, empty for none.
+
+    Raises:
+        HTTPException: 400 if a key is invalid or no index serves the sort.
+    """
+    if not sort:
+        return []
+
+    spec: list[tuple[str, int]] = []
+    for key in (key.strip() for key in sort.split(",")):
+        descending = key.startswith("-")
+        direction = -1 if descending else 1
+        name = key.lstrip("+-")
+        name = "_id" if name == "id" else name
+        if not name or name.startswith("$") or name in (k for k, _ in spec):
+            raise HTTPException(status_code=400, detail=f"Invalid sort key '{key}'.")
+        spec.append((name, direction))
+        if name in UNIQUE_SORT_FIELDS:
+            break
+    if len(spec) > MAX_SORT_KEYS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_SORT_KEYS} sort keys are allowed."
+        )
+    if spec[-1][0] not in UNIQUE_SORT_FIELDS:
+        spec.append(("_id", spec[-1][1]))
+
+    if not _sort_is_indexed(spec):
+        message = f"Sort '{sort}' is not backed by an index on the products collection."
+        if not settings.SORT_ALLOW_UNINDEXED:
+            raise HTTPException(status_code=400, detail=message)
+        logger.warning("%s It will be sorted in memory by MongoDB.", message)
+    return spec
+
+
+def sort_indexes() -> list[tuple[tuple[str, int], ...]]:
+    """
+    Key patterns that can serve a sort: `_id`, the unique `name` index and
+    the ascending/descending indexes declared on `Product.Settings`.
+    """
+    patterns = [(("_id", 1),), (("name", 1),)]
+    for index in Product.Settings.indexes:
+        keys = tuple(index.document["key"].items())
+        if all(direction in (1, -1) for _, direction in keys):
+            patterns.append(keys)
+    return patterns
+
+
+def _sort_is_indexed(spec: list[tuple[str, int]]) -> bool:
+    reverse = [(key, -direction) for key, direction in spec]
+    return any(
+        list(pattern[: len(spec)]) in (spec, reverse)
+        for pattern in sort_indexes()
+        if len(pattern) >= len(spec)
+    )
+
+
+def keyset_query(
+    query: dict, spec: list[tuple[str, int]], after: Optional[list[Any]]
+) -> dict:
+    """
+    Restrict a query to the documents that come after a keyset position.
+
+    For keys `k1..kn` the seek condition is `k1 > v1 OR (k1 = v1 AND k2 > v2)
+    OR ...` (`<` for descending keys), with a leading `k1 >= v1` bound so
+    the index scan starts at the position instead of the beginning.
+
+    Null and missing values sort first, so "after null" is any non-null
+    value ascending and nothing descending, while a descending seek past
+    a value also takes the nulls. `$not` keeps those bounds on the index.
+
+    Args:
+        query (dict): MongoDB query selecting the full result set.
+        spec (list[tuple[str, int]]): The sort specification, ending with a
+            unique key.
+        after (Optional[list[Any]]): Sort key values already returned, if any.
+
+    Returns:
+        dict: MongoDB query for the next page of the sorted result set.
+
+    Raises:
+        ValueError: If `after` does not fit `spec`.
+    """
+    if after is None:
+        return query
+    if len(after) != len(spec):
+        raise ValueError("Invalid pagination cursor.")
+    for (key, _), value in zip(spec, after):
+        allowed = CURSOR_VALUE_TYPES.get(key, SCALAR_CURSOR_TYPES)
+        if not isinstance(value, allowed) or (
+            isinstance(value, bool) and bool not in allowed
+        ):
+            raise ValueError("Invalid pagination cursor.")
+
+    def beyond(direction: int, value: Any) -> Optional[dict]:
+        if direction == SortDirection.ASCENDING:
+            return {"$ne": None} if value is None else {"$gt": value}
+        return None if value is None else {"$not": {"$gte": value}}
+
+    branches = []
+    for i, (key, direction) in enumerate(spec):
+        condition = beyond(direction, after[i])
+        if condition is None:
+            continue
+        branch = {spec[j][0]: after[j] for j in range(i)}
+        branch[key] = condition
+        branches.append(branch)
+
+    first, direction = spec[0]
+    if direction == SortDirection.ASCENDING:
+        bound = None if after[0] is None else {"$gte": after[0]}
+    else:
+        bound = None if after[0] is None else {"$not": {"$gt": after[0]}}
+
+    if len(branches) == 1:
+        seek = branches[0]
+    else:
+        seek = {"$or": branches}
+        if bound is not None:
+            seek[first] = bound
+        elif after[0] is None and direction != SortDirection.ASCENDING:
+            seek[first] = None
+    return {"$and": [query, seek]} if query else seek
+
+
+def _sort_values(product: ProductResponseSchema, spec: list[tuple[str, int]]) -> list:
+    data = product.model_dump()
+    data["_id"] = data.pop("id")
+    values = []
+    for key, _ in spec:
+        value = data
+        for part in key.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        values.append(value)
+    return values
+
+
+async def count_products(
+    query: dict,
+    strategy: CountStrategy = CountStrategy.EXACT,
+    cache_key: Optional[Hashable] = None,
+) -> Optional[int]:
+    """
+    Count the products matching `query` using the given strategy.
+
+    - `exact`: run a full `count` on every call.
+    - `estimated`: use collection metadata for the unfiltered listing;
+      filtered queries fall back to `cached`.
+    - `cached`: reuse a count computed within the last `COUNT_CACHE_TTL`
+      seconds for the same `cache_key` (or the query itself).
+    - `none`: skip counting altogether.
+
+    Args:
+        query (dict): MongoDB query selecting the products.
+        strategy (CountStrategy): How to obtain the total.
+        cache_key (Optional[Hashable]): Key identifying `query` in the count
+            cache, e.g. a compiled filter's `cache_key`.
+
+    Returns:
+        Optional[int]: The (possibly approximate) total, or None for `none`.
+    """
+    if strategy == CountStrategy.NONE:
+        return None
+
+    if matches_nothing(query):
+        return 0
+
+    if strategy == CountStrategy.ESTIMATED and not query:
+        return await Product.get_pymongo_collection().estimated_document_count()
+
+    if strategy == CountStrategy.EXACT:
+        return await Product.find(query).count()
+
+    key = cache_key if cache_key is not None else repr(query)
+    total_items = count_cache.get(key)
+    if total_items is None:
+        total_items = await Product.find(query).count()
+        count_cache.set(key, total_items)
+    return total_items
+
+
+def check_field_paths(paths: Iterable[str]) -> None:
+    """
+    Check that `paths` can be used together in a MongoDB projection.
+
+    Every path must be a plain dotted document path, with no empty segment
+    and no segment starting with `$`, and no path may be the parent of
+    another: `a` with `a.b` is a path collision the server rejects.
+
+    Args:
+        paths (Iterable[str]): Document paths.
+
+    Raises:
+        ValueError: If a path is invalid or two paths overlap.
+    """
+    unique = set()
+    for path in paths:
+        segments = path.split(".")
+        if not all(segment and not segment.startswith("$") for segment in segments):
+            raise ValueError(f"Invalid field name '{path}'.")
+        unique.add(path)
+    for path in unique:
+        segments = path.split(".")
+        for end in range(1, len(segments)):
+            parent = ".".join(segments[:end])
+            if parent in unique:
+                raise ValueError(f"Fields '{parent}' and '{path}' overlap.")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[dict]:
+    """
+    Turn a `fields=` query parameter into a MongoDB projection.
+
+    `id`, `name` and `price` are always returned since every product
+    response carries them; the listed fields are added on top.
+
+    Args:
+        fields (Optional[str]): Comma-separated field names, if requested.
+
+    Returns:
+        Optional[dict]: Projection for `find`, or None to load whole documents.
+
+    Raises:
+        HTTPException: 400 if a field name is not a plain document path,
+            overlaps another one or too many fields are requested.
+    """
+    if fields is None:
+        return None
+
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if len(names) > MAX_PROJECTION_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_PROJECTION_FIELDS} fields can be requested.",
+        )
+    names = [name for name in names if name != "id"]
+    try:
+        check_field_paths(["_id", *PROJECTION_BASE_FIELDS, *names])
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    projection = {name: 1 for name in PROJECTION_BASE_FIELDS}
+    projection.update({name: 1 for name in names})
+    return projection
+
+
+def document_to_response(document: dict) -> ProductResponseSchema:
+    """
+    Validate a raw `products` document straight into the response schema.
+
+    Args:
+        document (dict): Document as returned by the MongoDB driver.
+
+    Returns:
+        ProductResponseSchema: The product as sent to clients.
+    """
+    document["id"] = document.pop("_id")
+    price = document.get("price")
+    if isinstance(price, Decimal128):
+        document["price"] = price.to_decimal()
+    return ProductResponseSchema.model_validate(document)
+
+
+async def fetch_products(
+    query: dict,
+    limit: int,
+    skip: int = 0,
+    sort: Optional[list] = None,
+    projection: Optional[dict] = None,
+) -> list[ProductResponseSchema]:
+    """
+    Read products for a response without building `Product` documents.
+
+    Raw documents are validated once into `ProductResponseSchema` instead
+    of going through `Product` and `model_dump()` first.
+
+    Args:
+        query (dict): MongoDB query selecting the products.
+        limit (int): Maximum number of products to return.
+        skip (int): Number of matching products to skip.
+        sort (Optional[list]): `(field, direction)` pairs to sort by.
+        projection (Optional[dict]): Fields to load, or None for all.
+
+    Returns:
+        list[ProductResponseSchema]: The products, ready to serialize.
+    """
+    cursor = Product.get_pymongo_collection().find(query, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    documents = await cursor.skip(skip).limit(limit).to_list(None)
+    return [document_to_response(document) for document in documents]
+
+
+async def paginate_products(
+    query: dict,
+    base_url: str,
+    page: int,
+    per_page: int,
+    cursor: Optional[str] = None,
+    count: CountStrategy = CountStrategy.EXACT,
+    count_key: Optional[Hashable] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    use_snapshot: bool = False,
+) -> ProductListResponseSchema:
+    """
+    Fetch one page of products matching `query`.
+
+    Two modes are supported:
+
+    - page mode (`cursor` is None): classic `skip`/`limit` pagination with
+      `prev_page`/`next_page` links and totals obtained through `count`.
+      With `CountStrategy.NONE` totals are null and `next_page` is found
+      by fetching one extra row.
+    - cursor mode (`cursor` is a string, empty for the first page): keyset
+      pagination on the sort keys and `_id`. Every page costs the same
+      regardless of depth; `next_page` carries an opaque token and totals
+      are not computed.
+
+    Args:
+        query (dict): MongoDB query selecting the products.
+        base_url (str): Path used to build `prev_page`/`next_page` links.
+        page (int): Page number, used in page mode only.
+        per_page (int): Number of products per page.
+        cursor (Optional[str]): Opaque cursor from a previous `next_page`.
+        count (CountStrategy): How totals are computed in page mode.
+        count_key (Optional[Hashable]): Count cache key for `query`.
+        fields (Optional[str]): Comma-separated extra fields to return; the
+            projection is pushed down to MongoDB.
+        sort (Optional[str]): Comma-separated sort keys, see `parse_sort`.
+            Without it page mode returns natural order and cursor mode
+            `_id` order.
+        use_snapshot (bool): Answer unsorted requests from the in-memory
+            products snapshot when it is fresh enough and can evaluate
+            `query`; results are then in `_id` order in both modes, also
+            when MongoDB answers instead.
+
+    Returns:
+        ProductListResponseSchema: The requested page.
+
+    Raises:
+        HTTPException: 400 if the cursor, fields or sort are invalid,
+            404 if the page is empty.
+    """
+    projection = parse_fields(fields)
+    spec = parse_sort(sort)
+    link_params = {"per_page": per_page}
+    if fields is not None:
+        link_params["fields"] = fields
+    if sort:
+        link_params["sort"] = sort
+        if projection is not None:
+            projection.update({key: 1 for key, _ in spec})
+
+    if matches_nothing(query):
+        raise HTTPException(status_code=404, detail="No products found.")
+
+    if use_snapshot and not spec:
+        match = snapshot_engine.match(query)
+        if match is not None:
+            return await _paginate_snapshot(
+                match, base_url, page, per_page, cursor, count, projection, link_params
+            )
+        # Pages must keep the snapshot's order when one of them falls back
+        # to MongoDB, or rows repeat or go missing across the switch.
+        spec = [("_id", SortDirection.ASCENDING)]
+
+    if cursor is not None:
+        return await _paginate_by_cursor(
+            query,
+            base_url,
+            per_page,
+            cursor,
+            projection,
+            link_params,
+            spec or [("_id", SortDirection.ASCENDING)],
+            sort or "",
+        )
+
+    skip = (page - 1) * per_page
+    total_items = await count_products(query, count, count_key)
+
+    if count != CountStrategy.NONE and not total_items:
+        raise HTTPException(status_code=404, detail="No products found.")
+
+    limit = per_page + 1 if total_items is None else per_page
+    products = await fetch_products(
+        query, limit, skip=skip, sort=spec, projection=projection
+    )
+
+    if not products:
+        raise HTTPException(status_code=404, detail="No products found.")
+
+    if total_items is None:
+        total_pages = None
+        has_next = len(products) > per_page
+        products = products[:per_page]
+    else:
+        total_pages = (total_items + per_page - 1) // per_page
+        has_next = page < total_pages
+
+    if count != CountStrategy.EXACT:
+        link_params["count"] = count.value
+
+    return ProductListResponseSchema(
+        products=products,
+        prev_page=(
+            _page_url(base_url, page=page - 1, **link_params) if page > 1 else None
+        ),
+        next_page=(
+            _page_url(base_url, page=page + 1, **link_params) if has_next else None
+        ),
+        total_pages=total_pages,
+        total_items=total_items,
+    )
+
+
+def _page_url(base_url: str, **params) -> str:
+    return f"{base_url}?{urlencode(params, safe=',')}"
+
+
+async def _fetch_by_ids(
+    ids: list, projection: Optional[dict]
+) -> list[ProductResponseSchema]:
+    # Products deleted since the snapshot was taken are simply left out.
+    if not ids:
+        return []
+    return await fetch_products(
+        {"_id": {"$in": ids}},
+        len(ids),
+        sort=[("_id", SortDirection.ASCENDING)],
+        projection=projection,
+    )
+
+
+async def _paginate_snapshot(
+    match: SnapshotMatch,
+    base_url: str,
+    page: int,
+    per_page: int,
+    cursor: Optional[str],
+    count: CountStrategy,
+    projection: Optional[dict],
+    link_params: dict,
+) -> ProductListResponseSchema:
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor) if cursor else None
+            if after and (len(after) != 1 or not isinstance(after[0], ObjectId)):
+                raise ValueError("Invalid pagination cursor.")
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        start = match.position_after(after[0]) if after else 0
+        ids = match.page_ids(start, start + per_page + 1)
+        products = await _fetch_by_ids(ids[:per_page], projection)
+        if not products:
+            raise HTTPException(status_code=404, detail="No products found.")
+
+        has_next = len(ids) > per_page
+        return ProductListResponseSchema(
+            products=products,
+            prev_page=None,
+            next_page=(
+                _page_url(
+                    base_url, cursor=encode_cursor([products[-1].id]), **link_params
+                )
+                if has_next
+                else None
+            ),
+            total_pages=None,
+            total_items=None,
+        )
+
+    skip = (page - 1) * per_page
+    products = await _fetch_by_ids(match.page_ids(skip, skip + per_page), projection)
+    if not products:
+        raise HTTPException(status_code=404, detail="No products found.")
+
+    # The snapshot counts every match for free; `none` still hides totals.
+    total_items = len(match) if count != CountStrategy.NONE else None
+    total_pages = (len(match) + per_page - 1) // per_page
+    if count != CountStrategy.EXACT:
+        link_params["count"] = count.value
+
+    return ProductListResponseSchema(
+        products=products,
+        prev_page=(
+            _page_url(base_url, page=page - 1, **link_params) if page > 1 else None
+        ),
+        next_page=(
+            _page_url(base_url, page=page + 1, **link_params)
+            if page < total_pages
+            else None
+        ),
+        total_pages=total_pages if total_items is not None else None,
+        total_items=total_items,
+    )
+
+
+async def _paginate_by_cursor(
+    query: dict,
+    base_url: str,
+    per_page: int,
+    cursor: str,
+    projection: Optional[dict],
+    link_params: dict,
+    spec: list[tuple[str, int]],
+    sort: str,
+) -> ProductListResponseSchema:
+    try:
+        after = decode_cursor(cursor, sort) if cursor else None
+        seek_query = keyset_query(query, spec, after)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    products = await fetch_products(
+        seek_query, per_page + 1, sort=spec, projection=projection
+    )
+
+    if not products:
+        raise HTTPException(status_code=404, detail="No products found.")
+
+    has_next = len(products) > per_page
+    products = products[:per_page]
+
+    return ProductListResponseSchema(
+        products=products,
+        prev_page=None,
+        next_page=(
+            _page_url(
+                base_url,
+                cursor=encode_cursor(_sort_values(products[-1], spec), sort),
+                **link_params,
+            )
+            if has_next
+            else None
+        ),
+        total_pages=None,
+        total_items=None,
+    )
@@ -0,0 +1,297 @@
+from typing import Any, Iterator, Optional
+
+# A valid query that matches no document and is answered from the `_id`
+# index alone. Optimized queries that can never match are replaced by it.
+MATCH_NOTHING = {"_id": {"$in": []}}
+
+# Fields declared on the `Product` model with a single scalar value. Array
+# fields can satisfy `x == 1 AND x == 2` (e.g. `[1, 2]`), so contradictions
+# are only detected on these.
+SCALAR_FIELDS = frozenset({"_id", "name", "price"})
+
+LOWER_BOUNDS = ("$gt", "$gte")
+UPPER_BOUNDS = ("$lt", "$lte")
+
+
+def matches_nothing(query: dict) -> bool:
+    """
+    Tell whether `query` was reduced to `MATCH_NOTHING` by `optimize_query`.
+
+    Args:
+        query (dict): MongoDB query dictionary.
+
+    Returns:
+        bool: True if no document can match, so no query needs to run.
+    """
+    return query == MATCH_NOTHING
+
+
+def optimize_query(query: dict) -> dict:
+    """
+    Rewrite a MongoDB query into an equivalent, flatter one.
+
+    - single-child `$and`/`$or` are unwrapped and nested ones of the same
+      kind are spliced into their parent;
+    - predicates on the same field inside an AND are merged into one
+      operator document, keeping only the tightest bound per direction and
+      folding several `$ne` into `$nin`;
+    - equalities and `$in` on the same field inside an OR become one `$in`;
+    - AND groups that can never match (`x == 1 AND x == 2`, `x == 1 AND
+      x != 1`, empty ranges on scalar fields) become `MATCH_NOTHING`, and
+      OR branches that can never match are dropped.
+
+    Args:
+        query (dict): MongoDB query, e.g. the raw output of `build_query`.
+
+    Returns:
+        dict: The optimized query, or `MATCH_NOTHING`.
+    """
+    return _optimize(query)
+
+
+def _optimize(node: dict) -> dict:
+    if len(node) != 1:
+        return _optimize_and([{key: value} for key, value in node.items()])
+
+    ((key, value),) = node.items()
+    if key == "$and":
+        return _optimize_and(value)
+    if key == "$or":
+        return _optimize_or(value)
+    return node
+
+
+def _optimize_and(children: list[dict]) -> dict:
+    fields: dict[str, list[Any]] = {}
+    rest: list[dict] = []
+
+    for child in children:
+        child = _optimize(child)
+        if matches_nothing(child):
+            return MATCH_NOTHING
+        parts = child["$and"] if list(child) == ["$and"] else [child]
+        for part in parts:
+            for key, value in part.items():
+                if key.startswith("$"):
+                    rest.append({key: value})
+                else:
+                    fields.setdefault(key, []).append(value)
+
+    parts = []
+    for field, conditions in fields.items():
+        merged = _merge_field(field, conditions)
+        if merged is None:
+            return MATCH_NOTHING
+        parts.extend(merged)
+    parts.extend(rest)
+
+    combined: dict = {}
+    for part in parts:
+        if combined.keys() & part.keys():
+            return {"$and": parts}
+        combined.update(part)
+    return combined
+
+
+def _optimize_or(children: list[dict]) -> dict:
+    branches: list[dict] = []
+    for child in children:
+        child = _optimize(child)
+        if matches_nothing(child):
+            continue
+        branches.extend(child["$or"] if list(child) == ["$or"] else [child])
+
+    in_values: dict[str, list] = {}
+    for branch in branches:
+        field, values = _equality_values(branch)
+        if field is not None:
+            in_values.setdefault(field, [])
+            for value in values:
+                _append_unique(in_values[field], value)
+
+    merged: list[dict] = []
+    emitted = set()
+    for branch in branches:
+        field, _ = _equality_values(branch)
+        if field is None:
+            merged.append(branch)
+        elif field not in emitted:
+            emitted.add(field)
+            values = in_values[field]
+            merged.append(branch if len(values) == 1 else {field: {"$in": values}})
+
+    if not merged:
+        return MATCH_NOTHING
+    if len(merged) == 1:
+        return merged[0]
+    return {"$or": merged}
+
+
+def _equality_values(branch: dict) -> tuple[Optional[str], list]:
+    if len(branch) != 1:
+        return None, []
+    ((field, condition),) = branch.items()
+    if field.startswith("$"):
+        return None, []
+    if not _is_operator_document(condition):
+        return field, [condition]
+    if list(condition) == ["$eq"]:
+        return field, [condition["$eq"]]
+    if list(condition) == ["$in"] and isinstance(condition["$in"], list):
+        return field, condition["$in"]
+    return None, []
+
+
+def _is_operator_document(condition: Any) -> bool:
+    return (
+        isinstance(condition, dict)
+        and bool(condition)
+        and all(key.startswith("$") for key in condition)
+    )
+
+
+def _operators(condition: Any) -> Iterator[tuple[Optional[str], Any]]:
+    if not _is_operator_document(condition):
+        yield "$eq", condition
+    elif "$regex" in condition:
+        # `$options` only makes sense next to its `$regex`.
+        yield None, condition
+    else:
+        yield from condition.items()
+
+
+def _same(a: Any, b: Any) -> bool:
+    # MongoDB does not treat `true` as equal to `1` the way Python does.
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    return a == b
+
+
+def _append_unique(values: list, value: Any) -> None:
+    if not any(_same(value, existing) for existing in values):
+        values.append(value)
+
+
+def _kind(value: Any) -> Optional[str]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return None
+
+
+def _comparable(a: Any, b: Any) -> bool:
+    return _kind(a) is not None and _kind(a) == _kind(b)
+
+
+def _tightest(bounds: list[tuple[str, Any]], lower: bool) -> list[tuple[str, Any]]:
+    unique: list[tuple[str, Any]] = []
+    for bound in bounds:
+        if not any(op == bound[0] and _same(v, bound[1]) for op, v in unique):
+            unique.append(bound)
+    if len(unique) < 2 or not all(
+        _comparable(unique[0][1], value) for _, value in unique
+    ):
+        return unique
+
+    def tighter(a, b):
+        if a[1] == b[1]:
+            return a if a[0] in ("$gt", "$lt") else b
+        return a if (a[1] > b[1]) == lower else b
+
+    best = unique[0]
+    for bound in unique[1:]:
+        best = tighter(best, bound)
+    return [best]
+
+
+def _satisfies(value: Any, bound: tuple[str, Any]) -> Optional[bool]:
+    op, limit = bound
+    if not _comparable(value, limit):
+        return None
+    return {
+        "$gt": value > limit,
+        "$gte": value >= limit,
+        "$lt": value < limit,
+        "$lte": value <= limit,
+    }[op]
+
+
+def _merge_field(field: str, conditions: list[Any]) -> Optional[list[dict]]:
+    eqs, nes, ins, lower, upper, others = [], [], [], [], [], []
+    for condition in conditions:
+        for op, value in _operators(condition):
+            if op == "$eq":
+                _append_unique(eqs, value)
+            elif op == "$ne":
+                _append_unique(nes, value)
+            elif op == "$in" and isinstance(value, list):
+                ins.append(value)
+            elif op in LOWER_BOUNDS:
+                lower.append((op, value))
+            elif op in UPPER_BOUNDS:
+                upper.append((op, value))
+            elif op is None:
+                others.append(value)
+            else:
+                others.append({op: value})
+
+    # `x == v AND x != v` cannot match, whether `x` holds a scalar or an array.
+    if any(_same(eq, ne) for eq in eqs for ne in nes):
+        return None
+
+    lower, upper = _tightest(lower, lower=True), _tightest(upper, lower=False)
+
+    if field in SCALAR_FIELDS:
+        if len(eqs) > 1:
+            return None
+        if eqs:
+            eq = eqs[0]
+            if any(not any(_same(eq, v) for v in values) for values in ins):
+                return None
+            if any(_satisfies(eq, bound) is False for bound in lower + upper):
+                return None
+            # The equality implies every condition it could be checked against.
+            nes, ins = [], []
+            lower = [bound for bound in lower if _satisfies(eq, bound) is None]
+            upper = [bound for bound in upper if _satisfies(eq, bound) is None]
+        elif ins:
+            allowed = list(ins[0])
+            for values in ins[1:]:
+                allowed = [v for v in allowed if any(_same(v, o) for o in values)]
+            allowed = [v for v in allowed if not any(_same(v, ne) for ne in nes)]
+            if not allowed:
+                return None
+            ins, nes = [allowed], []
+        if len(lower) == 1 and len(upper) == 1:
+            (low_op, low), (high_op, high) = lower[0], upper[0]
+            if _comparable(low, high) and (
+                low > high or low == high and (low_op == "$gt" or high_op == "$lt")
+            ):
+                return None
+
+    operators: dict = {}
+    extra: list[dict] = []
+
+    def add(op_document: dict) -> None:
+        if operators.keys() & op_document.keys():
+            extra.append({field: op_document})
+        else:
+            operators.update(op_document)
+
+    for eq in eqs:
+        add({"$eq": eq})
+    if nes:
+        add({"$ne": nes[0]} if len(nes) == 1 else {"$nin": nes})
+    for values in ins:
+        add({"$in": values})
+    for op, value in lower + upper:
+        add({op: value})
+    for op_document in others:
+        add(op_document)
+
+    if list(operators) == ["$eq"] and not isinstance(operators["$eq"], dict):
+        return [{field: operators["$eq"]}] + extra
+    return [{field: operators}] + extra
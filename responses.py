@@ -0,0 +1,52 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    if isinstance(value, Decimal):
+        # Written as a JSON number with every digit kept, not via float.
+        return orjson.Fragment(str(value)) if value.is_finite() else str(value)
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize response content to JSON with orjson.
+
+    Pydantic models are dumped once in Python mode and encoded directly,
+    without the response-model validation and `jsonable_encoder` pass that
+    FastAPI applies to returned models. `Decimal` and `Decimal128` values are
+    written as exact JSON numbers and `ObjectId` as strings.
+
+    Args:
+        content (Any): A model, a list of models or plain JSON-like data.
+
+    Returns:
+        bytes: The encoded JSON document.
+    """
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    return orjson.dumps(content, default=_default)
+
+
+class ORJSONModelResponse(JSONResponse):
+    """
+    JSON response rendered with `dumps`.
+
+    Route handlers return it directly (with their `response_model` kept for
+    the OpenAPI schema), so FastAPI does not validate the content again.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
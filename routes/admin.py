@@ -0,0 +1,104 @@
+from typing import List
+from fastapi import APIRouter
+from cache import cache_stats
+from database import pool_stats
+from index_advisor import sync_indexes
+from schemas.admin import (
+    CacheStatsSchema,
+    IndexReportSchema,
+    PoolStatsSchema,
+    SnapshotStatsSchema,
+)
+from settings import settings
+from snapshot import snapshot_engine
+
+router = APIRouter()
+
+
+@router.get(
+    "/cache/",
+    response_model=List[CacheStatsSchema],
+    summary="Retrieve in-process cache statistics",
+    description=(
+        "Returns size, hit, miss, eviction and coalesced-load counters "
+        "for every cache of this API instance."
+    ),
+)
+async def get_cache_stats() -> List[CacheStatsSchema]:
+    return [CacheStatsSchema(**stats) for stats in cache_stats()]
+
+
+@router.get(
+    "/indexes/",
+    response_model=IndexReportSchema,
+    summary="Analyse indexes needed by stored filters",
+    description=(
+        "Analyses the field/operator combinations of all stored filters, "
+        "proposes single and compound indexes for the products collection "
+        "and reports which filters would still need a collection scan. "
+        "Nothing is changed in the database."
+    ),
+)
+async def get_index_report() -> IndexReportSchema:
+    report = await sync_indexes(apply=False)
+    return IndexReportSchema.model_validate(report)
+
+
+@router.post(
+    "/indexes/",
+    response_model=IndexReportSchema,
+    summary="Build indexes needed by stored filters",
+    description=(
+        "Creates the proposed indexes that are missing, drops advisor-managed "
+        "indexes no stored filter needs any more, and reports which filters "
+        "still need a collection scan."
+    ),
+)
+async def build_indexes() -> IndexReportSchema:
+    report = await sync_indexes(apply=True)
+    return IndexReportSchema.model_validate(report)
+
+
+@router.get(
+    "/pool/",
+    response_model=PoolStatsSchema,
+    summary="Retrieve MongoDB connection pool statistics",
+    description=(
+        "Returns connection pool counters of this API instance: connections "
+        "created, closed and checked out, and operations waiting for one."
+    ),
+)
+async def get_pool_stats() -> PoolStatsSchema:
+    return PoolStatsSchema(**pool_stats.snapshot())
+
+
+@router.get(
+    "/snapshot/",
+    response_model=SnapshotStatsSchema,
+    summary="Retrieve products snapshot statistics",
+    description=(
+        "Returns the size and age of the in-memory products snapshot used "
+        "for filter searches, and how many searches it answered or handed "
+        "back to MongoDB."
+    ),
+)
+async def get_snapshot_stats() -> SnapshotStatsSchema:
+    return SnapshotStatsSchema(
+        enabled=settings.SNAPSHOT_ENABLED, **snapshot_engine.stats()
+    )
+
+
+@router.post(
+    "/snapshot/",
+    response_model=SnapshotStatsSchema,
+    summary="Rebuild the products snapshot",
+    description=(
+        "Reloads the in-memory products snapshot from MongoDB now instead "
+        "of waiting for the next periodic refresh."
+    ),
+)
+async def refresh_snapshot() -> SnapshotStatsSchema:
+    await snapshot_engine.refresh()
+    return SnapshotStatsSchema(
+        enabled=settings.SNAPSHOT_ENABLED, **snapshot_engine.stats()
+    )
@@ -0,0 +1,97 @@
+from typing import Optional
+from urllib.parse import quote
+from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+from exporter import MEDIA_TYPES, ExportFormat, iter_export
+from pagination import check_field_paths
+from routes.search import get_compiled_filter_or_404
+from settings import settings
+
+router = APIRouter()
+
+DEFAULT_CSV_COLUMNS = ["id", "name", "price"]
+
+
+def export_response(
+    query: dict,
+    export_format: ExportFormat,
+    columns: Optional[str],
+    filename: str,
+) -> StreamingResponse:
+    column_list = [c.strip() for c in (columns or "").split(",") if c.strip()]
+    if export_format == ExportFormat.CSV and not column_list:
+        column_list = DEFAULT_CSV_COLUMNS
+    if len(column_list) > settings.EXPORT_MAX_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.EXPORT_MAX_COLUMNS} columns can be exported.",
+        )
+    # Checked before streaming starts, while a 400 can still be sent.
+    try:
+        check_field_paths("_id" if c == "id" else c for c in column_list)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    return StreamingResponse(
+        iter_export(
+            query,
+            export_format,
+            columns=column_list or None,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+        ),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{filename}.{export_format.value}"'
+            )
+        },
+    )
+
+
+@router.get(
+    "/products/",
+    response_class=StreamingResponse,
+    summary="Export all products",
+    description=(
+        "Streams every product in the catalog as NDJSON or CSV. "
+        "Documents are read from the database in large batches and written "
+        "out in chunks, so the export size is not limited by memory. "
+        "Use `columns` to select fields; CSV exports `id,name,price` by default."
+    ),
+)
+async def export_products(
+    export_format: ExportFormat = Query(
+        ExportFormat.NDJSON, alias="format", description="Output format"
+    ),
+    columns: Optional[str] = Query(
+        None, description="Comma-separated list of fields to export"
+    ),
+) -> StreamingResponse:
+    return export_response({}, export_format, columns, filename="products")
+
+
+@router.get(
+    "/search/{filter_name}/",
+    response_class=StreamingResponse,
+    summary="Export products matching a filter",
+    description=(
+        "Streams every product that matches the specified filter as NDJSON "
+        "or CSV. If the filter does not exist, returns HTTP 404 Not Found."
+    ),
+)
+async def export_filtered_products(
+    filter_name: str = Path(
+        description="The name of the filter to apply. "
+        "Must match an existing filter in the system."
+    ),
+    export_format: ExportFormat = Query(
+        ExportFormat.NDJSON, alias="format", description="Output format"
+    ),
+    columns: Optional[str] = Query(
+        None, description="Comma-separated list of fields to export"
+    ),
+) -> StreamingResponse:
+    compiled = await get_compiled_filter_or_404(filter_name)
+    return export_response(
+        compiled.query, export_format, columns, filename=quote(filter_name)
+    )
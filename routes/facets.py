@@ -0,0 +1,46 @@
+import json
+from fastapi import APIRouter, Path, Query
+from cache import facet_cache
+from facets import compute_facets
+from routes.search import get_compiled_filter_or_404
+from schemas.facets import FacetRequestSchema, FacetResponseSchema
+
+router = APIRouter()
+
+
+@router.post(
+    "/{filter_name}/",
+    response_model=FacetResponseSchema,
+    summary="Compute facet counts for a filter",
+    description=(
+        "Computes bucket counts (e.g. price ranges) and term counts "
+        "(e.g. features) over the products matching the specified filter "
+        "in a single aggregation. Results are cached briefly unless "
+        "`use_cache` is false. If the filter does not exist, "
+        "returns HTTP 404 Not Found."
+    ),
+)
+async def get_facets(
+    facet_request: FacetRequestSchema,
+    filter_name: str = Path(
+        description="The name of the filter to apply. "
+        "Must match an existing filter in the system."
+    ),
+    use_cache: bool = Query(True, description="Reuse recently computed facets"),
+) -> FacetResponseSchema:
+    compiled = await get_compiled_filter_or_404(filter_name)
+
+    cache_key = (
+        compiled.cache_key,
+        json.dumps(facet_request.model_dump(mode="json"), sort_keys=True),
+    )
+    if use_cache:
+        cached = facet_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    response = await compute_facets(
+        compiled.name, compiled.query, facet_request.facets
+    )
+    facet_cache.set(cache_key, response)
+    return response
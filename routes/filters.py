@@ -1,14 +1,39 @@
 from typing import List
-from fastapi import APIRouter, HTTPException, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
+from pydantic import ValidationError
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from cache import compiled_filter_cache
+from etag import (
+    conditional_response,
+    if_match_satisfied,
+    json_response,
+    make_etag,
+    revision_filter,
+)
+from explainer import explain_query
+from index_advisor import sync_indexes
 from models.filters import Filter
+from responses import ORJSONModelResponse, dumps
+from routes.search import get_compiled_filter_or_404
 from schemas.filters import (
+    STORED,
     FilterCreateSchema,
+    FilterExplainSchema,
     FilterResponseSchema,
     FilterUpdateSchema
 )
+from settings import settings
 
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONModelResponse)
 
 
 async def get_filter_or_404(name: str) -> Filter:
@@ -18,6 +43,11 @@ async def get_filter_or_404(name: str) -> Filter:
     return filter_
 
 
+def schedule_index_sync(background_tasks: BackgroundTasks) -> None:
+    if settings.AUTO_INDEX_FILTERS:
+        background_tasks.add_task(sync_indexes)
+
+
 @router.post(
     "/",
     response_model=FilterResponseSchema,
@@ -29,8 +59,9 @@ async def get_filter_or_404(name: str) -> Filter:
     ),
 )
 async def create_filter(
-        filter_data: FilterCreateSchema
-) -> FilterResponseSchema:
+        filter_data: FilterCreateSchema,
+        background_tasks: BackgroundTasks,
+) -> Response:
     existing_filter = await Filter.find_one(Filter.name == filter_data.name)
     if existing_filter:
         raise HTTPException(
@@ -40,7 +71,12 @@ async def create_filter(
 
     new_filter = Filter(**filter_data.model_dump())
     await new_filter.insert()
-    return FilterResponseSchema.model_validate(new_filter)
+    compiled_filter_cache.invalidate(new_filter.name)
+    schedule_index_sync(background_tasks)
+    return ORJSONModelResponse(
+        FilterResponseSchema.model_validate(new_filter),
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.get(
@@ -49,9 +85,13 @@ async def create_filter(
     summary="Retrieve all filters",
     description="Returns a list of all filters currently stored in the system.",
 )
-async def get_all_filters() -> List[FilterResponseSchema]:
+async def get_all_filters(request: Request) -> Response:
     filters = await Filter.find_all().to_list()
-    return [FilterResponseSchema.model_validate(f) for f in filters]
+    return conditional_response(
+        request,
+        [FilterResponseSchema.model_validate(f, context=STORED) for f in filters],
+        settings.CACHE_CONTROL_FILTERS,
+    )
 
 
 @router.get(
@@ -63,9 +103,48 @@ async def get_all_filters() -> List[FilterResponseSchema]:
             "If the filter does not exist, returns HTTP 404 Not Found."
     ),
 )
-async def get_filter(filter_name: str) -> FilterResponseSchema:
+async def get_filter(request: Request, filter_name: str) -> Response:
     filter_ = await get_filter_or_404(filter_name)
-    return FilterResponseSchema.model_validate(filter_)
+    return conditional_response(
+        request,
+        FilterResponseSchema.model_validate(filter_, context=STORED),
+        settings.CACHE_CONTROL_FILTERS,
+    )
+
+
+@router.get(
+    "/{filter_name}/explain/",
+    response_model=FilterExplainSchema,
+    summary="Explain how a filter's search runs",
+    description=(
+            "Runs the filter's compiled query under MongoDB "
+            "`explain(\"executionStats\")` and returns the winning plan, the "
+            "indexes it uses, documents examined versus returned and the "
+            "execution time. `collection_scan` is true when the search reads "
+            "the whole collection. If the filter does not exist, returns "
+            "HTTP 404 Not Found."
+    ),
+)
+async def explain_filter(filter_name: str) -> Response:
+    compiled = await get_compiled_filter_or_404(filter_name)
+    try:
+        explanation = await explain_query(compiled.query)
+    except PyMongoError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Explain failed: {exc}",
+        )
+    return ORJSONModelResponse(
+        FilterExplainSchema.model_validate(
+            {"filter_name": compiled.name, **explanation.__dict__}
+        )
+    )
+
+
+def filter_etag(filter_: Filter) -> str:
+    return make_etag(
+        dumps(FilterResponseSchema.model_validate(filter_, context=STORED))
+    )
 
 
 @router.patch(
@@ -74,24 +153,96 @@ async def get_filter(filter_name: str) -> FilterResponseSchema:
     summary="Update an existing filter",
     description=(
             "Updates an existing filter. Only the fields provided in the request "
-            "will be updated. If no valid fields are supplied, returns HTTP 400 Bad Request."
+            "will be updated. If no valid fields are supplied, returns HTTP 400 Bad Request. "
+            "The write is a single atomic `find_one_and_update`. For optimistic "
+            "concurrency send `If-Match` with the filter's ETag or `revision` "
+            "with its current revision; if the filter changed in the meantime, "
+            "returns HTTP 412 Precondition Failed."
     ),
 )
 async def update_filter(
+        request: Request,
         filter_name: str,
-        update_data: FilterUpdateSchema
-) -> FilterResponseSchema:
-    filter_ = await get_filter_or_404(filter_name)
-
+        update_data: FilterUpdateSchema,
+        background_tasks: BackgroundTasks,
+) -> Response:
     updates = update_data.model_dump(exclude_unset=True)
+    expected = updates.pop("revision", None)
     if not updates:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No valid fields to update."
         )
 
-    await filter_.update({"$set": updates})
-    return FilterResponseSchema.model_validate(filter_)
+    # The current filter is only read when `If-Match` must be checked or
+    # when half of `conditions`/`logical_operator` has to be validated
+    # against the stored other half; the write is then pinned to that
+    # revision so the validated combination is exactly what gets stored.
+    if_match = request.headers.get("if-match")
+    current = None
+    if if_match is not None or ("conditions" in updates) != (
+            "logical_operator" in updates
+    ):
+        current = await get_filter_or_404(filter_name)
+        if not if_match_satisfied(if_match, filter_etag(current)):
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Filter was modified since it was read.",
+            )
+        if expected is None:
+            expected = current.revision
+
+    # `FilterUpdateSchema` already holds each field to the create rules, so
+    # a rename alone needs no read; whenever the stored filter is at hand
+    # the whole merged document is validated before it is written.
+    if current is not None or "conditions" in updates:
+        base = current.model_dump() if current else {"name": filter_name}
+        try:
+            # New conditions were already guarded when the body was parsed;
+            # stored ones are not re-checked against newer guards.
+            FilterCreateSchema.model_validate({**base, **updates}, context=STORED)
+        except ValidationError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=exc.errors(
+                    include_url=False, include_context=False, include_input=False
+                ),
+            )
+
+    query = {"name": filter_name}
+    if expected is not None:
+        query.update(revision_filter(expected))
+    collection = Filter.get_pymongo_collection()
+    try:
+        document = await collection.find_one_and_update(
+            query,
+            {
+                "$set": update_data.model_dump(
+                    mode="json", exclude_unset=True, exclude={"revision"}
+                ),
+                "$inc": {"revision": 1},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Filter with the name {updates['name']} already exists."
+        )
+
+    if document is None:
+        await get_filter_or_404(filter_name)
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Filter was modified since it was read.",
+        )
+
+    filter_ = Filter.model_validate(document)
+    compiled_filter_cache.invalidate(filter_name)
+    compiled_filter_cache.invalidate(filter_.name)
+    schedule_index_sync(background_tasks)
+    body = dumps(FilterResponseSchema.model_validate(filter_, context=STORED))
+    return json_response(body, make_etag(body), settings.CACHE_CONTROL_FILTERS)
 
 
 @router.delete(
@@ -104,6 +255,11 @@ async def update_filter(
             "If the filter does not exist, returns HTTP 404 Not Found."
     ),
 )
-async def delete_filter(filter_name: str) -> None:
+async def delete_filter(
+        filter_name: str,
+        background_tasks: BackgroundTasks,
+) -> None:
     filter_ = await get_filter_or_404(filter_name)
     await filter_.delete()
+    compiled_filter_cache.invalidate(filter_name)
+    schedule_index_sync(background_tasks)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from metrics import registry
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Export request metrics for Prometheus",
+    description=(
+        "Returns per-route latency histograms and counters for MongoDB "
+        "commands, MongoDB time, documents returned and response bytes "
+        "in the Prometheus text exposition format."
+    ),
+)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,25 +1,87 @@
-from typing import List
+from dataclasses import asdict
+from typing import Any, AsyncIterator, List, Optional
 from beanie import PydanticObjectId
 from beanie.odm.operators.find.comparison import In
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bulk import BulkReport, build_update, guard_query, run_bulk
+from cache import invalidate_product_caches, product_cache
+from etag import (
+    conditional_response,
+    etag_matches,
+    if_match_satisfied,
+    json_response,
+    make_etag,
+    not_modified,
+    revision_filter,
+)
+from database import to_bson
+from importer import import_products, iter_lines
 from models.products import Product
+from pagination import paginate_products
+from responses import ORJSONModelResponse, dumps
+from routes.search import get_compiled_filter_or_404
+from schemas.bulk import (
+    BulkDeleteSchema,
+    BulkReportSchema,
+    BulkSelectionSchema,
+    BulkUpdateSchema,
+)
 from schemas.products import (
+    CountStrategy,
+    ImportReportSchema,
     ProductListResponseSchema,
     ProductResponseSchema,
     ProductUpdateSchema,
     ProductListCreateSchema,
 )
+from settings import settings
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONModelResponse)
 
+_MISSING = object()
 
-async def get_product_or_404(product_id: PydanticObjectId) -> Product:
+# BSON types a stored field must hold for a JSON value of the given type
+# to be written over it by PATCH.
+BSON_TYPES = {
+    bool: ["bool"],
+    int: ["int", "long"],
+    float: ["double"],
+    str: ["string"],
+    list: ["array"],
+    dict: ["object"],
+}
+
+
+def product_entry(product: Product) -> dict:
+    product_data = product.model_dump()
+    body = dumps(ProductResponseSchema(**product_data))
+    return {"data": product_data, "body": body, "etag": make_etag(body)}
+
+
+async def load_product(product_id: PydanticObjectId) -> Optional[dict]:
     product = await Product.get(product_id)
     if not product:
+        return None
+    return product_entry(product)
+
+
+async def get_cached_product_or_404(product_id: PydanticObjectId) -> dict:
+    cached = await product_cache.get_or_load(
+        str(product_id), lambda: load_product(product_id)
+    )
+    if not cached:
         raise HTTPException(
             status_code=404, detail="Product with the given ID was not found."
         )
-    return product
+    return cached
+
+
+async def get_product_or_404(product_id: PydanticObjectId) -> Product:
+    cached = await get_cached_product_or_404(product_id)
+    return Product(**cached["data"])
 
 
 @router.get(
@@ -28,44 +90,60 @@ async def get_product_or_404(product_id: PydanticObjectId) -> Product:
     summary="Retrieve a paginated list of products",
     description=(
         "Returns a paginated list of all products in the system. "
-        "Supports page number and page size via query parameters. "
+        "Supports page number and page size via query parameters, or "
+        "constant-cost keyset pagination via the `cursor` query parameter. "
+        "Use `fields` to return only selected extra fields and `sort` to "
+        "order by indexed keys. "
+        "Honours `If-None-Match` with HTTP 304 Not Modified. "
         "If no products are found, returns HTTP 404 Not Found."
     ),
 )
 async def get_all_products(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=20, description="Number of products per page"),
-) -> ProductListResponseSchema:
-
-    skip = (page - 1) * per_page
-    total_items = await Product.find_all().count()
-
-    if not total_items:
-        raise HTTPException(status_code=404, detail="No products found.")
-
-    products = await Product.find_all().skip(skip).limit(per_page).to_list()
-
-    if not products:
-        raise HTTPException(status_code=404, detail="No products found.")
-
-    total_pages = (total_items + per_page - 1) // per_page
-
-    response = ProductListResponseSchema(
-        products=[
-            ProductResponseSchema(**product.model_dump()) for product in products
-        ],
-        prev_page=(
-            f"/products/?page={page - 1}&per_page={per_page}" if page > 1 else None
+    cursor: Optional[str] = Query(
+        None,
+        description=(
+            "Opaque keyset cursor taken from `next_page`. "
+            "Pass an empty value to start cursor pagination."
         ),
-        next_page=(
-            f"/products/?page={page + 1}&per_page={per_page}"
-            if page < total_pages
-            else None
+    ),
+    count: CountStrategy = Query(
+        CountStrategy.EXACT,
+        description=(
+            "How `total_items` is computed: `exact`, `estimated`, "
+            "`cached` (short-lived per query) or `none` (totals are null)."
         ),
-        total_pages=total_pages,
-        total_items=total_items,
+    ),
+    fields: Optional[str] = Query(
+        None,
+        description=(
+            "Comma-separated extra fields to return. `id`, `name` and "
+            "`price` are always included; other fields are left out."
+        ),
+    ),
+    sort: Optional[str] = Query(
+        None,
+        description=(
+            "Comma-separated sort keys, `-` prefix for descending, e.g. "
+            "`price`, `-price` or `price,name`. Only sorts backed by an "
+            "index are accepted; works with `cursor` pagination."
+        ),
+    ),
+) -> Response:
+    response = await paginate_products(
+        query={},
+        base_url="/products/",
+        page=page,
+        per_page=per_page,
+        cursor=cursor,
+        count=count,
+        count_key="products",
+        fields=fields,
+        sort=sort,
     )
-    return response
+    return conditional_response(request, response, settings.CACHE_CONTROL_PRODUCTS)
 
 
 @router.get(
@@ -75,12 +153,18 @@ async def get_all_products(
     description=(
         "Fetches detailed information about a "
         "single product identified by its ID. "
+        "Honours `If-None-Match` with HTTP 304 Not Modified. "
         "If the product does not exist, returns HTTP 404 Not Found."
     ),
 )
-async def get_product(product_id: PydanticObjectId) -> ProductResponseSchema:
-    product = await get_product_or_404(product_id)
-    return ProductResponseSchema(**product.model_dump())
+async def get_product(request: Request, product_id: PydanticObjectId) -> Response:
+    cached = await get_cached_product_or_404(product_id)
+    if etag_matches(request.headers.get("if-none-match"), cached["etag"]):
+        return not_modified(cached["etag"], settings.CACHE_CONTROL_PRODUCTS)
+
+    return json_response(
+        cached["body"], cached["etag"], settings.CACHE_CONTROL_PRODUCTS
+    )
 
 
 @router.post(
@@ -96,7 +180,7 @@ async def get_product(product_id: PydanticObjectId) -> ProductResponseSchema:
 )
 async def create_product(
     product_data: ProductListCreateSchema,
-) -> List[ProductResponseSchema]:
+) -> Response:
     names = [product.name for product in product_data.products]
 
     existing = await Product.find(In(Product.name, names)).to_list()
@@ -107,13 +191,208 @@ async def create_product(
             detail=f"Product with the name {existing_names} already exists.",
         )
 
-    product_dicts = [product.model_dump() for product in product_data.products]
+    # `revision` is server-managed; a client-supplied one is ignored.
+    product_dicts = [
+        product.model_dump(exclude={"revision"}) for product in product_data.products
+    ]
 
     products = [Product(**product_dict) for product_dict in product_dicts]
 
     await Product.insert_many(products)
+    await invalidate_product_caches(product.id for product in products)
+
+    return ORJSONModelResponse(
+        [ProductResponseSchema(**product.model_dump()) for product in products],
+        status_code=status.HTTP_201_CREATED,
+    )
+
 
-    return [ProductResponseSchema(**product.model_dump()) for product in products]
+@router.post(
+    "/import/",
+    response_model=ImportReportSchema,
+    summary="Bulk import products from NDJSON",
+    description=(
+        "Streams an NDJSON request body with one product per line. Rows are "
+        "validated in chunks and upserted by name with unordered bulk writes. "
+        "Invalid rows are reported by line number without aborting the import."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        }
+    },
+)
+async def import_products_ndjson(request: Request) -> ImportReportSchema:
+    report = await import_products(
+        iter_lines(request.stream()),
+        chunk_size=settings.IMPORT_CHUNK_SIZE,
+        concurrency=settings.IMPORT_CONCURRENCY,
+        max_errors=settings.IMPORT_MAX_ERRORS,
+    )
+    await invalidate_product_caches()
+    return ImportReportSchema.model_validate(report)
+
+
+async def bulk_response(
+    selection: BulkSelectionSchema,
+    update: Optional[dict],
+    progress: bool,
+    inc_fields: Optional[dict] = None,
+) -> Response:
+    if selection.ids is not None and len(selection.ids) > settings.BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BULK_MAX_IDS} ids can be written at once.",
+        )
+    query = {}
+    if selection.filter_name is not None:
+        query = (await get_compiled_filter_or_404(selection.filter_name)).query
+    if inc_fields:
+        query = guard_query(query, inc_fields)
+
+    reports = run_bulk(
+        query,
+        update=update,
+        ids=selection.ids,
+        batch_size=settings.BULK_BATCH_SIZE,
+        dry_run=selection.dry_run,
+    )
+
+    async def invalidate() -> None:
+        if not selection.dry_run:
+            await invalidate_product_caches(selection.ids)
+
+    if progress:
+
+        async def stream() -> AsyncIterator[bytes]:
+            try:
+                async for report in reports:
+                    yield dumps(asdict(report)) + b"\n"
+            finally:
+                await invalidate()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    report = BulkReport()
+    try:
+        async for report in reports:
+            pass
+    finally:
+        await invalidate()
+    return ORJSONModelResponse(asdict(report))
+
+
+@router.post(
+    "/bulk/update/",
+    response_model=BulkReportSchema,
+    summary="Update every product matching a filter or ID list",
+    description=(
+        "Applies `set` and `inc` to the products selected by `filter_name` "
+        "or `ids`, in batches of `update_many` writes walked by `_id`. "
+        "Negative `price` increments skip products they would push below "
+        "zero. With `dry_run` only the selection is counted. With "
+        "`progress=true` the response streams one NDJSON report per batch, "
+        "ending with the final report."
+    ),
+)
+async def bulk_update_products(
+    update_data: BulkUpdateSchema,
+    progress: bool = Query(False, description="Stream per-batch progress"),
+) -> Response:
+    update = build_update(update_data.set, update_data.inc)
+    return await bulk_response(update_data, update, progress, update_data.inc)
+
+
+@router.post(
+    "/bulk/delete/",
+    response_model=BulkReportSchema,
+    summary="Delete every product matching a filter or ID list",
+    description=(
+        "Deletes the products selected by `filter_name` or `ids` in batches "
+        "of `delete_many` writes walked by `_id`. With `dry_run` only the "
+        "selection is counted. With `progress=true` the response streams "
+        "one NDJSON report per batch, ending with the final report."
+    ),
+)
+async def bulk_delete_products(
+    delete_data: BulkDeleteSchema,
+    progress: bool = Query(False, description="Stream per-batch progress"),
+) -> Response:
+    return await bulk_response(delete_data, None, progress)
+
+
+def type_guard(key: str, value: Any) -> dict:
+    """
+    Query clause requiring field `key` to exist and to hold the type
+    `value` will be written as, so the type check happens inside the write.
+    """
+    aliases = BSON_TYPES.get(type(value))
+    if aliases is None:
+        return {key: {"$exists": True}}
+    if aliases == ["array"]:
+        return {key: {"$type": "array"}}
+    # `$type` also matches array elements; exclude arrays explicitly.
+    clauses = [{key: {"$type": alias, "$not": {"$type": "array"}}} for alias in aliases]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def same_type(stored: Any, value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(stored, bool) or isinstance(value, bool):
+        return isinstance(stored, bool) and isinstance(value, bool)
+    return isinstance(stored, type(value))
+
+
+async def remaining_updates(
+    product_id: PydanticObjectId, updates: dict, expected: Optional[int]
+) -> dict:
+    """
+    Explain a guarded PATCH that matched nothing by reading the product.
+
+    Returns:
+        dict: `updates` without the fields the product does not have,
+            which PATCH ignores, to be retried.
+
+    Raises:
+        HTTPException: 404 if the product is gone, 412 if its revision
+            moved, 400 if a field holds another type, 409 if the product
+            changed between the write and this read.
+    """
+    stored = await Product.get_pymongo_collection().find_one({"_id": product_id})
+    if stored is None:
+        raise HTTPException(
+            status_code=404, detail="Product with the given ID was not found."
+        )
+    if expected is not None and stored.get("revision", 0) != expected:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Product was modified since it was read.",
+        )
+
+    remaining = {}
+    for key, value in updates.items():
+        current: Any = stored
+        for part in key.split("."):
+            if not isinstance(current, dict):
+                current = _MISSING
+                break
+            current = current.get(part, _MISSING)
+        if current is _MISSING:
+            continue
+        if not same_type(current, value):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Field '{key}' must be of type {type(current).__name__}",
+            )
+        remaining[key] = value
+    if remaining == updates:
+        raise HTTPException(
+            status_code=409,
+            detail="Product changed during the update; retry it.",
+        )
+    return remaining
 
 
 @router.patch(
@@ -124,35 +403,74 @@ async def create_product(
     description=(
         "Updates an existing product. Only fields "
         "provided in the request will be updated. "
-        "If no valid fields are supplied, returns HTTP 400 Bad Request."
+        "If no valid fields are supplied, returns HTTP 400 Bad Request. "
+        "The write is a single atomic `find_one_and_update`. For optimistic "
+        "concurrency send `If-Match` with the product's ETag or `revision` "
+        "with its current revision; if the product changed in the meantime, "
+        "returns HTTP 412 Precondition Failed."
     ),
 )
 async def update_product(
-    product_id: PydanticObjectId, update_data: ProductUpdateSchema
-) -> ProductResponseSchema:
-    product = await get_product_or_404(product_id)
+    request: Request, product_id: PydanticObjectId, update_data: ProductUpdateSchema
+) -> Response:
     updates = update_data.model_dump(exclude_unset=True)
+    expected = updates.pop("revision", None)
+    updates.pop("id", None)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No valid fields to update.")
 
-    safe_updates = {}
-    for key, value in updates.items():
-        if hasattr(product, key):
-            current_value = getattr(product, key)
-            if value is None or isinstance(value, type(current_value)):
-                safe_updates[key] = value
-            else:
+    # Only `If-Match` needs the current product, to compare ETags; the
+    # cached copy usually answers that without a round trip.
+    if_match = request.headers.get("if-match")
+    if if_match is not None:
+        cached = await get_cached_product_or_404(product_id)
+        if not if_match_satisfied(if_match, cached["etag"]):
+            # The cached copy may be older than the client's; check it once more.
+            await product_cache.invalidate(str(product_id))
+            cached = await get_cached_product_or_404(product_id)
+            if not if_match_satisfied(if_match, cached["etag"]):
                 raise HTTPException(
-                    status_code=400,
-                    detail=(
-                        f"Field '{key}' must be of type "
-                        f"{type(current_value).__name__}"
-                    ),
+                    status_code=status.HTTP_412_PRECONDITION_FAILED,
+                    detail="Product was modified since it was read.",
                 )
+        if expected is None:
+            expected = cached["data"].get("revision", 0)
+
+    # Extra fields must exist and keep their type. Both are checked by the
+    # write itself; the product is only read when it matched nothing.
+    collection = Product.get_pymongo_collection()
+    document = None
+    while updates and document is None:
+        query: dict = {"_id": product_id}
+        guards = [
+            type_guard(key, value)
+            for key, value in updates.items()
+            if key not in ProductUpdateSchema.model_fields
+        ]
+        if guards:
+            query["$and"] = guards
+        if expected is not None:
+            query.update(revision_filter(expected))
+        try:
+            document = await collection.find_one_and_update(
+                query,
+                {"$set": to_bson(updates), "$inc": {"revision": 1}},
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Product with the name {updates.get('name')} already exists.",
+            )
+        if document is None:
+            updates = await remaining_updates(product_id, updates, expected)
 
-    if not safe_updates:
+    if document is None:
         raise HTTPException(status_code=400, detail="No valid fields to update.")
 
-    await product.update({"$set": safe_updates})
-    return ProductResponseSchema(**product.model_dump())
+    await invalidate_product_caches([product_id])
+    entry = product_entry(Product.model_validate(document))
+    return json_response(entry["body"], entry["etag"], settings.CACHE_CONTROL_PRODUCTS)
 
 
 @router.delete(
@@ -169,3 +487,4 @@ async def delete_product(product_id: PydanticObjectId) -> None:
     product = await get_product_or_404(product_id)
 
     await product.delete()
+    await invalidate_product_caches([product_id])
@@ -1,12 +1,67 @@
+import asyncio
+from typing import Optional
 from urllib.parse import quote
-from fastapi import APIRouter, HTTPException, Query, Path
-from filter_builder import build_query
+from beanie.odm.operators.find.comparison import In
+from fastapi import APIRouter, HTTPException, Query, Path, Request, Response
+from cache import compiled_filter_cache
+from etag import conditional_response
+from filter_builder import CompiledFilter, build_query
 from models.filters import Filter
-from models.products import Product
-from schemas.filters import FilterCreateSchema
-from schemas.products import ProductListResponseSchema, ProductResponseSchema
+from pagination import paginate_products
+from responses import ORJSONModelResponse
+from schemas.filters import STORED, FilterCreateSchema
+from schemas.products import CountStrategy, ProductListResponseSchema
+from schemas.search import (
+    BatchSearchItemSchema,
+    BatchSearchRequestSchema,
+    BatchSearchResponseSchema,
+    BatchSearchResultSchema,
+)
+from settings import settings
+
+router = APIRouter(default_response_class=ORJSONModelResponse)
+
+
+def compile_filter(filter_: Filter) -> CompiledFilter:
+    filter_data = FilterCreateSchema.model_validate(filter_, context=STORED)
+    compiled = CompiledFilter(
+        id=filter_.id,
+        name=filter_.name,
+        revision=filter_.revision,
+        query=build_query(filter_data),
+    )
+    compiled_filter_cache.set(filter_.name, compiled)
+    return compiled
 
-router = APIRouter()
+
+async def get_compiled_filter_or_404(filter_name: str) -> CompiledFilter:
+    compiled = compiled_filter_cache.get(filter_name)
+    if compiled is not None:
+        return compiled
+
+    filter_ = await Filter.find_one(Filter.name == filter_name)
+    if not filter_:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Filter with the name '{filter_name}' was not found.",
+        )
+    return compile_filter(filter_)
+
+
+async def get_compiled_filters(filter_names: list[str]) -> dict[str, CompiledFilter]:
+    compiled = {}
+    missing = []
+    for name in dict.fromkeys(filter_names):
+        cached = compiled_filter_cache.get(name)
+        if cached is not None:
+            compiled[name] = cached
+        else:
+            missing.append(name)
+
+    if missing:
+        for filter_ in await Filter.find(In(Filter.name, missing)).to_list():
+            compiled[filter_.name] = compile_filter(filter_)
+    return compiled
 
 
 @router.get(
@@ -16,56 +71,120 @@ router = APIRouter()
     description=(
         "Returns a paginated list of products that match the specified filter. "
         "If the filter does not exist, returns HTTP 404 Not Found. "
-        "Supports pagination via `page` and `per_page` query parameters."
+        "Supports pagination via `page` and `per_page` query parameters, "
+        "or constant-cost keyset pagination via `cursor`. "
+        "Use `fields` to return only selected extra fields and `sort` to "
+        "order by indexed keys. "
+        "Honours `If-None-Match` with HTTP 304 Not Modified."
     ),
 )
 async def get_filtered_products(
+    request: Request,
     filter_name: str = Path(
         description="The name of the filter to apply. "
         "Must match an existing filter in the system."
     ),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=20, description="Number of products per page"),
-) -> ProductListResponseSchema:
-    filter_ = await Filter.find_one(Filter.name == filter_name)
-    if not filter_:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Filter with the name '{filter_name}' was not found.",
-        )
-
-    filter_data = FilterCreateSchema.model_validate(filter_)
-
-    query = build_query(filter_data)
+    cursor: Optional[str] = Query(
+        None,
+        description=(
+            "Opaque keyset cursor taken from `next_page`. "
+            "Pass an empty value to start cursor pagination."
+        ),
+    ),
+    count: CountStrategy = Query(
+        CountStrategy.EXACT,
+        description=(
+            "How `total_items` is computed: `exact`, `estimated`, "
+            "`cached` (short-lived per query) or `none` (totals are null)."
+        ),
+    ),
+    fields: Optional[str] = Query(
+        None,
+        description=(
+            "Comma-separated extra fields to return. `id`, `name` and "
+            "`price` are always included; other fields are left out."
+        ),
+    ),
+    sort: Optional[str] = Query(
+        None,
+        description=(
+            "Comma-separated sort keys, `-` prefix for descending, e.g. "
+            "`price`, `-price` or `price,name`. Only sorts backed by an "
+            "index are accepted; works with `cursor` pagination."
+        ),
+    ),
+) -> Response:
+    compiled = await get_compiled_filter_or_404(filter_name)
 
-    skip = (page - 1) * per_page
-    total_items = await Product.find(query).count()
+    response = await paginate_products(
+        query=compiled.query,
+        base_url=f"/search/{quote(filter_name)}",
+        page=page,
+        per_page=per_page,
+        cursor=cursor,
+        count=count,
+        count_key=compiled.cache_key,
+        fields=fields,
+        sort=sort,
+        use_snapshot=settings.SNAPSHOT_ENABLED,
+    )
+    return conditional_response(request, response, settings.CACHE_CONTROL_SEARCH)
 
-    if not total_items:
-        raise HTTPException(status_code=404, detail="No products found.")
 
-    products = await Product.find(query).skip(skip).limit(per_page).to_list()
+@router.post(
+    "/batch/",
+    response_model=BatchSearchResponseSchema,
+    summary="Run several filter searches at once",
+    description=(
+        "Runs a page of results for each requested filter in one call. "
+        "All filters are loaded with a single query and the searches run "
+        "concurrently. Each result carries its own status code, so a missing "
+        "filter or empty page does not fail the whole batch."
+    ),
+)
+async def batch_search(
+    batch: BatchSearchRequestSchema,
+) -> Response:
+    compiled_filters = await get_compiled_filters(
+        [search.filter_name for search in batch.searches]
+    )
+    semaphore = asyncio.Semaphore(settings.BATCH_SEARCH_CONCURRENCY)
 
-    if not products:
-        raise HTTPException(status_code=404, detail="No products found.")
+    async def run(search: BatchSearchItemSchema) -> BatchSearchResultSchema:
+        compiled = compiled_filters.get(search.filter_name)
+        if compiled is None:
+            return BatchSearchResultSchema(
+                filter_name=search.filter_name,
+                status_code=404,
+                detail=f"Filter with the name '{search.filter_name}' was not found.",
+            )
 
-    total_pages = (total_items + per_page - 1) // per_page
+        async with semaphore:
+            try:
+                result = await paginate_products(
+                    query=compiled.query,
+                    base_url=f"/search/{quote(search.filter_name)}",
+                    page=search.page,
+                    per_page=search.per_page,
+                    cursor=search.cursor,
+                    count=search.count,
+                    count_key=compiled.cache_key,
+                    fields=search.fields,
+                    sort=search.sort,
+                    use_snapshot=settings.SNAPSHOT_ENABLED,
+                )
+            except HTTPException as exc:
+                return BatchSearchResultSchema(
+                    filter_name=search.filter_name,
+                    status_code=exc.status_code,
+                    detail=exc.detail,
+                )
 
-    base_url = f"/search/{quote(filter_name)}"
+        return BatchSearchResultSchema(
+            filter_name=search.filter_name, status_code=200, result=result
+        )
 
-    response = ProductListResponseSchema(
-        products=[
-            ProductResponseSchema(**product.model_dump()) for product in products
-        ],
-        prev_page=(
-            f"{base_url}?page={page - 1}&per_page={per_page}" if page > 1 else None
-        ),
-        next_page=(
-            f"{base_url}?page={page + 1}&per_page={per_page}"
-            if page < total_pages
-            else None
-        ),
-        total_pages=total_pages,
-        total_items=total_items,
-    )
-    return response
+    results = await asyncio.gather(*(run(search) for search in batch.searches))
+    return ORJSONModelResponse(BatchSearchResponseSchema(results=results))
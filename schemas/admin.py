@@ -0,0 +1,54 @@
+from typing import Any, Optional
+from pydantic import BaseModel
+
+
+class CacheStatsSchema(BaseModel):
+    name: str
+    size: Optional[int]
+    maxsize: Optional[int]
+    ttl: Optional[float]
+    hits: int
+    misses: int
+    evictions: Optional[int]
+    coalesced: Optional[int] = None
+    hit_ratio: Optional[float]
+
+
+class IndexProposalSchema(BaseModel):
+    name: str
+    keys: list[tuple[str, Any]]
+    filters: list[str]
+
+    model_config = {"from_attributes": True}
+
+
+class IndexReportSchema(BaseModel):
+    proposals: list[IndexProposalSchema]
+    existing: list[str]
+    created: list[str]
+    dropped: list[str]
+    failed: dict[str, str]
+    scanning_filters: list[str]
+
+    model_config = {"from_attributes": True}
+
+
+class PoolStatsSchema(BaseModel):
+    max_pool_size: int
+    min_pool_size: int
+    open: int
+    created: int
+    closed: int
+    checked_out: int
+    waiting: int
+    check_out_failures: int
+    pools_cleared: int
+
+
+class SnapshotStatsSchema(BaseModel):
+    enabled: bool
+    consistency: str
+    documents: Optional[int]
+    age_seconds: Optional[float]
+    hits: int
+    fallbacks: int
@@ -0,0 +1,108 @@
+from decimal import Decimal
+from typing import Any, List, Optional, Union
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field, TypeAdapter, condecimal, model_validator
+from schemas.products import ProductUpdateSchema
+
+# Unique or identifying fields that cannot be written in bulk.
+PROTECTED_FIELDS = {"_id", "id", "name", "revision"}
+
+
+class BulkSelectionSchema(BaseModel):
+    filter_name: Optional[str] = Field(None, min_length=1, max_length=100)
+    ids: Optional[List[PydanticObjectId]] = Field(None, min_length=1)
+    dry_run: bool = False
+
+    @model_validator(mode="after")
+    def validate_selection(self):
+        if (self.filter_name is None) == (self.ids is None):
+            raise ValueError("Provide exactly one of 'filter_name' or 'ids'.")
+        return self
+
+
+# Same precision as `ProductCreateSchema.price`, so increments keep prices
+# storable; the sign is left to the non-negative guard in `bulk`.
+PRICE_DELTA = TypeAdapter(condecimal(max_digits=10, decimal_places=2))
+
+# Scalar fields whose sub-paths cannot be written.
+SCALAR_FIELDS = PROTECTED_FIELDS | {"price"}
+
+
+def _check_field(name: str) -> None:
+    root = name.split(".")[0]
+    if not name or name.startswith("$") or name in PROTECTED_FIELDS:
+        raise ValueError(f"Field '{name}' cannot be updated in bulk.")
+    if ".." in name or name.startswith(".") or name.endswith("."):
+        raise ValueError(f"Invalid field name '{name}'.")
+    if root != name and root in SCALAR_FIELDS:
+        raise ValueError(f"Field '{name}' cannot be updated in bulk.")
+
+
+def _check_overlap(names: list[str]) -> None:
+    # MongoDB refuses to write both `a` and `a.b` in one update.
+    unique = set(names)
+    for name in unique:
+        segments = name.split(".")
+        for end in range(1, len(segments)):
+            parent = ".".join(segments[:end])
+            if parent in unique:
+                raise ValueError(f"Fields '{parent}' and '{name}' overlap.")
+
+
+class BulkUpdateSchema(BulkSelectionSchema):
+    set: dict[str, Any] = Field(default_factory=dict)
+    inc: dict[str, Union[int, Decimal]] = Field(default_factory=dict)
+
+    @model_validator(mode="after")
+    def validate_patch(self):
+        if not self.set and not self.inc:
+            raise ValueError("Provide at least one field in 'set' or 'inc'.")
+        for name in [*self.set, *self.inc]:
+            _check_field(name)
+        overlap = set(self.set) & set(self.inc)
+        if overlap:
+            raise ValueError(f"Fields {sorted(overlap)} are both set and incremented.")
+        _check_overlap([*self.set, *self.inc])
+        if "price" in self.set:
+            self.set.update(
+                ProductUpdateSchema(price=self.set["price"]).model_dump(
+                    include={"price"}
+                )
+            )
+            if self.set["price"] is None:
+                raise ValueError("Field 'price' cannot be null.")
+        if "price" in self.inc:
+            self.inc["price"] = PRICE_DELTA.validate_python(self.inc["price"])
+        return self
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {"filter_name": "New Filter", "inc": {"price": "-5.00"}},
+                {
+                    "ids": ["68d9a9f2c2a4e1b5d0f3a111"],
+                    "set": {"on_sale": True},
+                    "dry_run": True,
+                },
+            ]
+        }
+    }
+
+
+class BulkDeleteSchema(BulkSelectionSchema):
+    model_config = {
+        "json_schema_extra": {"examples": [{"filter_name": "Discontinued"}]}
+    }
+
+
+class BulkReportSchema(BaseModel):
+    dry_run: bool
+    matched: int
+    modified: int
+    deleted: int
+    batches: int
+    done: bool
+    elapsed_seconds: float
+    documents_per_second: float
+
+    model_config = {"from_attributes": True}
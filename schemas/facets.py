@@ -0,0 +1,75 @@
+from enum import Enum
+from typing import Any, List, Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+
+class FacetType(str, Enum):
+    BUCKET = "bucket"
+    TERMS = "terms"
+
+
+class FacetSpecSchema(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+    field: str = Field(min_length=1, max_length=100)
+    type: FacetType
+    boundaries: Optional[List[float]] = None
+    default: str = "other"
+    limit: int = Field(10, ge=1, le=100)
+
+    @field_validator("field")
+    @classmethod
+    def validate_field(cls, field):
+        # The field becomes a `$field` path expression in the aggregation.
+        if not all(s and not s.startswith("$") for s in field.split(".")):
+            raise ValueError(f"Invalid field name '{field}'")
+        return field
+
+    @model_validator(mode="after")
+    def validate_boundaries(self):
+        if self.type == FacetType.BUCKET:
+            if not self.boundaries or len(self.boundaries) < 2:
+                raise ValueError("Bucket facets need at least two boundaries")
+            if any(a >= b for a, b in zip(self.boundaries, self.boundaries[1:])):
+                raise ValueError("Bucket boundaries must be strictly ascending")
+        return self
+
+
+class FacetRequestSchema(BaseModel):
+    facets: List[FacetSpecSchema] = Field(min_length=1, max_length=20)
+
+    @field_validator("facets")
+    @classmethod
+    def validate_names(cls, facets):
+        names = [facet.name for facet in facets]
+        if len(names) != len(set(names)):
+            raise ValueError("Facet names must be unique")
+        return facets
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "facets": [
+                        {
+                            "name": "price",
+                            "field": "price",
+                            "type": "bucket",
+                            "boundaries": [0, 50, 100, 500],
+                        },
+                        {"name": "features", "field": "features", "type": "terms"},
+                    ]
+                }
+            ]
+        }
+    }
+
+
+class FacetBucketSchema(BaseModel):
+    key: Any
+    count: int
+
+
+class FacetResponseSchema(BaseModel):
+    filter_name: str
+    total_items: int
+    facets: dict[str, List[FacetBucketSchema]]
@@ -1,6 +1,14 @@
+import re
+from re import _constants as sre, _parser as sre_parse
 from typing import Any, Optional
 from beanie import PydanticObjectId
-from pydantic import BaseModel, field_validator, Field
+from pydantic import (
+    BaseModel,
+    Field,
+    ValidationInfo,
+    field_validator,
+    model_validator,
+)
 from enum import Enum
 from schemas.examples.filters import filter_schema_example
 
@@ -14,6 +22,262 @@ class Operator(str, Enum):
     LTE = "<="
     INCLUDE = "include"
     REGEX = "regex"
+    PREFIX = "prefix"
+    TEXT = "text"
+
+
+# Fields covered by the `products` text index, see `models.products.Product`.
+TEXT_SEARCH_FIELDS = ("name",)
+
+MAX_REGEX_LENGTH = 100
+# Bounded repeats of a variable-length group above this count, e.g.
+# `(.*a){20}`, backtrack like `+` and are treated as such.
+MAX_FIXED_REPEAT = 10
+# Code points character classes are compared on; classes reaching past it
+# (`.`, `\w`, `[^a]`, ...) are assumed to overlap one another.
+CHAR_SAMPLE_SIZE = 0x250
+
+ATOMS = (sre.LITERAL, sre.NOT_LITERAL, sre.ANY, sre.IN)
+REPEATS = (sre.MAX_REPEAT, sre.MIN_REPEAT, sre.POSSESSIVE_REPEAT)
+CATEGORIES = {
+    sre.CATEGORY_DIGIT: re.compile(r"\d"),
+    sre.CATEGORY_NOT_DIGIT: re.compile(r"\D"),
+    sre.CATEGORY_SPACE: re.compile(r"\s"),
+    sre.CATEGORY_NOT_SPACE: re.compile(r"\S"),
+    sre.CATEGORY_WORD: re.compile(r"\w"),
+    sre.CATEGORY_NOT_WORD: re.compile(r"\W"),
+}
+
+# Validation context for filters read back from the database: guards added
+# to the input schemas must not make filters saved before them unreadable.
+STORED = {"stored": True}
+
+
+def is_stored(info: ValidationInfo) -> bool:
+    return bool(info.context and info.context.get("stored"))
+
+
+def _children(op, av) -> list:
+    if op is sre.SUBPATTERN:
+        return [av[3]]
+    if op is sre.ATOMIC_GROUP:
+        return [av]
+    if op in (sre.ASSERT, sre.ASSERT_NOT):
+        return [av[1]]
+    if op in REPEATS:
+        return [av[2]]
+    if op is sre.BRANCH:
+        return av[1]
+    if op is sre.GROUPREF_EXISTS:
+        return [branch for branch in av[1:] if branch is not None]
+    return []
+
+
+def _nodes(tree):
+    for op, av in tree:
+        yield op, av
+        for child in _children(op, av):
+            yield from _nodes(child)
+
+
+def _atoms(tree) -> list:
+    return [(op, av) for op, av in _nodes(tree) if op in ATOMS]
+
+
+def _matches_code(atom, code: int) -> bool:
+    op, av = atom
+    if op is sre.LITERAL:
+        return code == av
+    if op is sre.NOT_LITERAL:
+        return code != av
+    if op is sre.ANY:
+        return code != ord("\n")
+    hit, negate = False, False
+    for item_op, item_av in av:
+        if item_op is sre.NEGATE:
+            negate = True
+        elif item_op is sre.LITERAL:
+            hit = hit or code == item_av
+        elif item_op is sre.RANGE:
+            hit = hit or item_av[0] <= code <= item_av[1]
+        elif item_op is sre.CATEGORY:
+            hit = hit or bool(CATEGORIES[item_av].fullmatch(chr(code)))
+    return hit != negate
+
+
+def _matches(atom, code: int) -> bool:
+    # Filters run with `$options: "i"`, so classes are compared case-folded.
+    char = chr(code)
+    return any(
+        _matches_code(atom, ord(variant))
+        for variant in {char, char.lower(), char.upper()}
+        if len(variant) == 1
+    )
+
+
+def _unbounded(atom) -> bool:
+    op, av = atom
+    if op in (sre.NOT_LITERAL, sre.ANY):
+        return True
+    if op is sre.LITERAL:
+        return False
+    return any(
+        item_op in (sre.NEGATE, sre.CATEGORY)
+        or (item_op is sre.RANGE and item_av[1] >= CHAR_SAMPLE_SIZE)
+        for item_op, item_av in av
+    )
+
+
+def _overlap(first, second, sample: set[int]) -> bool:
+    if _unbounded(first) and _unbounded(second):
+        return True
+    return any(_matches(first, code) and _matches(second, code) for code in sample)
+
+
+def _first_atoms(tree) -> tuple[list, bool]:
+    """
+    The atoms a match of `tree` can start with, and whether it can be empty.
+    """
+    atoms = []
+    for op, av in tree:
+        if op in ATOMS:
+            atoms.append((op, av))
+            return atoms, False
+        children = _children(op, av)
+        if op in (sre.AT, sre.ASSERT, sre.ASSERT_NOT) or not children:
+            continue
+        nullable = False
+        for child in children:
+            child_atoms, child_nullable = _first_atoms(child)
+            atoms += child_atoms
+            nullable = nullable or child_nullable
+        if op in REPEATS and av[0] == 0:
+            nullable = True
+        elif op is sre.GROUPREF_EXISTS and av[2] is None:
+            nullable = True
+        if not nullable:
+            return atoms, False
+    return atoms, True
+
+
+def _edge_atom(tree, index: int):
+    if not tree:
+        return None
+    op, av = tree[index]
+    if op in (sre.SUBPATTERN, sre.ATOMIC_GROUP):
+        return _edge_atom(_children(op, av)[0], index)
+    return (op, av) if op in ATOMS else None
+
+
+def _branches_overlap(branches: list, sample: set[int]) -> bool:
+    firsts = [_first_atoms(branch) for branch in branches]
+    for i, (atoms, nullable) in enumerate(firsts):
+        for other_atoms, other_nullable in firsts[i + 1:]:
+            if nullable and other_nullable:
+                return True
+            if any(_overlap(a, b, sample) for a in atoms for b in other_atoms):
+                return True
+    return False
+
+
+def _is_variable(op, av) -> bool:
+    if op in REPEATS:
+        return av[0] != av[1]
+    if op is sre.BRANCH:
+        return len({branch.getwidth() for branch in av[1]}) > 1
+    return False
+
+
+def _is_loop(op, av) -> bool:
+    if op not in REPEATS or av[1] < 2:
+        return False
+    low, high = av[2].getwidth()
+    if high == 0:
+        return False
+    return av[0] != av[1] or (av[1] > MAX_FIXED_REPEAT and low != high)
+
+
+def _is_ambiguous_loop(body, sample: set[int]) -> bool:
+    r"""
+    Whether a repeated body can split the same text into repetitions in
+    more than one way, which is what makes backtracking exponential.
+
+    The body is ambiguous if it holds, at any depth, an alternation whose
+    branches can start with the same character, e.g. `(a|ab)+`, or a
+    variable-length part, e.g. `(a+)+` or `(\w+\s?)+`. The latter is
+    allowed when the body starts or ends with a single character none of
+    its variable-length parts can match, e.g. `(-[a-z]+)*` or `([a-z]+,)*`,
+    since that character fixes where each repetition begins.
+    """
+    nodes = list(_nodes(body))
+    if any(op is sre.BRANCH and _branches_overlap(av[1], sample) for op, av in nodes):
+        return True
+    variable = [(op, av) for op, av in nodes if _is_variable(op, av)]
+    if not variable:
+        return False
+    loose = [
+        atom
+        for op, av in variable
+        for child in _children(op, av)
+        for atom in _atoms(child)
+    ]
+    for edge in (_edge_atom(body, 0), _edge_atom(body, -1)):
+        if edge is not None and not any(
+            _overlap(edge, atom, sample) for atom in loose
+        ):
+            return False
+    return True
+
+
+def _sample(tree) -> set[int]:
+    sample = set(range(CHAR_SAMPLE_SIZE))
+    for op, av in _atoms(tree):
+        if op in (sre.LITERAL, sre.NOT_LITERAL):
+            sample.add(av)
+        elif op is sre.IN:
+            for item_op, item_av in av:
+                if item_op is sre.LITERAL:
+                    sample.add(item_av)
+                elif item_op is sre.RANGE:
+                    sample.update(item_av)
+    return sample
+
+
+def validate_regex(pattern: Any) -> None:
+    """
+    Reject regular expressions that are invalid or prone to catastrophic
+    backtracking, since MongoDB evaluates them without a time limit.
+
+    The pattern is parsed and every repeat that can run more than once is
+    checked with `_is_ambiguous_loop`, however deeply it is nested.
+
+    Args:
+        pattern (Any): The value of a `regex` condition.
+
+    Raises:
+        ValueError: If the pattern is not accepted.
+    """
+    if not isinstance(pattern, str) or not pattern:
+        raise ValueError("Regex value must be a non-empty string")
+    if len(pattern) > MAX_REGEX_LENGTH:
+        raise ValueError(f"Regex must be at most {MAX_REGEX_LENGTH} characters")
+    try:
+        tree = sre_parse.parse(pattern)
+    except re.error as exc:
+        raise ValueError(f"Invalid regex: {exc}")
+    sample = _sample(tree)
+    if any(
+        op in (sre.GROUPREF, sre.GROUPREF_EXISTS)
+        or (_is_loop(op, av) and _is_ambiguous_loop(av[2], sample))
+        for op, av in _nodes(tree)
+    ):
+        raise ValueError(
+            "Regex must not contain nested quantifiers or backreferences"
+        )
+
+
+def count_text_conditions(conditions: list) -> int:
+    return sum(c.operator == Operator.TEXT for c in conditions)
 
 
 class LogicalOperator(str, Enum):
@@ -42,11 +306,40 @@ class ConditionSchema(BaseModel):
     operator: Operator
     value: Any
 
+    @model_validator(mode="after")
+    def validate_value(self, info: ValidationInfo):
+        if is_stored(info):
+            return self
+        if self.operator == Operator.REGEX:
+            validate_regex(self.value)
+        elif self.operator in (Operator.PREFIX, Operator.TEXT):
+            if not isinstance(self.value, str) or not self.value:
+                raise ValueError(
+                    f"'{self.operator.value}' value must be a non-empty string"
+                )
+        if self.operator == Operator.TEXT and self.field not in TEXT_SEARCH_FIELDS:
+            raise ValueError(
+                f"Text search is only available on: {', '.join(TEXT_SEARCH_FIELDS)}"
+            )
+        return self
+
 
 class FilterNestedCreateSchema(ConditionsMixin):
     conditions: list[ConditionSchema]
     logical_operator: LogicalOperator = LogicalOperator.AND
 
+    @model_validator(mode="after")
+    def validate_text_placement(self):
+        # MongoDB only accepts `$text` under `$or` when every other branch
+        # is indexed, so text conditions are limited to AND groups.
+        if (
+            count_text_conditions(self.conditions)
+            and self.logical_operator == LogicalOperator.OR
+            and len(self.conditions) > 1
+        ):
+            raise ValueError("Text conditions cannot be combined with OR")
+        return self
+
     model_config = {"from_attributes": True}
 
 
@@ -55,6 +348,22 @@ class FilterCreateSchema(ConditionsMixin):
     logical_operator: LogicalOperator = LogicalOperator.AND
     conditions: list[FilterNestedCreateSchema]
 
+    @model_validator(mode="after")
+    def validate_text_placement(self):
+        text_groups = [
+            group for group in self.conditions
+            if count_text_conditions(group.conditions)
+        ]
+        if sum(count_text_conditions(g.conditions) for g in text_groups) > 1:
+            raise ValueError("A filter can contain at most one text condition")
+        if (
+            text_groups
+            and self.logical_operator == LogicalOperator.OR
+            and len(self.conditions) > 1
+        ):
+            raise ValueError("Text conditions cannot be combined with OR")
+        return self
+
     model_config = {
         "from_attributes": True,
         "json_schema_extra": {"examples": [filter_schema_example]},
@@ -63,19 +372,29 @@ class FilterCreateSchema(ConditionsMixin):
 
 class FilterResponseSchema(FilterCreateSchema):
     id: PydanticObjectId
+    revision: int = 0
 
     model_config = {"from_attributes": True}
 
 
 class FilterUpdateSchema(ConditionsMixin):
-    name: Optional[str] = None
+    name: Optional[str] = Field(None, max_length=100)
     conditions: Optional[list[FilterNestedCreateSchema]] = None
     logical_operator: Optional[LogicalOperator] = None
+    revision: Optional[int] = Field(None, ge=0)
+
+    @field_validator("name", "conditions", "logical_operator", mode="before")
+    @classmethod
+    def validate_not_null(cls, value):
+        # Fields are optional to leave out, but a stored filter needs them.
+        if value is None:
+            raise ValueError("Field cannot be null")
+        return value
 
     @field_validator("name")
     @classmethod
     def validate_name(cls, value):
-        if value is not None and value.strip() == "":
+        if value.strip() == "":
             raise ValueError("Name must have at least 1 character")
         return value
 
@@ -83,3 +402,19 @@ class FilterUpdateSchema(ConditionsMixin):
         "from_attributes": True,
         "json_schema_extra": {"examples": [filter_schema_example]},
     }
+
+
+class FilterExplainSchema(BaseModel):
+    filter_name: str
+    query: dict[str, Any]
+    stages: list[str]
+    indexes: list[str]
+    collection_scan: bool
+    returned: int
+    docs_examined: int
+    keys_examined: int
+    execution_time_ms: int
+    rejected_plans: int
+    winning_plan: dict[str, Any]
+
+    model_config = {"from_attributes": True}
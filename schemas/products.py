@@ -1,6 +1,22 @@
+from decimal import Decimal
+from enum import Enum
 from typing import List, Optional
 from beanie import PydanticObjectId
-from pydantic import BaseModel, condecimal, field_validator, Field
+from pydantic import (
+    BaseModel,
+    condecimal,
+    field_serializer,
+    field_validator,
+    Field,
+    model_validator,
+)
+
+
+class CountStrategy(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    CACHED = "cached"
+    NONE = "none"
 
 
 class ProductCreateSchema(BaseModel):
@@ -16,8 +32,13 @@ class ProductListCreateSchema(BaseModel):
     @field_validator("products")
     @classmethod
     def validate_product(cls, products):
-        names = [p.name for p in products]
-        duplicates = {name for name in names if names.count(name) > 1}
+        seen = set()
+        duplicates = {}
+        for product in products:
+            if product.name in seen:
+                duplicates[product.name] = None
+            else:
+                seen.add(product.name)
         if duplicates:
             raise ValueError(f"Duplicate product names in request: {list(duplicates)}")
         return products
@@ -26,7 +47,13 @@ class ProductListCreateSchema(BaseModel):
 class ProductResponseSchema(BaseModel):
     id: PydanticObjectId
     name: str
-    price: float
+    price: Decimal
+
+    @field_serializer("price", when_used="json")
+    def serialize_price(self, price: Decimal) -> float:
+        # Keeps `price` a JSON number outside `responses.dumps`, which
+        # writes the exact decimal instead.
+        return float(price)
 
     model_config = {"from_attributes": True, "extra": "allow"}
 
@@ -44,6 +71,7 @@ class ProductListResponseSchema(BaseModel):
 class ProductUpdateSchema(BaseModel):
     name: Optional[str] = None
     price: Optional[condecimal(ge=0, max_digits=10, decimal_places=2)] = None
+    revision: Optional[int] = Field(None, ge=0)
 
     @field_validator("name")
     @classmethod
@@ -52,4 +80,32 @@ class ProductUpdateSchema(BaseModel):
             raise ValueError("Name must have at least 1 character")
         return value
 
+    @model_validator(mode="after")
+    def validate_extra_fields(self):
+        # Extra fields become `$set` keys and query clauses; operators,
+        # dotted paths and `_id` would change what the write does.
+        for key in self.model_extra or {}:
+            if not key or key.startswith("$") or "." in key or key == "_id":
+                raise ValueError(f"Invalid field name '{key}'")
+        return self
+
     model_config = {"from_attributes": True, "extra": "allow"}
+
+
+class ImportRowErrorSchema(BaseModel):
+    line: int
+    error: str
+
+    model_config = {"from_attributes": True}
+
+
+class ImportReportSchema(BaseModel):
+    received: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[ImportRowErrorSchema]
+    elapsed_seconds: float
+    rows_per_second: float
+
+    model_config = {"from_attributes": True}
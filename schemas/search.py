@@ -0,0 +1,41 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from schemas.products import CountStrategy, ProductListResponseSchema
+
+
+class BatchSearchItemSchema(BaseModel):
+    filter_name: str = Field(min_length=1, max_length=100)
+    page: int = Field(1, ge=1)
+    per_page: int = Field(10, ge=1, le=20)
+    cursor: Optional[str] = None
+    count: CountStrategy = CountStrategy.EXACT
+    fields: Optional[str] = None
+    sort: Optional[str] = None
+
+
+class BatchSearchRequestSchema(BaseModel):
+    searches: List[BatchSearchItemSchema] = Field(min_length=1, max_length=50)
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "searches": [
+                        {"filter_name": "New Filter", "per_page": 5},
+                        {"filter_name": "Bestsellers", "cursor": ""},
+                    ]
+                }
+            ]
+        }
+    }
+
+
+class BatchSearchResultSchema(BaseModel):
+    filter_name: str
+    status_code: int
+    detail: Optional[str] = None
+    result: Optional[ProductListResponseSchema] = None
+
+
+class BatchSearchResponseSchema(BaseModel):
+    results: List[BatchSearchResultSchema]
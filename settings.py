@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -12,4 +13,60 @@ class Settings(BaseSettings):
     MONGODB_URI: str
     MONGODB_DB_NAME: str
 
-settings = Settings()
\ No newline at end of file
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    MONGODB_COMPRESSORS: Optional[str] = None
+    MONGODB_READ_PREFERENCE: str = "primary"
+    MONGODB_READ_CONCERN: Optional[str] = None
+
+    CACHE_CONTROL_PRODUCTS: str = "no-cache"
+    CACHE_CONTROL_SEARCH: str = "no-cache"
+    CACHE_CONTROL_FILTERS: str = "no-cache"
+
+    FILTER_CACHE_MAXSIZE: int = 1024
+    FILTER_CACHE_TTL: float = 60.0
+
+    COUNT_CACHE_MAXSIZE: int = 1024
+    COUNT_CACHE_TTL: float = 30.0
+
+    PRODUCT_CACHE_BACKEND: str = "memory"
+    PRODUCT_CACHE_MAXSIZE: int = 10000
+    PRODUCT_CACHE_TTL: float = 60.0
+
+    FACET_CACHE_MAXSIZE: int = 256
+    FACET_CACHE_TTL: float = 30.0
+
+    BATCH_SEARCH_CONCURRENCY: int = 8
+
+    AUTO_INDEX_FILTERS: bool = False
+
+    EXPORT_BATCH_SIZE: int = 1000
+    EXPORT_MAX_COLUMNS: int = 100
+
+    IMPORT_CHUNK_SIZE: int = 1000
+    IMPORT_CONCURRENCY: int = 4
+    IMPORT_MAX_ERRORS: int = 1000
+
+    BULK_BATCH_SIZE: int = 1000
+    BULK_MAX_IDS: int = 10000
+
+    METRICS_ENABLED: bool = True
+
+    SORT_ALLOW_UNINDEXED: bool = False
+
+    SNAPSHOT_ENABLED: bool = False
+    SNAPSHOT_REFRESH_SECONDS: float = 30.0
+    SNAPSHOT_MAX_STALENESS: float = 60.0
+    SNAPSHOT_CONSISTENCY: str = "bounded"
+    SNAPSHOT_MAX_DOCUMENTS: int = 200000
+
+    INVALIDATION_MODE: Literal["change_stream", "auto", "poll", "off"] = (
+        "change_stream"
+    )
+    INVALIDATION_POLL_SECONDS: float = 5.0
+    INVALIDATION_DEBOUNCE_SECONDS: float = 0.5
+    INVALIDATION_TOKEN_COLLECTION: str = "change_stream_tokens"
+
+settings = Settings()
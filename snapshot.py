@@ -0,0 +1,605 @@
+import asyncio
+import logging
+import operator
+import re
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Callable, Iterable, Optional
+
+from bson import Decimal128, ObjectId
+from pydantic import ValidationError
+
+from filter_builder import build_query
+from models.filters import Filter
+from models.products import Product
+from schemas.filters import STORED, FilterCreateSchema
+from settings import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+LOGICAL_OPERATORS = ("$and", "$or")
+REGEX_FLAGS = (
+    ("i", re.IGNORECASE),
+    ("m", re.MULTILINE),
+    ("s", re.DOTALL),
+    ("x", re.VERBOSE),
+)
+COMPARISONS = {
+    "$eq": (np.equal if np else None, operator.eq),
+    "$gt": (np.greater if np else None, operator.gt),
+    "$gte": (np.greater_equal if np else None, operator.ge),
+    "$lt": (np.less if np else None, operator.lt),
+    "$lte": (np.less_equal if np else None, operator.le),
+}
+
+
+class UnsupportedQuery(Exception):
+    """
+    Raised when a query uses something the snapshot cannot evaluate exactly;
+    callers then run it against MongoDB instead.
+    """
+
+
+def _exact(value: Any) -> Optional[Decimal]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    if isinstance(value, (int, float, Decimal)):
+        exact = Decimal(value)
+        return None if exact.is_snan() else exact
+    return None
+
+
+def _is_inexact(exact: Optional[Decimal]) -> bool:
+    return exact is not None and exact.is_finite() and Decimal(float(exact)) != exact
+
+
+def _to_float(element: Any, decimals: dict) -> tuple[float, bool]:
+    """
+    An element as float64 and whether that rounded it; NaN if not numeric.
+
+    Decimal conversions, the slow part, are memoized in `decimals` since
+    prices repeat a lot.
+    """
+    if isinstance(element, bool):
+        return np.nan, False
+    if isinstance(element, float):
+        return element, False
+    if isinstance(element, int):
+        return float(element), abs(element) > 2**53
+    if isinstance(element, Decimal128):
+        converted = decimals.get(element.bid)
+        if converted is None:
+            converted = decimals[element.bid] = _to_float(element.to_decimal(), {})
+        return converted
+    exact = _exact(element)
+    if exact is None:
+        return np.nan, False
+    return float(exact), _is_inexact(exact)
+
+
+def _compile_regex(pattern: Any, options: Any) -> Optional[re.Pattern]:
+    if not isinstance(pattern, str) or not isinstance(options, str):
+        return None
+    if set(options) - {option for option, _ in REGEX_FLAGS}:
+        return None
+    flags = 0
+    for option, flag in REGEX_FLAGS:
+        if option in options:
+            flags |= flag
+    try:
+        return re.compile(pattern, flags)
+    except re.error:
+        return None
+
+
+def referenced(query: dict, paths: set, regexes: set) -> None:
+    """
+    Collect the field paths and `(path, pattern, options)` regexes a
+    query uses, so the snapshot can prepare them ahead of requests.
+    """
+    for key, value in query.items():
+        if key in LOGICAL_OPERATORS:
+            for child in value:
+                referenced(child, paths, regexes)
+        elif not key.startswith("$"):
+            paths.add(key)
+            if isinstance(value, dict) and "$regex" in value:
+                regexes.add((key, value["$regex"], value.get("$options", "")))
+
+
+def projection_for(paths: set) -> dict:
+    """
+    Projection loading `paths`, leaving out paths already covered by a
+    parent so MongoDB does not reject it with a path collision.
+    """
+    kept: list[str] = []
+    for path in sorted(paths, key=len):
+        if not any(path == k or path.startswith(f"{k}.") for k in kept):
+            kept.append(path)
+    return {"_id": 1, **{path: 1 for path in kept}}
+
+
+async def stored_filter_queries() -> list[dict]:
+    queries = []
+    for filter_ in await Filter.find_all().to_list():
+        try:
+            filter_data = FilterCreateSchema.model_validate(filter_, context=STORED)
+        except ValidationError:
+            continue
+        queries.append(build_query(filter_data))
+    return queries
+
+
+def _lookup(document: dict, path: str) -> Any:
+    value: Any = document
+    for part in path.split("."):
+        if isinstance(value, list):
+            # Dotted paths through arrays fan out in MongoDB; not modelled.
+            raise UnsupportedQuery(f"Path '{path}' traverses an array.")
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+@dataclass
+class Column:
+    """
+    One field of the snapshot, flattened so array elements are matched the
+    way MongoDB does: a row matches if the value or any element does.
+
+    Attributes:
+        rows (np.ndarray): Owning row of every element.
+        elements (list): Raw element values.
+        numbers (np.ndarray): Element as float64, NaN if not numeric.
+        inexact (np.ndarray): True where float64 does not hold the element
+            exactly, e.g. most `Decimal128` values.
+        strings (np.ndarray): Element as a string, "" if not a string.
+        is_string (np.ndarray): True for string elements.
+        booleans (np.ndarray): 1 or 0 for boolean elements, -1 otherwise.
+        present (np.ndarray): Per row, True if the field is set and not null.
+        regexes (dict): Element match mask per prepared `(pattern, options)`.
+    """
+
+    rows: Any
+    elements: list
+    numbers: Any
+    inexact: Any
+    strings: Any
+    is_string: Any
+    booleans: Any
+    present: Any
+    regexes: dict = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls, documents: list[dict], path: str, regexes: Iterable[tuple] = ()
+    ) -> "Column":
+        present, rows, elements = [], [], []
+        for row, document in enumerate(documents):
+            value = _lookup(document, path)
+            present.append(value is not _MISSING and value is not None)
+            if value is _MISSING:
+                continue
+            for element in value if isinstance(value, list) else [value]:
+                rows.append(row)
+                elements.append(element)
+
+        decimals: dict = {}
+        numbers = [_to_float(element, decimals) for element in elements]
+        column = cls(
+            rows=np.array(rows, dtype=np.int64),
+            elements=elements,
+            numbers=np.array([number for number, _ in numbers], dtype=np.float64),
+            inexact=np.array([inexact for _, inexact in numbers], dtype=bool),
+            strings=np.array(
+                [element if isinstance(element, str) else "" for element in elements],
+                dtype=np.dtypes.StringDType(),
+            ),
+            is_string=np.array(
+                [isinstance(element, str) for element in elements], dtype=bool
+            ),
+            booleans=np.array(
+                [int(e) if isinstance(e, bool) else -1 for e in elements],
+                dtype=np.int8,
+            ),
+            present=np.array(present, dtype=bool),
+        )
+        column.prepare_regexes(regexes)
+        return column
+
+    def prepare_regexes(self, regexes: Iterable[tuple]) -> None:
+        # Each distinct string is matched once; rows reuse it via `inverse`.
+        string_elements = np.flatnonzero(self.is_string)
+        unique, inverse = np.unique(
+            self.strings[string_elements], return_inverse=True
+        )
+        for pattern, options in regexes:
+            expression = _compile_regex(pattern, options)
+            if expression is None:
+                continue
+            hits = np.array(
+                [bool(expression.search(str(s))) for s in unique], dtype=bool
+            )
+            mask = np.zeros(len(self.elements), dtype=bool)
+            mask[string_elements] = hits[inverse]
+            self.regexes[(pattern, options)] = mask
+
+
+@dataclass
+class Snapshot:
+    """
+    Immutable columnar copy of the `products` fields that stored filters
+    use, ordered by `_id`.
+
+    Only the prepared columns and regexes are evaluated; anything else
+    raises `UnsupportedQuery`, so nothing is built on the request path.
+    """
+
+    ids: Any
+    built_at: float
+    generation: int
+    columns: dict[str, Column] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        documents: list[dict],
+        paths: Iterable[str],
+        regexes: Iterable[tuple],
+        built_at: float,
+        generation: int,
+    ) -> "Snapshot":
+        ids = np.empty(len(documents), dtype=object)
+        ids[:] = [document["_id"] for document in documents]
+        snapshot = cls(ids=ids, built_at=built_at, generation=generation)
+        for path in paths:
+            try:
+                snapshot.columns[path] = Column.build(
+                    documents,
+                    path,
+                    [(p, o) for field_, p, o in regexes if field_ == path],
+                )
+            except UnsupportedQuery as exc:
+                logger.debug("Snapshot column skipped: %s", exc)
+        return snapshot
+
+    def column(self, path: str) -> Column:
+        column = self.columns.get(path)
+        if column is None:
+            raise UnsupportedQuery(f"Field '{path}' is not in the snapshot.")
+        return column
+
+    def evaluate(self, query: dict) -> Any:
+        """
+        Evaluate a MongoDB query as a boolean mask over the snapshot rows.
+
+        Supports `$and`, `$or`, implicit equality and `$eq`, `$ne`, `$gt`,
+        `$gte`, `$lt`, `$lte`, `$in`, `$nin` and prepared `$regex`/`$options`,
+        which covers everything `build_query` emits except `$text`. Numbers
+        are compared as float64; ties are settled exactly, so `Decimal128`
+        prices compare with doubles the way MongoDB compares them.
+
+        Args:
+            query (dict): MongoDB query dictionary.
+
+        Returns:
+            np.ndarray: One boolean per row, True where the query matches.
+
+        Raises:
+            UnsupportedQuery: If the query cannot be evaluated exactly.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for key, value in query.items():
+            if key == "$and":
+                for child in value:
+                    mask &= self.evaluate(child)
+            elif key == "$or":
+                branches = np.zeros(len(self), dtype=bool)
+                for child in value:
+                    branches |= self.evaluate(child)
+                mask &= branches
+            elif key.startswith("$"):
+                raise UnsupportedQuery(f"Operator '{key}' is not supported.")
+            else:
+                mask &= self._field(key, value)
+        return mask
+
+    def _field(self, path: str, condition: Any) -> Any:
+        column = self.column(path)
+        if not (
+            isinstance(condition, dict)
+            and condition
+            and all(key.startswith("$") for key in condition)
+        ):
+            return self._equals(column, condition)
+
+        mask = np.ones(len(self), dtype=bool)
+        for op, value in condition.items():
+            if op == "$options":
+                continue
+            if op == "$eq":
+                mask &= self._equals(column, value)
+            elif op == "$ne":
+                mask &= ~self._equals(column, value)
+            elif op in ("$in", "$nin") and isinstance(value, list):
+                matched = np.zeros(len(self), dtype=bool)
+                for item in value:
+                    matched |= self._equals(column, item)
+                mask &= matched if op == "$in" else ~matched
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                mask &= self._compare(column, op, value)
+            elif op == "$regex":
+                mask &= self._regex(column, (value, condition.get("$options", "")))
+            else:
+                raise UnsupportedQuery(f"Operator '{op}' is not supported.")
+        return mask
+
+    def _rows(self, column: Column, element_mask: Any) -> Any:
+        mask = np.zeros(len(self), dtype=bool)
+        mask[column.rows[element_mask]] = True
+        return mask
+
+    def _equals(self, column: Column, value: Any) -> Any:
+        if value is None:
+            return ~column.present
+        if isinstance(value, bool):
+            return self._rows(column, column.booleans == int(value))
+        if _exact(value) is not None:
+            return self._compare(column, "$eq", value)
+        if isinstance(value, str):
+            return self._rows(column, column.is_string & (column.strings == value))
+        raise UnsupportedQuery(f"Cannot match {type(value).__name__} values.")
+
+    def _compare(self, column: Column, op: str, value: Any) -> Any:
+        compare, compare_exact = COMPARISONS[op]
+        exact = _exact(value)
+        if exact is not None:
+            number = float(exact)
+            elements = compare(column.numbers, number)
+            # float64 rounding keeps order, so only equal floats can hide a
+            # different exact order, and only if one side was rounded.
+            ties = column.numbers == number
+            if not _is_inexact(exact):
+                ties &= column.inexact
+            for index in np.flatnonzero(ties):
+                elements[index] = compare_exact(
+                    _exact(column.elements[index]), exact
+                )
+            return self._rows(column, elements)
+        if isinstance(value, str):
+            return self._rows(column, column.is_string & compare(column.strings, value))
+        raise UnsupportedQuery(f"Cannot compare with {type(value).__name__}.")
+
+    def _regex(self, column: Column, regex: tuple) -> Any:
+        elements = column.regexes.get(regex)
+        if elements is None:
+            raise UnsupportedQuery("Regular expression was not prepared.")
+        return self._rows(column, elements)
+
+
+@dataclass
+class SnapshotMatch:
+    """
+    Rows of a snapshot matching a query, in `_id` order.
+    """
+
+    snapshot: Snapshot
+    rows: Any
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def page_ids(self, start: int, stop: int) -> list[ObjectId]:
+        return list(self.snapshot.ids[self.rows[start:stop]])
+
+    def position_after(self, last_id: ObjectId) -> int:
+        return int(
+            np.searchsorted(self.snapshot.ids[self.rows], last_id, side="right")
+        )
+
+
+class SnapshotEngine:
+    """
+    Keeps a periodically refreshed in-memory snapshot of the `products`
+    collection and answers compiled filter queries from it.
+
+    Consistency modes:
+
+    - `bounded`: serve from a snapshot at most `max_staleness` seconds old;
+    - `strict`: additionally require that this instance has not written to
+      the collection since the snapshot was taken.
+
+    Anything else (no snapshot yet, too old, unsupported query) returns
+    None so the caller falls back to MongoDB.
+
+    Besides the periodic refresh, `request_refresh` schedules an early one,
+    at most every `min_refresh_seconds`, e.g. when another instance writes.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: float,
+        max_staleness: float,
+        consistency: str = "bounded",
+        max_documents: int = 200_000,
+        min_refresh_seconds: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.max_staleness = max_staleness
+        self.consistency = consistency
+        self.max_documents = max_documents
+        self.min_refresh_seconds = min_refresh_seconds
+        self.clock = clock
+        self.snapshot: Optional[Snapshot] = None
+        self.writes = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_requested: Optional[asyncio.Event] = None
+
+    @property
+    def available(self) -> bool:
+        return np is not None
+
+    def mark_dirty(self) -> None:
+        self.writes += 1
+
+    def request_refresh(self) -> None:
+        if self._refresh_requested is not None:
+            self._refresh_requested.set()
+
+    async def refresh(
+        self, queries: Optional[list[dict]] = None
+    ) -> Optional[Snapshot]:
+        """
+        Load the collection into a new snapshot and swap it in.
+
+        Only the fields the queries use are downloaded. Columns and regex
+        matches are built in a worker thread so requests never wait for
+        them.
+
+        Args:
+            queries (Optional[list[dict]]): Queries to prepare the snapshot
+                for; by default those of the stored filters.
+
+        Returns:
+            Optional[Snapshot]: The new snapshot, or None when numpy is not
+                installed or the collection exceeds `max_documents`.
+        """
+        if not self.available:
+            return None
+        generation = self.writes
+        collection = Product.get_pymongo_collection()
+        if await collection.estimated_document_count() > self.max_documents:
+            return self._disable()
+
+        if queries is None:
+            queries = await stored_filter_queries()
+        paths: set = set()
+        regexes: set = set()
+        for query in queries:
+            referenced(query, paths, regexes)
+
+        documents = await (
+            collection.find({}, projection_for(paths))
+            .sort("_id", 1)
+            .limit(self.max_documents + 1)
+            .to_list(None)
+        )
+        if len(documents) > self.max_documents:
+            return self._disable()
+
+        self.snapshot = await asyncio.to_thread(
+            Snapshot.build, documents, paths, regexes, self.clock(), generation
+        )
+        return self.snapshot
+
+    def _disable(self) -> None:
+        logger.warning(
+            "Products snapshot disabled: more than %d documents.",
+            self.max_documents,
+        )
+        self.snapshot = None
+        return None
+
+    def current(self) -> Optional[Snapshot]:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        if self.clock() - snapshot.built_at > self.max_staleness:
+            return None
+        if self.consistency == "strict" and snapshot.generation != self.writes:
+            return None
+        return snapshot
+
+    def match(self, query: dict) -> Optional[SnapshotMatch]:
+        """
+        Evaluate `query` against the current snapshot.
+
+        Args:
+            query (dict): MongoDB query, e.g. a compiled filter's query.
+
+        Returns:
+            Optional[SnapshotMatch]: Matching rows, or None to use MongoDB.
+        """
+        snapshot = self.current()
+        if snapshot is None:
+            self.fallbacks += 1
+            return None
+        try:
+            mask = snapshot.evaluate(query)
+        except UnsupportedQuery as exc:
+            logger.debug("Snapshot fallback: %s", exc)
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        return SnapshotMatch(snapshot=snapshot, rows=np.flatnonzero(mask))
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "consistency": self.consistency,
+            "documents": len(snapshot) if snapshot is not None else None,
+            "age_seconds": (
+                self.clock() - snapshot.built_at if snapshot is not None else None
+            ),
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+        }
+
+    async def _run(self) -> None:
+        requested = self._refresh_requested = asyncio.Event()
+        while True:
+            requested.clear()
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Products snapshot refresh failed.")
+            await asyncio.sleep(self.min_refresh_seconds)
+            try:
+                await asyncio.wait_for(
+                    requested.wait(),
+                    max(0.0, self.refresh_seconds - self.min_refresh_seconds),
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if not self.available:
+            logger.warning("SNAPSHOT_ENABLED is set but numpy is not installed.")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._refresh_requested = None
+
+
+snapshot_engine = SnapshotEngine(
+    refresh_seconds=settings.SNAPSHOT_REFRESH_SECONDS,
+    max_staleness=settings.SNAPSHOT_MAX_STALENESS,
+    consistency=settings.SNAPSHOT_CONSISTENCY,
+    max_documents=settings.SNAPSHOT_MAX_DOCUMENTS,
+)
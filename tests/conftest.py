@@ -1,14 +1,26 @@
+import os
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGODB_DB_NAME", "test_db")
+
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from fastapi import FastAPI
 from beanie import init_beanie
 from mongomock_motor import AsyncMongoMockClient
+from cache import caches, product_cache
+from metrics import MetricsMiddleware, registry
 from models.filters import Filter
 from models.products import Product
 from routes.products import router as products_router
 from routes.filters import router as filters_router
 from routes.search import router as search_router
+from routes.admin import router as admin_router
+from routes.export import router as export_router
+from routes.facets import router as facets_router
+from routes.metrics import router as metrics_router
+from snapshot import snapshot_engine
 
 
 @pytest_asyncio.fixture
@@ -20,7 +32,8 @@ async def client():
     initializes Beanie ODM with Product and Filter models, and includes
     the product and filter routers in the FastAPI app. The client can
     be used in asynchronous tests to perform CRUD operations against
-    /products and /filters endpoints.
+    /products and /filters endpoints. In-process caches are cleared so
+    that no state leaks between tests.
 
     Yields:
         AsyncClient: An HTTPX async client connected to the FastAPI app.
@@ -30,6 +43,17 @@ async def client():
     app.include_router(products_router, prefix="/products")
     app.include_router(filters_router, prefix="/filters")
     app.include_router(search_router, prefix="/search")
+    app.include_router(admin_router, prefix="/admin")
+    app.include_router(export_router, prefix="/export")
+    app.include_router(facets_router, prefix="/facets")
+    app.include_router(metrics_router)
+    app.add_middleware(MetricsMiddleware)
+
+    for cache in caches:
+        cache.clear()
+    await product_cache.clear()
+    registry.clear()
+    snapshot_engine.snapshot = None
 
     mongo_client = AsyncMongoMockClient()
     db = mongo_client.test_db
@@ -0,0 +1,99 @@
+import pytest
+from httpx import AsyncClient
+
+from models.products import Product
+
+
+@pytest.mark.asyncio
+async def test_index_report_for_stored_filters(
+    client: AsyncClient, filter_one_template
+):
+    """
+    Test that the index advisor proposes ESR-ordered indexes without building them.
+    """
+    await client.post("/filters/", json=filter_one_template)
+
+    response = await client.get("/admin/indexes/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    report = response.json()
+    keys = [proposal["keys"] for proposal in report["proposals"]]
+    assert keys == [
+        [["test1", 1], ["test2", 1]],
+        [["test3", 1], ["test4", 1]],
+    ], f"Unexpected index proposals: {keys}"
+    assert report["created"] == [], "A report must not build indexes."
+    assert report["scanning_filters"] == ["Filter1"], "Filter1 should still scan."
+
+
+@pytest.mark.asyncio
+async def test_build_indexes_for_stored_filters(
+    client: AsyncClient, filter_one_template
+):
+    """
+    Test building proposed indexes and dropping them once no filter needs them.
+    """
+    await client.post("/filters/", json=filter_one_template)
+
+    response = await client.post("/admin/indexes/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    report = response.json()
+    assert report["created"] == [
+        "auto_test1_1_test2_1",
+        "auto_test3_1_test4_1",
+    ], f"Unexpected created indexes: {report['created']}"
+    assert report["scanning_filters"] == [], "No filter should scan after build."
+
+    update_data = {
+        "conditions": [
+            {"conditions": [{"field": "test5", "operator": "regex", "value": "x"}]}
+        ]
+    }
+    await client.patch("/filters/Filter1/", json=update_data)
+
+    report = (await client.post("/admin/indexes/")).json()
+    assert sorted(report["dropped"]) == [
+        "auto_test1_1_test2_1",
+        "auto_test3_1_test4_1",
+    ], f"Unexpected dropped indexes: {report['dropped']}"
+    assert report["scanning_filters"] == [
+        "Filter1"
+    ], "A regex-only filter cannot use an index."
+
+
+@pytest.mark.asyncio
+async def test_build_indexes_skips_covered_proposals(client: AsyncClient):
+    """
+    Test that a proposal served by a longer existing index is not built, and
+    that an advisor index made redundant by one is dropped.
+    """
+    price_filter = {
+        "name": "Cheap",
+        "conditions": [
+            {"conditions": [{"field": "price", "operator": "<", "value": 10}]}
+        ],
+    }
+    await client.post("/filters/", json=price_filter)
+    collection = Product.get_pymongo_collection()
+    await collection.create_index([("price", 1)], name="auto_price_1")
+
+    report = (await client.post("/admin/indexes/")).json()
+    assert [p["keys"] for p in report["proposals"]] == [[["price", 1]]]
+    assert report["created"] == [], f"Unexpected created: {report['created']}"
+    assert report["dropped"] == ["auto_price_1"], f"Got {report['dropped']}"
+    assert report["scanning_filters"] == [], "price_id serves the filter."
+
+
+@pytest.mark.asyncio
+async def test_pool_stats(client: AsyncClient):
+    """
+    Test that connection pool counters are exposed.
+    """
+    response = await client.get("/admin/pool/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    stats = response.json()
+    assert stats["max_pool_size"] == 100, "Expected the default max pool size."
+    for key in ("open", "created", "closed", "checked_out", "waiting"):
+        assert key in stats, f"Missing pool counter '{key}'."
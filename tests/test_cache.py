@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from cache import InMemoryCacheBackend, ReadThroughCache, TTLCache
+
+
+def test_ttl_cache_expires_and_evicts():
+    """
+    Test TTL expiry and LRU eviction of the in-process cache.
+    """
+    now = [0.0]
+    cache = TTLCache(name="test", maxsize=2, ttl=10, clock=lambda: now[0])
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1, "Expected a cached value."
+
+    cache.set("c", 3)
+    assert cache.get("b") is None, "Least recently used entry should be evicted."
+    assert cache.stats()["evictions"] == 1, "Expected one eviction."
+
+    now[0] = 11
+    assert cache.get("a") is None, "Entry should expire after the TTL."
+
+
+@pytest.mark.asyncio
+async def test_read_through_cache_single_flight():
+    """
+    Test that concurrent misses for one key trigger a single load.
+    """
+    cache = ReadThroughCache("test", InMemoryCacheBackend(maxsize=10, ttl=60))
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return {"value": loads}
+
+    results = await asyncio.gather(*(cache.get_or_load("key", loader) for _ in range(5)))
+
+    assert loads == 1, f"Expected a single load, got {loads}"
+    assert all(r == {"value": 1} for r in results), "All callers share the result."
+    assert cache.stats()["coalesced"] == 4, "Expected 4 coalesced lookups."
+
+
+@pytest.mark.asyncio
+async def test_read_through_cache_leader_cancellation():
+    """
+    Test that cancelling the caller that started a load does not cancel it
+    for the callers waiting on the same key.
+    """
+    cache = ReadThroughCache("test", InMemoryCacheBackend(maxsize=10, ttl=60))
+    started = asyncio.Event()
+
+    async def loader():
+        started.set()
+        await asyncio.sleep(0.01)
+        return "value"
+
+    leader = asyncio.create_task(cache.get_or_load("key", loader))
+    await started.wait()
+    follower = asyncio.create_task(cache.get_or_load("key", loader))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "value", "The follower should get the loaded value."
+    assert leader.cancelled(), "The leader's own wait should be cancelled."
+    assert await cache.backend.get("key") == "value", "Expected the value cached."
+
+
+@pytest.mark.asyncio
+async def test_read_through_cache_invalidation_during_load():
+    """
+    Test that a load racing with an invalidation is not stored.
+    """
+    cache = ReadThroughCache("test", InMemoryCacheBackend(maxsize=10, ttl=60))
+
+    async def loader():
+        await cache.invalidate("key")
+        return "stale"
+
+    assert await cache.get_or_load("key", loader) == "stale"
+    assert await cache.backend.get("key") is None, "Stale load must not be cached."
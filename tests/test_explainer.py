@@ -0,0 +1,97 @@
+import pytest
+from httpx import AsyncClient
+
+import routes.filters
+from explainer import summarize_explain
+
+INDEXED_EXPLAIN = {
+    "queryPlanner": {
+        "winningPlan": {
+            "stage": "FETCH",
+            "inputStage": {
+                "stage": "IXSCAN",
+                "indexName": "auto_price_1",
+                "keyPattern": {"price": 1},
+            },
+        },
+        "rejectedPlans": [{"stage": "COLLSCAN"}],
+    },
+    "executionStats": {
+        "nReturned": 2,
+        "totalDocsExamined": 2,
+        "totalKeysExamined": 3,
+        "executionTimeMillis": 1,
+    },
+}
+
+SCANNING_EXPLAIN = {
+    "queryPlanner": {
+        "winningPlan": {
+            "queryPlan": {
+                "stage": "SUBPLAN",
+                "inputStage": {
+                    "stage": "OR",
+                    "inputStages": [
+                        {"stage": "IXSCAN", "indexName": "name_1"},
+                        {"stage": "COLLSCAN"},
+                    ],
+                },
+            }
+        },
+        "rejectedPlans": [],
+    },
+    "executionStats": {
+        "nReturned": 1,
+        "totalDocsExamined": 1000,
+        "totalKeysExamined": 1,
+        "executionTimeMillis": 12,
+    },
+}
+
+
+def test_summarize_explain_indexed_plan():
+    """
+    Test that an index-backed plan reports its index and counters.
+    """
+    explanation = summarize_explain({"price": {"$gt": 1}}, INDEXED_EXPLAIN)
+    assert explanation.stages == ["FETCH", "IXSCAN"], explanation.stages
+    assert explanation.indexes == ["auto_price_1"], explanation.indexes
+    assert not explanation.collection_scan, "No stage scans the collection."
+    assert explanation.docs_examined == 2, "Expected 2 documents examined."
+    assert explanation.rejected_plans == 1, "Expected one rejected plan."
+
+
+def test_summarize_explain_flags_collection_scan():
+    """
+    Test that a COLLSCAN in any branch, including SBE plans, is flagged.
+    """
+    explanation = summarize_explain({}, SCANNING_EXPLAIN)
+    assert explanation.collection_scan, "COLLSCAN branch should be flagged."
+    assert explanation.indexes == ["name_1"], explanation.indexes
+    assert explanation.execution_time_ms == 12, "Unexpected execution time."
+
+
+@pytest.mark.asyncio
+async def test_explain_filter(client: AsyncClient, filter_one_template, monkeypatch):
+    """
+    Test the `/filters/{filter_name}/explain/` endpoint.
+    """
+    explained = []
+
+    async def explain_query(query):
+        explained.append(query)
+        return summarize_explain(query, SCANNING_EXPLAIN)
+
+    monkeypatch.setattr(routes.filters, "explain_query", explain_query)
+    await client.post("/filters/", json=filter_one_template)
+
+    response = await client.get("/filters/Filter1/explain/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    data = response.json()
+    assert data["filter_name"] == "Filter1", f"Unexpected filter: {data}"
+    assert data["collection_scan"] is True, "Expected the scan to be flagged."
+    assert data["query"] == explained[0], "The compiled query should be explained."
+
+    response = await client.get("/filters/Missing/explain/")
+    assert response.status_code == 404, f"Expected 404, got {response.status_code}"
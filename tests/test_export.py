@@ -0,0 +1,105 @@
+import json
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_export_products_ndjson(client: AsyncClient, products_template):
+    """
+    Test streaming the whole catalog as NDJSON.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/export/products/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["name"] for row in rows] == [
+        "Product1",
+        "Product2",
+        "Product3",
+    ], "Expected every product in the export."
+    assert rows[0]["price"] == 100, f"Expected price 100, got {rows[0]['price']}"
+    assert rows[1]["test3"] == ["test_value", "value"], "Extra fields must be kept."
+    assert "id" in rows[0] and "_id" not in rows[0], "Expected `id` instead of `_id`."
+
+
+@pytest.mark.asyncio
+async def test_export_products_csv(client: AsyncClient, products_template):
+    """
+    Test streaming the whole catalog as CSV with selected columns.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/export/products/?format=csv&columns=name,test3")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert response.headers["content-type"].startswith("text/csv")
+
+    lines = response.text.splitlines()
+    assert lines[0] == "name,test3", f"Unexpected header: {lines[0]}"
+    assert lines[1] == 'Product1,"[""test_value""]"', f"Unexpected row: {lines[1]}"
+    assert len(lines) == 4, f"Expected header and 3 rows, got {len(lines)} lines"
+
+
+@pytest.mark.asyncio
+async def test_export_csv_nested_columns(client: AsyncClient):
+    """
+    Test that dotted CSV columns are read from nested documents and arrays.
+    """
+    product = {
+        "name": "Nested",
+        "price": 10,
+        "specs": {"weight": 2.5},
+        "variants": [{"color": "red"}, {"size": "L"}, {"color": "blue"}],
+    }
+    await client.post("/products/", json={"products": [product]})
+
+    response = await client.get(
+        "/export/products/?format=csv&columns=name,specs.weight,variants.color"
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    lines = response.text.splitlines()
+    assert lines[0] == "name,specs.weight,variants.color", f"Got {lines[0]}"
+    assert lines[1] == 'Nested,2.5,"[""red"",""blue""]"', f"Got {lines[1]}"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("columns", ["$where", "test3,test3.a", "name,.x"])
+async def test_export_rejects_invalid_columns(
+    client: AsyncClient, products_template, columns
+):
+    """
+    Test that columns are validated like `fields` before the export starts.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    for export_format in ("ndjson", "csv"):
+        response = await client.get(
+            f"/export/products/?format={export_format}&columns={columns}"
+        )
+        assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_export_filtered_products(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test streaming the products matching a saved filter.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/export/search/Filter1/?columns=name")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == [
+        {"name": "Product1"},
+        {"name": "Product2"},
+    ], f"Unexpected export rows: {rows}"
+
+    response = await client.get("/export/search/NonExistentFilter/")
+    assert response.status_code == 404, f"Expected 404, got {response.status_code}"
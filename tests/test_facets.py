@@ -0,0 +1,112 @@
+import pytest
+from httpx import AsyncClient
+
+
+FACETS = {
+    "facets": [
+        {
+            "name": "test1",
+            "field": "test1",
+            "type": "bucket",
+            "boundaries": [0, 100, 200],
+            "default": "200+",
+        },
+        {"name": "test3", "field": "test3", "type": "terms"},
+    ]
+}
+
+
+@pytest.mark.asyncio
+async def test_facets_for_filter(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test computing bucket and term facets for the products matching a filter.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.post("/facets/Filter1/", json=FACETS)
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    data = response.json()
+    assert data["total_items"] == 2, f"Expected 2 products, got {data['total_items']}"
+    assert data["facets"]["test1"] == [
+        {"key": 100, "count": 1},
+        {"key": "200+", "count": 1},
+    ], f"Unexpected buckets: {data['facets']['test1']}"
+    assert data["facets"]["test3"] == [
+        {"key": "test_value", "count": 2},
+        {"key": "value", "count": 1},
+    ], f"Unexpected terms: {data['facets']['test3']}"
+
+
+@pytest.mark.asyncio
+async def test_facets_cache_invalidated_by_product_writes(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test that cached facets are recomputed after products change.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    create_res = await client.post("/products/", json={"products": products_template})
+
+    await client.post("/facets/Filter1/", json=FACETS)
+    await client.delete(f"/products/{create_res.json()[0]['id']}/")
+
+    response = await client.post("/facets/Filter1/", json=FACETS)
+    assert response.json()["total_items"] == 1, "Expected facets to be recomputed."
+
+
+@pytest.mark.asyncio
+async def test_facets_cache_after_filter_recreated(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test that a filter deleted and created again under the same name does
+    not get the old filter's cached facets.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+    response = await client.post("/facets/Filter1/", json=FACETS)
+    assert response.json()["total_items"] == 2, "Expected 2 products"
+
+    await client.delete("/filters/Filter1/")
+    recreated = {
+        "name": "Filter1",
+        "conditions": [
+            {"conditions": [{"field": "test1", "operator": ">", "value": 200}]}
+        ],
+    }
+    await client.post("/filters/", json=recreated)
+
+    data = (await client.post("/facets/Filter1/", json=FACETS)).json()
+    assert data["total_items"] == 1, f"Stale facets: {data}"
+    assert data["facets"]["test1"] == [{"key": "200+", "count": 1}], data
+
+
+@pytest.mark.asyncio
+async def test_facets_invalid_boundaries(client: AsyncClient, filter_one_template):
+    """
+    Test rejecting bucket facets with unordered boundaries.
+    """
+    await client.post("/filters/", json=filter_one_template)
+
+    spec = {"name": "p", "field": "price", "type": "bucket", "boundaries": [10, 5]}
+    response = await client.post("/facets/Filter1/", json={"facets": [spec]})
+    assert response.status_code == 422, f"Expected 422, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("field", ["$price", "$$ROOT", "test3.", "a..b", ".a"])
+async def test_facets_invalid_field(
+    client: AsyncClient, filter_one_template, field
+):
+    """
+    Test rejecting facet fields that are not plain document paths.
+    """
+    await client.post("/filters/", json=filter_one_template)
+
+    spec = {"name": "f", "field": field, "type": "terms"}
+    response = await client.post("/facets/Filter1/", json={"facets": [spec]})
+    assert response.status_code == 422, f"Expected 422, got {response.status_code}"
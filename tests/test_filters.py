@@ -1,5 +1,6 @@
 import pytest
 from httpx import AsyncClient
+from models.filters import Filter
 
 
 @pytest.mark.asyncio
@@ -167,3 +168,202 @@ async def test_create_filter_with_default_operator(client: AsyncClient):
     assert (
         res_data["conditions"][0]["conditions"][0]["field"] == "test1"
     ), "Field mismatch."
+
+
+@pytest.mark.asyncio
+async def test_get_filter_conditional_request(client: AsyncClient, filter_one_template):
+    """
+    Test ETag revalidation of a single filter.
+    """
+    await client.post("/filters/", json=filter_one_template)
+
+    response = await client.get("/filters/Filter1/")
+    etag = response.headers["etag"]
+
+    response = await client.get("/filters/Filter1/", headers={"If-None-Match": etag})
+    assert response.status_code == 304, f"Expected 304, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "conditions",
+    [
+        [{"field": "name", "operator": "regex", "value": "(a+)+$"}],
+        [{"field": "name", "operator": "regex", "value": "((a+))+"}],
+        [{"field": "name", "operator": "regex", "value": "(a|aa)+"}],
+        [{"field": "name", "operator": "regex", "value": "(.*a){20}"}],
+        [{"field": "name", "operator": "regex", "value": r"(\w+\s?)+$"}],
+        [
+            {
+                "field": "name",
+                "operator": "regex",
+                "value": "^(([a-z])+.)+[A-Z]([a-z])+$",
+            }
+        ],
+        [{"field": "name", "operator": "regex", "value": "(unclosed"}],
+        [{"field": "name", "operator": "prefix", "value": ""}],
+        [{"field": "features", "operator": "text", "value": "wireless"}],
+        [
+            {"field": "name", "operator": "text", "value": "wireless"},
+            {"field": "price", "operator": ">", "value": 10},
+        ],
+    ],
+)
+async def test_filter_validation_rejects_unsafe_conditions(
+    client: AsyncClient, conditions
+):
+    """
+    Test that catastrophic regexes, empty prefixes and misplaced text
+    conditions are rejected.
+    """
+    response = await client.post(
+        "/filters/",
+        json={
+            "name": "Unsafe",
+            "conditions": [{"logical_operator": "OR", "conditions": conditions}],
+        },
+    )
+    assert response.status_code == 422, f"Expected 422, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_update_filter_rejects_text_under_or(client: AsyncClient):
+    """
+    Test that an update cannot move a text condition under a top-level OR.
+    """
+    await client.post(
+        "/filters/",
+        json={
+            "name": "Text",
+            "conditions": [
+                {"conditions": [{"field": "name", "operator": "text", "value": "a"}]},
+                {"conditions": [{"field": "price", "operator": ">", "value": 1}]},
+            ],
+        },
+    )
+
+    response = await client.patch("/filters/Text/", json={"logical_operator": "OR"})
+    assert response.status_code == 422, f"Expected 422, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_update_filter_with_if_match(client: AsyncClient, filter_one_template):
+    """
+    Test optimistic concurrency on filter PATCH with `If-Match` and `revision`.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    etag = (await client.get("/filters/Filter1/")).headers["etag"]
+
+    response = await client.patch(
+        "/filters/Filter1/",
+        json={"logical_operator": "AND"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert response.json()["revision"] == 1, "Expected the revision to be bumped."
+
+    response = await client.patch(
+        "/filters/Filter1/", json={"name": "Stale"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412, f"Expected 412, got {response.status_code}"
+
+    response = await client.patch(
+        "/filters/Filter1/", json={"name": "Renamed", "revision": 0}
+    )
+    assert response.status_code == 412, f"Expected 412, got {response.status_code}"
+
+    response = await client.patch(
+        "/filters/Filter1/", json={"name": "Renamed", "revision": 1}
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    data = (await client.get("/filters/Renamed/")).json()
+    assert data["logical_operator"] == "AND" and data["revision"] == 2, data
+
+    response = await client.patch("/filters/Missing/", json={"name": "Other"})
+    assert response.status_code == 404, f"Expected 404, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        r"(-[a-z]+)*$",
+        r"(\d{3})+",
+        r"([a-z]+,)*x",
+        r"(foo|far)+",
+        r"(a+)?b",
+        r"^\d{16}$",
+    ],
+)
+async def test_filter_validation_accepts_linear_regexes(
+    client: AsyncClient, pattern
+):
+    """
+    Test that repeated groups that cannot backtrack exponentially are accepted.
+    """
+    response = await client.post(
+        "/filters/",
+        json={
+            "name": "Linear",
+            "conditions": [
+                {"conditions": [{"field": "name", "operator": "regex", "value": pattern}]}
+            ],
+        },
+    )
+    assert response.status_code == 201, f"Expected 201, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_stored_filters_skip_input_guards(
+    client: AsyncClient, filter_one_template
+):
+    """
+    Test that a filter saved before the regex guards stays readable and
+    searchable.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await Filter.get_pymongo_collection().insert_one(
+        {
+            "name": "Legacy",
+            "logical_operator": "AND",
+            "conditions": [
+                {
+                    "logical_operator": "AND",
+                    "conditions": [
+                        {"field": "name", "operator": "regex", "value": "(a+)+b"}
+                    ],
+                }
+            ],
+        }
+    )
+
+    response = await client.get("/filters/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert len(response.json()) == 2, "Expected both filters to be listed."
+    response = await client.get("/filters/Legacy/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    response = await client.get("/search/Legacy/")
+    assert response.status_code == 404, f"Expected no products, got {response.status_code}"
+
+    response = await client.patch("/filters/Legacy/", json={"logical_operator": "OR"})
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "update", [{"name": None}, {"logical_operator": None}, {"conditions": None}]
+)
+async def test_update_filter_rejects_null_fields(
+    client: AsyncClient, filter_one_template, update
+):
+    """
+    Test that PATCH cannot null out a required field of the stored filter.
+    """
+    await client.post("/filters/", json=filter_one_template)
+
+    response = await client.patch("/filters/Filter1/", json=update)
+    assert response.status_code == 422, f"Expected 422, got {response.status_code}"
+
+    response = await client.get("/filters/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert response.json()[0]["name"] == "Filter1", "Expected the filter unchanged."
@@ -0,0 +1,204 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from httpx import AsyncClient
+from pymongo.errors import OperationFailure
+
+import invalidation
+from cache import compiled_filter_cache, count_cache, product_cache
+from invalidation import (
+    ChangeEvent,
+    ChangeStreamSource,
+    InvalidationBus,
+    InvalidationWatcher,
+    LocalChangeSource,
+    MongoResumeTokenStore,
+    PollingSource,
+    ProductInvalidator,
+    bus,
+    change_to_event,
+)
+from models.products import Product
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "Timed out waiting."
+        await asyncio.sleep(0.01)
+
+
+class StandaloneCollection:
+    """
+    Collection wrapper answering `watch` like a standalone mongod.
+    """
+
+    def __init__(self, collection) -> None:
+        self.collection = collection
+        self.name = collection.name
+        self.database = collection.database
+
+    def find(self, *args, **kwargs):
+        return self.collection.find(*args, **kwargs)
+
+    async def watch(self, **kwargs):
+        raise OperationFailure(
+            "The $changeStream stage is only supported on replica sets", code=40573
+        )
+
+
+def test_change_to_event():
+    """
+    Test that document changes keep their `_id` and others are collection-wide.
+    """
+    document_id = ObjectId()
+    event = change_to_event(
+        "products", {"operationType": "update", "documentKey": {"_id": document_id}}
+    )
+    assert event == ChangeEvent("products", "update", document_id), f"Got {event}"
+
+    event = change_to_event("products", {"operationType": "drop"})
+    assert event.document_id is None, "Expected a collection-wide event for drop."
+
+
+@pytest.mark.asyncio
+async def test_bus_isolates_failing_subscribers():
+    """
+    Test that one failing subscriber does not stop the others.
+    """
+    local_bus = InvalidationBus()
+    received = []
+
+    async def failing(event):
+        raise RuntimeError("boom")
+
+    async def recording(event):
+        received.append(event)
+
+    local_bus.subscribe("products", failing)
+    local_bus.subscribe("products", recording)
+    await local_bus.publish(ChangeEvent("products", "insert", 1))
+    await local_bus.publish(ChangeEvent("filters", "insert", 2))
+
+    assert received == [ChangeEvent("products", "insert", 1)], f"Got {received}"
+
+
+@pytest.mark.asyncio
+async def test_local_events_invalidate_caches(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test that product and filter events drop the cached product, counts and
+    compiled filters.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    response = await client.post("/products/", json={"products": products_template})
+    product_id = response.json()[0]["id"]
+
+    await client.get(f"/products/{product_id}/")
+    await client.get("/search/Filter1/?count=cached")
+    assert await product_cache.backend.get(product_id), "Expected a cached product."
+    assert len(count_cache) and len(compiled_filter_cache), "Expected cached entries."
+
+    source = LocalChangeSource()
+    watcher = InvalidationWatcher(bus, [source])
+    watcher.start()
+    try:
+        published = bus.published
+        source.emit(ChangeEvent("products", "update", ObjectId(product_id)))
+        source.emit(ChangeEvent("filters", "delete", ObjectId()))
+        await wait_for(lambda: bus.published == published + 2)
+        await wait_for(lambda: not len(count_cache))
+    finally:
+        await watcher.stop()
+
+    assert await product_cache.backend.get(product_id) is None, "Product not dropped."
+    assert not len(count_cache), "Expected counts to be cleared."
+    assert not len(compiled_filter_cache), "Expected compiled filters to be cleared."
+
+
+@pytest.mark.asyncio
+async def test_product_events_are_debounced(monkeypatch):
+    """
+    Test that a burst of product events causes one invalidation, and that a
+    collection-wide event in the burst clears everything.
+    """
+    calls = []
+
+    async def record(product_ids=None):
+        calls.append(product_ids)
+
+    monkeypatch.setattr(invalidation, "invalidate_product_caches", record)
+    invalidator = ProductInvalidator(delay=0.01)
+
+    for document_id in (1, 2, 2):
+        await invalidator(ChangeEvent("products", "update", document_id))
+    await wait_for(lambda: calls)
+    assert calls == [{1, 2}], f"Expected one batched invalidation, got {calls}"
+
+    await invalidator(ChangeEvent("products", "update", 3))
+    await invalidator(ChangeEvent("products", "poll"))
+    await wait_for(lambda: len(calls) == 2)
+    assert calls[1] is None, f"Expected a full invalidation, got {calls[1]}"
+
+
+@pytest.mark.asyncio
+async def test_watcher_falls_back_to_polling(client: AsyncClient):
+    """
+    Test that without change streams the watcher polls and reports writes
+    made directly to the collection.
+    """
+    collection = Product.get_pymongo_collection()
+    tokens = MongoResumeTokenStore(collection.database["change_stream_tokens"])
+    local_bus = InvalidationBus()
+    received = []
+
+    async def recording(event):
+        received.append(event)
+
+    local_bus.subscribe("products", recording)
+    watcher = InvalidationWatcher(
+        local_bus,
+        [ChangeStreamSource(StandaloneCollection(collection), tokens)],
+        poll_seconds=0.01,
+    )
+    watcher.start()
+    try:
+        await asyncio.sleep(0.05)
+        await collection.insert_one({"name": "Direct", "price": 1})
+        await wait_for(lambda: received)
+    finally:
+        await watcher.stop()
+
+    assert received[0] == ChangeEvent("products", "poll"), f"Got {received}"
+
+
+@pytest.mark.asyncio
+async def test_polling_source_detects_updates(client: AsyncClient):
+    """
+    Test that the polling fingerprint changes on updates, not only inserts.
+    """
+    collection = Product.get_pymongo_collection()
+    await collection.insert_one({"name": "Polled", "price": 1, "stock": 1})
+    source = PollingSource(collection, interval=0.01)
+
+    before = await source.fingerprint()
+    assert before == await source.fingerprint(), "Expected a stable fingerprint."
+    await collection.update_one({"name": "Polled"}, {"$set": {"stock": 2}})
+    assert before != await source.fingerprint(), "Expected the update to show."
+
+
+@pytest.mark.asyncio
+async def test_resume_tokens_are_persisted(client: AsyncClient):
+    """
+    Test that resume tokens survive in MongoDB.
+    """
+    collection = Product.get_pymongo_collection().database["change_stream_tokens"]
+    token = {"_data": "8263A1"}
+
+    await MongoResumeTokenStore(collection).save("products", token)
+    loaded = await MongoResumeTokenStore(collection).load("products")
+
+    assert loaded == token, f"Expected the saved token, got {loaded}"
+    assert await MongoResumeTokenStore(collection).load("filters") is None
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+
+from metrics import RequestStats, command_metrics, current_request
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client: AsyncClient, products_template):
+    """
+    Test that requests are recorded per route template and exposed in the
+    Prometheus text format, with a `Server-Timing` header on each response.
+    """
+    create_res = await client.post("/products/", json={"products": products_template})
+    product_id = create_res.json()[0]["id"]
+
+    response = await client.get(f"/products/{product_id}/")
+    assert response.headers["server-timing"].startswith(
+        "db;dur="
+    ), f"Unexpected Server-Timing: {response.headers.get('server-timing')}"
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    body = response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/products/{product_id}/",status="200"} 1' in body
+    ), "Expected the product read under its route template."
+    assert product_id not in body, "Raw paths must not be used as labels."
+    assert 'http_response_bytes_total{method="POST",route="/products/"}' in body
+
+
+def test_command_listener_attributes_to_current_request():
+    """
+    Test that command events are added to the request in context only.
+    """
+    event = SimpleNamespace(
+        duration_micros=1500,
+        reply={"cursor": {"firstBatch": [{}, {}, {}]}, "ok": 1},
+    )
+    command_metrics.succeeded(event)
+
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        command_metrics.succeeded(event)
+    finally:
+        current_request.reset(token)
+
+    assert stats.db_commands == 1, f"Expected 1 command, got {stats.db_commands}"
+    assert stats.documents == 3, f"Expected 3 documents, got {stats.documents}"
+    assert stats.db_seconds == pytest.approx(0.0015), "Unexpected database time."
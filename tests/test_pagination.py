@@ -0,0 +1,98 @@
+import base64
+from decimal import Decimal
+
+import pytest
+from bson import Decimal128, ObjectId, json_util
+
+from pagination import decode_cursor, encode_cursor, keyset_query, parse_sort
+
+
+def test_parse_sort_adds_tie_breaker():
+    """
+    Test that non-unique sort keys get an `_id` tie-breaker.
+    """
+    assert parse_sort("-price") == [("price", -1), ("_id", -1)]
+    assert parse_sort("price,name") == [("price", 1), ("name", 1)]
+    assert parse_sort("name") == [("name", 1)]
+
+
+def test_keyset_query_seeks_past_position():
+    """
+    Test the seek condition built for a compound sort and its cursor.
+    """
+    last_id = ObjectId()
+    spec = parse_sort("price")
+    token = encode_cursor([Decimal("10.50"), last_id], "price")
+    after = decode_cursor(token, "price")
+
+    query = keyset_query({"stock": 1}, spec, after)
+    price = Decimal128("10.50")
+    assert query == {
+        "$and": [
+            {"stock": 1},
+            {
+                "price": {"$gte": price},
+                "$or": [
+                    {"price": {"$gt": price}},
+                    {"price": price, "_id": {"$gt": last_id}},
+                ],
+            },
+        ]
+    }, f"Unexpected query: {query}"
+
+
+def test_keyset_query_descending_keeps_nulls():
+    """
+    Test the descending seek condition, which must also reach null values,
+    and seeking past a null.
+    """
+    last_id = ObjectId()
+    price = Decimal128("10.50")
+
+    query = keyset_query({}, parse_sort("-price"), [price, last_id])
+    assert query == {
+        "price": {"$not": {"$gt": price}},
+        "$or": [
+            {"price": {"$not": {"$gte": price}}},
+            {"price": price, "_id": {"$not": {"$gte": last_id}}},
+        ],
+    }, f"Unexpected query: {query}"
+
+    # Unindexed keys (`SORT_ALLOW_UNINDEXED`) may be missing on some products.
+    query = keyset_query({}, [("stock", -1), ("_id", -1)], [None, last_id])
+    assert query == {
+        "stock": None,
+        "_id": {"$not": {"$gte": last_id}},
+    }, f"Unexpected query: {query}"
+
+    query = keyset_query({}, [("stock", 1), ("_id", 1)], [None, last_id])
+    assert query == {
+        "$or": [
+            {"stock": {"$ne": None}},
+            {"stock": None, "_id": {"$gt": last_id}},
+        ],
+    }, f"Unexpected query: {query}"
+
+
+@pytest.mark.parametrize(
+    "after",
+    [
+        [{"$ne": None}, ObjectId()],
+        [{"$regex": ".*"}, ObjectId()],
+        [["a"], ObjectId()],
+        ["10.50", ObjectId()],
+        [True, ObjectId()],
+        [Decimal128("1"), "not-an-id"],
+    ],
+)
+def test_keyset_query_rejects_crafted_positions(after):
+    """
+    Test that cursor values which are not plain values of the sort key's
+    type are refused rather than used as query operators.
+    """
+    token = base64.urlsafe_b64encode(
+        json_util.dumps({"after": after, "sort": "price"}).encode()
+    ).decode()
+    decoded = decode_cursor(token, "price")
+    with pytest.raises(ValueError):
+        keyset_query({}, parse_sort("price"), decoded)
@@ -1,6 +1,12 @@
+import json
+
 import pytest
+from bson import ObjectId
 from httpx import AsyncClient
 
+from models.products import Product
+from settings import settings
+
 
 @pytest.mark.asyncio
 async def test_create_product(client: AsyncClient, products_template):
@@ -138,6 +144,23 @@ async def test_update_product_wrong_type(client: AsyncClient, products_template)
     assert response.status_code == 400, f"Expected 400, got {response.status_code}"
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "payload", [{"$where": 1}, {"test3.0": "x"}, {"_id": "abc"}, {"": 1}]
+)
+async def test_update_product_rejects_invalid_field_names(
+    client: AsyncClient, products_template, payload
+):
+    """
+    Test that operator, dotted and `_id` keys are rejected before the write.
+    """
+    create_res = await client.post("/products/", json={"products": products_template})
+    product_id = create_res.json()[0]["id"]
+
+    response = await client.patch(f"/products/{product_id}/", json=payload)
+    assert response.status_code == 422, f"Expected 422, got {response.status_code}"
+
+
 @pytest.mark.asyncio
 async def test_create_products_with_duplicate_names_in_request(client: AsyncClient):
     """
@@ -153,3 +176,600 @@ async def test_create_products_with_duplicate_names_in_request(client: AsyncClie
         },
     )
     assert response.status_code == 422, f"Expected 422, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_with_cursor(client: AsyncClient, products_template):
+    """
+    Test the `/products/` endpoint for walking all products with keyset cursors.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/products/?cursor=&per_page=2")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    data = response.json()
+    assert (
+        len(data["products"]) == 2
+    ), f"Expected 2 products, got {len(data['products'])}"
+    assert data["total_items"] is None, "Cursor mode should not count products."
+    assert data["prev_page"] is None, "Cursor mode should not return prev_page."
+    assert data["next_page"].startswith(
+        "/products/?cursor="
+    ), f"Unexpected next_page: {data['next_page']}"
+
+    response = await client.get(data["next_page"])
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    next_data = response.json()
+    names = [p["name"] for p in data["products"] + next_data["products"]]
+    assert names == [
+        "Product1",
+        "Product2",
+        "Product3",
+    ], f"Expected all products once in insertion order, got {names}"
+    assert next_data["next_page"] is None, "Last page should not have next_page."
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_invalid_cursor(client: AsyncClient, products_template):
+    """
+    Test the `/products/` endpoint for rejecting a malformed cursor.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/products/?cursor=not-a-cursor")
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count", ["estimated", "cached"])
+async def test_get_all_products_with_count_strategy(
+    client: AsyncClient, products_template, count
+):
+    """
+    Test the `/products/` endpoint with approximate count strategies.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get(f"/products/?per_page=2&count={count}")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    data = response.json()
+    assert data["total_items"] == 3, f"Expected 3 items, got {data['total_items']}"
+    assert data["total_pages"] == 2, f"Expected 2 pages, got {data['total_pages']}"
+    assert (
+        data["next_page"] == f"/products/?page=2&per_page=2&count={count}"
+    ), f"Unexpected next_page: {data['next_page']}"
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_without_count(client: AsyncClient, products_template):
+    """
+    Test the `/products/` endpoint with counting disabled.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/products/?per_page=2&count=none")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    data = response.json()
+    assert data["total_items"] is None, "Expected no total_items."
+    assert data["total_pages"] is None, "Expected no total_pages."
+    assert len(data["products"]) == 2, "Expected a full page of products."
+    assert (
+        data["next_page"] == "/products/?page=2&per_page=2&count=none"
+    ), f"Unexpected next_page: {data['next_page']}"
+
+    response = await client.get(data["next_page"])
+    data = response.json()
+    assert len(data["products"]) == 1, "Expected the last product on page 2."
+    assert data["next_page"] is None, "Last page should not have next_page."
+
+
+@pytest.mark.asyncio
+async def test_import_products_ignores_server_fields(
+    client: AsyncClient, monkeypatch
+):
+    """
+    Test that `_id`, `id` and `revision` in import rows are not written, so
+    an export can be imported again without a string `_id` or an `id` field.
+    """
+    written = []
+
+    class Result:
+        bulk_api_result = {"nUpserted": 2}
+
+    async def bulk_write(operations, ordered=True):
+        written.extend(operation._doc["$set"] for operation in operations)
+        return Result()
+
+    collection = Product.get_pymongo_collection()
+    monkeypatch.setattr(collection, "bulk_write", bulk_write)
+    body = "\n".join(
+        [
+            '{"_id": "abc", "name": "Imported", "price": 10}',
+            '{"id": "68d9a9f2c2a4e1b5d0f3a111", "name": "Exported", "price": 5,'
+            ' "revision": 7}',
+        ]
+    )
+    response = await client.post(
+        "/products/import/",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.json()["inserted"] == 2, f"Got {response.json()}"
+    assert [sorted(document) for document in written] == [
+        ["name", "price"],
+        ["name", "price"],
+    ], f"Unexpected documents: {written}"
+
+
+@pytest.mark.asyncio
+async def test_import_products_reports_invalid_rows(client: AsyncClient):
+    """
+    Test the `/products/import/` endpoint for reporting invalid rows by line.
+    """
+    body = "\n".join(
+        [
+            '{"name": "", "price": 10}',
+            "",
+            '{"name": "Broken", "price": -1}',
+            "not json",
+        ]
+    )
+    response = await client.post(
+        "/products/import/",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    report = response.json()
+    assert report["received"] == 3, f"Expected 3 rows, got {report['received']}"
+    assert report["failed"] == 3, f"Expected 3 failures, got {report['failed']}"
+    assert [error["line"] for error in report["errors"]] == [
+        1,
+        3,
+        4,
+    ], f"Unexpected error lines: {report['errors']}"
+    assert "name" in report["errors"][0]["error"], "Error should name the field."
+
+
+@pytest.mark.asyncio
+async def test_get_product_cached_and_invalidated(
+    client: AsyncClient, products_template
+):
+    """
+    Test that product reads are cached and product updates invalidate the cache.
+    """
+    create_res = await client.post("/products/", json={"products": products_template})
+    product_id = create_res.json()[0]["id"]
+
+    async def product_cache_stats():
+        response = await client.get("/admin/cache/")
+        return next(c for c in response.json() if c["name"] == "products")
+
+    before = await product_cache_stats()
+    await client.get(f"/products/{product_id}/")
+    await client.get(f"/products/{product_id}/")
+    after = await product_cache_stats()
+
+    assert after["misses"] - before["misses"] == 1, "First read should miss."
+    assert after["hits"] - before["hits"] == 1, "Second read should hit the cache."
+
+    await client.patch(f"/products/{product_id}/", json={"price": 250})
+
+    response = await client.get(f"/products/{product_id}/")
+    assert response.json()["price"] == 250, "Update must invalidate the cache."
+
+
+@pytest.mark.asyncio
+async def test_get_product_conditional_request(client: AsyncClient, products_template):
+    """
+    Test the `/products/{product_id}/` endpoint for ETag revalidation.
+    """
+    create_res = await client.post("/products/", json={"products": products_template})
+    product_id = create_res.json()[0]["id"]
+
+    response = await client.get(f"/products/{product_id}/")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache", "Unexpected Cache-Control"
+
+    response = await client.get(
+        f"/products/{product_id}/", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304, f"Expected 304, got {response.status_code}"
+    assert response.content == b"", "304 responses must not have a body."
+
+    await client.patch(f"/products/{product_id}/", json={"price": 300})
+
+    response = await client.get(
+        f"/products/{product_id}/", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert response.headers["etag"] != etag, "ETag must change with the content."
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_conditional_request(
+    client: AsyncClient, products_template
+):
+    """
+    Test the `/products/` endpoint for ETag revalidation.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/products/")
+    etag = response.headers["etag"]
+
+    response = await client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == 304, f"Expected 304, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_with_fields(client: AsyncClient, products_template):
+    """
+    Test the `/products/` endpoint for returning only the requested fields.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/products/?per_page=2&fields=test3")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    data = response.json()
+    for product in data["products"]:
+        assert set(product) <= {
+            "id",
+            "name",
+            "price",
+            "test3",
+        }, f"Unexpected fields returned: {sorted(product)}"
+    assert (
+        "fields=test3" in data["next_page"]
+    ), f"next_page should keep fields, got {data['next_page']}"
+
+    response = await client.get(data["next_page"])
+    product = response.json()["products"][0]
+    assert product["test3"] == ["value"], f"Expected test3 ['value'], got {product}"
+    assert product["price"] == 60, f"Expected price 60, got {product['price']}"
+
+    response = await client.get("/products/?cursor=&per_page=2&fields=test3")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert "fields=test3" in response.json()["next_page"], "Cursor links keep fields."
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "fields", ["$where", "test3.$", "test3.", "test3,test3.a", "price.amount"]
+)
+async def test_get_all_products_invalid_fields(
+    client: AsyncClient, products_template, fields
+):
+    """
+    Test the `/products/` endpoint for rejecting operator field names and
+    fields overlapping each other or the always-returned ones.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get(f"/products/?fields={fields}")
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_product_price_serialized_exactly(client: AsyncClient):
+    """
+    Test that decimal prices are written as exact JSON numbers.
+    """
+    create_res = await client.post(
+        "/products/", json={"products": [{"name": "Exact", "price": "10.50"}]}
+    )
+    assert b'"price":10.50' in create_res.content, create_res.text
+
+    product_id = create_res.json()[0]["id"]
+    for url in (f"/products/{product_id}/", "/products/"):
+        response = await client.get(url)
+        assert b'"price":10.50' in response.content, response.text
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_sorted_with_cursor(
+    client: AsyncClient, products_template
+):
+    """
+    Test sorted keyset pagination on an indexed key.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/products/?cursor=&per_page=2&sort=-name")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    data = response.json()
+    assert "sort=-name" in data["next_page"], f"Unexpected link: {data['next_page']}"
+
+    next_data = (await client.get(data["next_page"])).json()
+    names = [p["name"] for p in data["products"] + next_data["products"]]
+    assert names == [
+        "Product3",
+        "Product2",
+        "Product1",
+    ], f"Expected descending names, got {names}"
+
+    cursor = data["next_page"].split("cursor=")[1].split("&")[0]
+    response = await client.get(f"/products/?cursor={cursor}&sort=name")
+    assert response.status_code == 400, "A cursor must not be reused for another sort."
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_rejects_unindexed_sort(
+    client: AsyncClient, products_template
+):
+    """
+    Test that sorting on a key without a matching index is refused.
+    """
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/products/?sort=test1")
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+    assert "index" in response.json()["detail"], response.json()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sort", ["test1", "-test1"])
+async def test_get_all_products_sorted_on_sparse_key(
+    client: AsyncClient, products_template, monkeypatch, sort
+):
+    """
+    Test that keyset pagination on a key some products lack returns every
+    product exactly once, in either direction.
+    """
+    monkeypatch.setattr(settings, "SORT_ALLOW_UNINDEXED", True)
+    products_template[1].pop("test1")
+    products_template.append({"name": "Product4", "price": 5})
+    await client.post("/products/", json={"products": products_template})
+
+    names = []
+    url = f"/products/?cursor=&per_page=1&sort={sort}"
+    while url:
+        data = (await client.get(url)).json()
+        names += [p["name"] for p in data["products"]]
+        url = data["next_page"]
+
+    assert sorted(names) == [
+        "Product1",
+        "Product2",
+        "Product3",
+        "Product4",
+    ], f"Expected each product once, got {names}"
+    present = ["Product3", "Product1"]
+    expected = present if sort == "test1" else present[::-1]
+    assert [n for n in names if n in present] == expected, f"Got {names}"
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_by_filter(
+    client: AsyncClient, filter_one_template, products_template, monkeypatch
+):
+    """
+    Test that a bulk update applies `set` and `inc` to every product
+    matching a saved filter, one batch at a time.
+    """
+    monkeypatch.setattr(settings, "BULK_BATCH_SIZE", 1)
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.post(
+        "/products/bulk/update/",
+        json={
+            "filter_name": "Filter1",
+            "set": {"price": "19.99", "on_sale": True},
+            "inc": {"test4": 1},
+        },
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    report = response.json()
+    assert report["matched"] == 2 and report["modified"] == 2, f"Got {report}"
+    assert report["batches"] == 2 and report["done"], f"Got {report}"
+
+    products = (await client.get("/products/")).json()["products"]
+    by_name = {product["name"]: product for product in products}
+    assert by_name["Product1"]["price"] == 19.99, "Expected the new price."
+    assert by_name["Product2"]["on_sale"] is True, "Expected the new field."
+    assert by_name["Product2"]["test4"] == 16, "Expected test4 to be incremented."
+    assert "on_sale" not in by_name["Product3"], "Product3 does not match Filter1."
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_skips_products_that_stop_matching(
+    client: AsyncClient, filter_one_template, products_template, monkeypatch
+):
+    """
+    Test that a product changed so it no longer matches the filter between
+    the batch read and its write is left alone.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+    collection = Product.get_pymongo_collection()
+    update_many = collection.update_many
+
+    async def concurrent_write(selector, update):
+        await collection.update_one(
+            {"name": "Product2"}, {"$set": {"test1": 0, "test3": ["value"]}}
+        )
+        return await update_many(selector, update)
+
+    monkeypatch.setattr(collection, "update_many", concurrent_write)
+    response = await client.post(
+        "/products/bulk/update/",
+        json={"filter_name": "Filter1", "set": {"on_sale": True}},
+    )
+    report = response.json()
+    assert report["matched"] == 1 and report["modified"] == 1, f"Got {report}"
+
+    product = await collection.find_one({"name": "Product2"})
+    assert "on_sale" not in product, "Product2 no longer matches Filter1."
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_dry_run(client: AsyncClient, products_template):
+    """
+    Test that a dry run counts the selection without writing.
+    """
+    created = (
+        await client.post("/products/", json={"products": products_template})
+    ).json()
+    ids = [product["id"] for product in created[:2]]
+
+    response = await client.post(
+        "/products/bulk/update/",
+        json={"ids": ids, "inc": {"test1": 5}, "dry_run": True},
+    )
+    report = response.json()
+    assert report["dry_run"] and report["matched"] == 2, f"Got {report}"
+    assert report["modified"] == 0 and report["batches"] == 0, f"Got {report}"
+
+    product = (await client.get(f"/products/{ids[0]}/")).json()
+    assert product["test1"] == 150, "A dry run must not write."
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_by_ids_with_progress(
+    client: AsyncClient, products_template, monkeypatch
+):
+    """
+    Test that a bulk delete streams one progress report per batch.
+    """
+    monkeypatch.setattr(settings, "BULK_BATCH_SIZE", 2)
+    created = (
+        await client.post("/products/", json={"products": products_template})
+    ).json()
+    await client.get(f"/products/{created[0]['id']}/")
+
+    response = await client.post(
+        "/products/bulk/delete/?progress=true",
+        json={"ids": [product["id"] for product in created]},
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert response.headers["content-type"] == "application/x-ndjson"
+    reports = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["deleted"] for r in reports] == [2, 3, 3], f"Got {reports}"
+    assert reports[-1]["done"] and not reports[0]["done"], f"Got {reports}"
+
+    response = await client.get(f"/products/{created[0]['id']}/")
+    assert response.status_code == 404, "Expected the cached product to be dropped."
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"set": {"test1": 1}},
+        {
+            "filter_name": "Filter1",
+            "ids": ["68d9a9f2c2a4e1b5d0f3a111"],
+            "set": {"a": 1},
+        },
+        {"filter_name": "Filter1"},
+        {"filter_name": "Filter1", "set": {"name": "Same"}},
+        {"filter_name": "Filter1", "set": {"$where": 1}},
+        {"filter_name": "Filter1", "set": {"a": 1}, "inc": {"a": 1}},
+        {"filter_name": "Filter1", "set": {"a": 2, "a.b": 1}},
+        {"filter_name": "Filter1", "set": {"a.b": 2}, "inc": {"a": 1}},
+        {"filter_name": "Filter1", "set": {"price.amount": 1}},
+        {"filter_name": "Filter1", "inc": {"revision.x": 1}},
+        {"filter_name": "Filter1", "set": {"price": "-1"}},
+        {"filter_name": "Filter1", "set": {"price": "0.001"}},
+        {"filter_name": "Filter1", "inc": {"price": "0.001"}},
+        {"filter_name": "Filter1", "inc": {"price": "123456789012"}},
+    ],
+)
+async def test_bulk_update_rejects_invalid_requests(client: AsyncClient, payload):
+    """
+    Test that ambiguous selections and unsafe patches are rejected.
+    """
+    response = await client.post("/products/bulk/update/", json=payload)
+    assert response.status_code == 422, f"Expected 422, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_update_product_with_if_match(client: AsyncClient, products_template):
+    """
+    Test optimistic concurrency on PATCH with `If-Match` and `revision`.
+    """
+    create_res = await client.post("/products/", json={"products": products_template})
+    product_id = create_res.json()[0]["id"]
+    etag = (await client.get(f"/products/{product_id}/")).headers["etag"]
+
+    response = await client.patch(
+        f"/products/{product_id}/", json={"test1": 1}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert response.json()["revision"] == 1, "Expected the revision to be bumped."
+    new_etag = response.headers["etag"]
+    assert new_etag == (await client.get(f"/products/{product_id}/")).headers["etag"]
+
+    response = await client.patch(
+        f"/products/{product_id}/", json={"test1": 2}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412, f"Expected 412, got {response.status_code}"
+
+    response = await client.patch(
+        f"/products/{product_id}/", json={"test1": 3, "revision": 0}
+    )
+    assert response.status_code == 412, f"Expected 412, got {response.status_code}"
+
+    response = await client.patch(
+        f"/products/{product_id}/", json={"test1": 4, "revision": 1}
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    data = (await client.get(f"/products/{product_id}/")).json()
+    assert data["test1"] == 4 and data["revision"] == 2, f"Unexpected product {data}"
+
+
+@pytest.mark.asyncio
+async def test_update_product_type_checked_atomically(
+    client: AsyncClient, products_template
+):
+    """
+    Test that a field whose type changed after it was cached is not
+    overwritten with a value of the old type, and that fields the product
+    does not have are ignored.
+    """
+    create_res = await client.post("/products/", json={"products": products_template})
+    product_id = create_res.json()[0]["id"]
+    await client.get(f"/products/{product_id}/")
+
+    await Product.get_pymongo_collection().update_one(
+        {"_id": ObjectId(product_id)}, {"$set": {"test1": "text"}}
+    )
+    response = await client.patch(f"/products/{product_id}/", json={"test1": 5})
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+    assert "str" in response.json()["detail"], "Expected the stored type."
+
+    response = await client.patch(
+        f"/products/{product_id}/", json={"test1": "new", "unknown": 1}
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    assert "unknown" not in response.json(), "Expected unknown fields to be ignored."
+
+    response = await client.patch(f"/products/{product_id}/", json={"unknown": 1})
+    assert response.status_code == 400, f"Expected 400, got {response.status_code}"
+
+    response = await client.patch(f"/products/{ObjectId()}/", json={"test1": "x"})
+    assert response.status_code == 404, f"Expected 404, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("revision", ["abc", 7])
+async def test_create_product_ignores_revision(client: AsyncClient, revision):
+    """
+    Test that a client-supplied `revision` is not stored on create.
+    """
+    response = await client.post(
+        "/products/",
+        json={"products": [{"name": "Revised", "price": 1, "revision": revision}]},
+    )
+    assert response.status_code == 201, f"Expected 201, got {response.status_code}"
+
+    stored = await Product.get_pymongo_collection().find_one({"name": "Revised"})
+    assert stored["revision"] == 0, f"Expected revision 0, got {stored['revision']}"
+
@@ -0,0 +1,104 @@
+from filter_builder import build_query
+from query_optimizer import MATCH_NOTHING, optimize_query
+from schemas.filters import FilterCreateSchema
+
+
+def test_optimize_flattens_and_merges_ranges():
+    """
+    Test that nesting is unwrapped and ranges on one field are merged.
+    """
+    query = optimize_query(
+        {
+            "$and": [
+                {
+                    "$and": [
+                        {"price": {"$gt": 10}},
+                        {"price": {"$lt": 100}},
+                        {"price": {"$gte": 20}},
+                        {"stock": {"$ne": 0}},
+                    ]
+                }
+            ]
+        }
+    )
+    assert query == {
+        "price": {"$gte": 20, "$lt": 100},
+        "stock": {"$ne": 0},
+    }, f"Unexpected query: {query}"
+
+
+def test_optimize_or_of_equalities_to_in():
+    """
+    Test that OR-ed equalities on one field collapse into `$in`.
+    """
+    query = optimize_query(
+        {
+            "$or": [
+                {"$or": [{"name": "a"}, {"name": "b"}]},
+                {"$or": [{"name": {"$in": ["c", "a"]}}, {"stock": 5}]},
+            ]
+        }
+    )
+    assert query == {
+        "$or": [{"name": {"$in": ["a", "b", "c"]}}, {"stock": 5}]
+    }, f"Unexpected query: {query}"
+
+
+def test_optimize_detects_contradictions_on_scalar_fields():
+    """
+    Test that impossible AND groups become `MATCH_NOTHING`, except on fields
+    that may hold arrays.
+    """
+    for conditions in (
+        [{"price": 1}, {"price": 2}],
+        [{"price": {"$gt": 10}}, {"price": {"$lt": 5}}],
+        [{"price": 5}, {"price": {"$gt": 5}}],
+        [{"tags": "a"}, {"tags": {"$ne": "a"}}],
+    ):
+        query = optimize_query({"$and": conditions})
+        assert query == MATCH_NOTHING, f"Expected no match for {conditions}"
+
+    query = optimize_query({"$and": [{"tags": 1}, {"tags": 2}]})
+    assert query != MATCH_NOTHING, "Arrays can hold both values."
+
+    query = optimize_query(
+        {"$or": [{"$and": [{"price": 1}, {"price": 2}]}, {"stock": 3}]}
+    )
+    assert query == {"stock": 3}, f"Impossible branch should be dropped: {query}"
+
+
+def test_build_query_is_optimized(filter_one_template):
+    """
+    Test that `build_query` returns the flattened query.
+    """
+    query = build_query(FilterCreateSchema.model_validate(filter_one_template))
+    assert query == {
+        "$or": [
+            {"test1": {"$gt": 100}, "test2": {"$gte": 10}},
+            {"test3": {"$in": ["test_value"]}, "test4": {"$lte": 20}},
+        ]
+    }, f"Unexpected query: {query}"
+
+
+def test_build_query_prefix_and_text():
+    """
+    Test that `prefix` compiles to an anchored range and `text` to `$text`.
+    """
+    filter_data = FilterCreateSchema.model_validate(
+        {
+            "name": "Names",
+            "conditions": [
+                {
+                    "conditions": [
+                        {"field": "name", "operator": "prefix", "value": "Pro"},
+                        {"field": "name", "operator": "text", "value": "phone"},
+                    ]
+                }
+            ],
+        }
+    )
+    query = build_query(filter_data)
+    assert query == {
+        "name": {"$gte": "Pro", "$lt": "Prp"},
+        "$text": {"$search": "phone"},
+    }, f"Unexpected query: {query}"
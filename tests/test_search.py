@@ -46,3 +46,244 @@ async def test_search_no_products_found(client: AsyncClient, filter_one_template
     assert response.status_code == 404, f"Expected 404, got {response.status_code}"
     detail = response.json()["detail"]
     assert "No products found" in detail, f"Unexpected error message: {detail}"
+
+
+@pytest.mark.asyncio
+async def test_search_products_with_cursor(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test searching products with keyset cursor pagination.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/search/Filter1/?cursor=&per_page=1")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    data = response.json()
+    assert data["products"][0]["name"] == "Product1", "Expected 'Product1' first"
+    assert data["next_page"].startswith(
+        "/search/Filter1?cursor="
+    ), f"Unexpected next_page: {data['next_page']}"
+
+    next_url = data["next_page"].replace("?", "/?", 1)
+    response = await client.get(next_url)
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    data = response.json()
+    assert data["products"][0]["name"] == "Product2", "Expected 'Product2' second"
+    assert data["next_page"] is None, "Last matching page should not have next_page."
+
+
+@pytest.mark.asyncio
+async def test_search_uses_compiled_filter_cache(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test that repeated searches reuse the compiled filter and report cache hits.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+
+    await client.get("/search/Filter1/")
+    await client.get("/search/Filter1/")
+
+    response = await client.get("/admin/cache/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    stats = {cache["name"]: cache for cache in response.json()}
+    compiled = stats["compiled_filters"]
+    assert compiled["size"] == 1, f"Expected 1 cached filter, got {compiled['size']}"
+    assert compiled["hits"] >= 1, f"Expected a cache hit, got {compiled['hits']}"
+
+
+@pytest.mark.asyncio
+async def test_search_after_filter_update(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test that updating a filter invalidates its compiled query.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/search/Filter1/")
+    assert len(response.json()["products"]) == 2, "Expected 2 products before update"
+
+    update_data = {
+        "conditions": [
+            {"conditions": [{"field": "test4", "operator": ">", "value": 100}]}
+        ]
+    }
+    await client.patch("/filters/Filter1/", json=update_data)
+
+    response = await client.get("/search/Filter1/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    names = [product["name"] for product in response.json()["products"]]
+    assert names == ["Product3"], f"Expected only 'Product3' after update, got {names}"
+
+
+@pytest.mark.asyncio
+async def test_search_with_cached_count(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test that cached counts are reused and refreshed after product writes.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/search/Filter1/?count=cached")
+    assert response.json()["total_items"] == 2, "Expected 2 matching products"
+
+    product_id = response.json()["products"][0]["id"]
+    await client.delete(f"/products/{product_id}/")
+
+    response = await client.get("/search/Filter1/?count=cached")
+    assert (
+        response.json()["total_items"] == 1
+    ), "Cached count should be invalidated by product deletes"
+
+
+@pytest.mark.asyncio
+async def test_search_cached_count_after_filter_recreated(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test that a filter deleted and created again under the same name does
+    not reuse the old filter's cached count.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/search/Filter1/?count=cached")
+    assert response.json()["total_items"] == 2, "Expected 2 matching products"
+
+    await client.delete("/filters/Filter1/")
+    recreated = {
+        "name": "Filter1",
+        "conditions": [
+            {"conditions": [{"field": "test1", "operator": ">", "value": 200}]}
+        ],
+    }
+    await client.post("/filters/", json=recreated)
+
+    data = (await client.get("/search/Filter1/?count=cached")).json()
+    assert len(data["products"]) == 1, f"Expected 1 product, got {data['products']}"
+    assert data["total_items"] == 1, f"Stale cached count: {data['total_items']}"
+
+
+@pytest.mark.asyncio
+async def test_batch_search(
+    client: AsyncClient, filter_one_template, filter_two_template, products_template
+):
+    """
+    Test running several filter searches in one batch request.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/filters/", json=filter_two_template)
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.post(
+        "/search/batch/",
+        json={
+            "searches": [
+                {"filter_name": "Filter1", "per_page": 1},
+                {"filter_name": "Filter2"},
+                {"filter_name": "NonExistentFilter"},
+            ]
+        },
+    )
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+
+    results = response.json()["results"]
+    assert [r["filter_name"] for r in results] == [
+        "Filter1",
+        "Filter2",
+        "NonExistentFilter",
+    ], "Results must keep the request order."
+
+    assert results[0]["status_code"] == 200, "Filter1 search should succeed."
+    assert results[0]["result"]["total_items"] == 2, "Filter1 matches 2 products."
+    assert len(results[0]["result"]["products"]) == 1, "Expected per_page=1."
+
+    assert results[1]["status_code"] == 200, "Filter2 search should succeed."
+    names = [p["name"] for p in results[1]["result"]["products"]]
+    assert names == ["Product1", "Product2"], f"Unexpected Filter2 products: {names}"
+
+    assert results[2]["status_code"] == 404, "Missing filter should report 404."
+    assert results[2]["result"] is None, "Missing filter should have no result."
+
+
+@pytest.mark.asyncio
+async def test_search_conditional_request(
+    client: AsyncClient, filter_one_template, products_template
+):
+    """
+    Test ETag revalidation of search results.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    await client.post("/products/", json={"products": products_template})
+
+    response = await client.get("/search/Filter1/")
+    etag = response.headers["etag"]
+
+    response = await client.get(
+        "/search/Filter1/", headers={"If-None-Match": f'W/{etag}, "other"'}
+    )
+    assert response.status_code == 304, f"Expected 304, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_search_contradictory_filter(client: AsyncClient, products_template):
+    """
+    Test that a filter which can never match returns 404 without results.
+    """
+    await client.post("/products/", json={"products": products_template})
+    await client.post(
+        "/filters/",
+        json={
+            "name": "Impossible",
+            "conditions": [
+                {
+                    "conditions": [
+                        {"field": "price", "operator": "==", "value": 50},
+                        {"field": "price", "operator": "==", "value": 60},
+                    ]
+                }
+            ],
+        },
+    )
+
+    response = await client.get("/search/Impossible/")
+    assert response.status_code == 404, f"Expected 404, got {response.status_code}"
+
+
+@pytest.mark.asyncio
+async def test_search_with_prefix_operator(client: AsyncClient, products_template):
+    """
+    Test that the `prefix` operator matches names by their leading characters.
+    """
+    await client.post(
+        "/products/",
+        json={"products": products_template + [{"name": "Other", "price": 1}]},
+    )
+    await client.post(
+        "/filters/",
+        json={
+            "name": "Prefix",
+            "conditions": [
+                {"conditions": [{"field": "name", "operator": "prefix", "value": "Prod"}]}
+            ],
+        },
+    )
+
+    response = await client.get("/search/Prefix/")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    names = [p["name"] for p in response.json()["products"]]
+    assert names == [
+        "Product1",
+        "Product2",
+        "Product3",
+    ], f"Expected only prefixed names, got {names}"
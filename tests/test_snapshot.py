@@ -0,0 +1,254 @@
+import pytest
+import pytest_asyncio
+from bson import Decimal128, ObjectId
+from httpx import AsyncClient
+
+from filter_builder import build_query
+from models.products import Product
+from schemas.filters import FilterCreateSchema
+from settings import settings
+from snapshot import SnapshotEngine, snapshot_engine
+
+PARITY_DOCUMENTS = [
+    {"name": "Alpha", "stock": 5, "rating": 4.5, "color": "red", "tags": ["sale", "new"]},
+    {"name": "alpine", "stock": 0, "rating": 3, "color": "Red", "tags": ["new"]},
+    {"name": "Beta", "stock": 12, "color": "blue", "tags": []},
+    {"name": "Gamma", "stock": "many", "rating": None, "tags": ["sale"]},
+    {"name": "delta", "stock": 7.5, "rating": 5, "color": "green", "tags": "sale"},
+    {"name": "Epsilon", "rating": 2.5, "color": "blue", "sizes": [38, 40, 42]},
+    {"name": "Zeta", "stock": 12, "rating": 4, "color": "red", "sizes": [36, 44]},
+    {"name": "Eta", "stock": -3, "rating": 1, "color": None, "sizes": 40},
+]
+
+
+def make_filter(logical_operator: str, *groups: tuple) -> dict:
+    return {
+        "name": "Parity",
+        "logical_operator": logical_operator,
+        "conditions": [
+            {
+                "logical_operator": group_operator,
+                "conditions": [
+                    {"field": field, "operator": operator, "value": value}
+                    for field, operator, value in conditions
+                ],
+            }
+            for group_operator, *conditions in groups
+        ],
+    }
+
+
+PARITY_FILTERS = [
+    make_filter("AND", ("AND", ("stock", ">", 5))),
+    make_filter("AND", ("AND", ("stock", ">=", 5), ("stock", "<", 12))),
+    make_filter("AND", ("AND", ("stock", "<=", 0))),
+    make_filter("AND", ("AND", ("stock", "==", 12))),
+    make_filter("AND", ("AND", ("stock", "!=", 12))),
+    make_filter("AND", ("AND", ("stock", "==", "many"))),
+    make_filter("AND", ("AND", ("stock", ">", "a"))),
+    make_filter("AND", ("AND", ("rating", ">=", 4), ("color", "==", "red"))),
+    make_filter("AND", ("AND", ("rating", "==", None))),
+    make_filter("AND", ("AND", ("rating", "!=", None))),
+    make_filter("AND", ("AND", ("color", "!=", "red"))),
+    make_filter("AND", ("AND", ("color", "include", ["red", "blue"]))),
+    make_filter("AND", ("AND", ("tags", "include", "sale"))),
+    make_filter("AND", ("AND", ("tags", "==", "new"))),
+    make_filter("AND", ("AND", ("tags", "!=", "sale"))),
+    make_filter("AND", ("AND", ("sizes", ">", 41))),
+    make_filter("AND", ("AND", ("sizes", "==", 40))),
+    make_filter("AND", ("AND", ("sizes", ">", 37), ("sizes", "<", 39))),
+    make_filter("AND", ("AND", ("name", "regex", "^al"))),
+    make_filter("AND", ("AND", ("color", "regex", "e"))),
+    make_filter("AND", ("AND", ("name", "prefix", "E"))),
+    make_filter("AND", ("AND", ("missing", "==", None))),
+    make_filter("AND", ("AND", ("missing", ">", 0))),
+    make_filter(
+        "OR",
+        ("AND", ("stock", ">", 10), ("color", "==", "red")),
+        ("OR", ("tags", "include", "new"), ("rating", "<", 2)),
+    ),
+    make_filter(
+        "AND",
+        ("OR", ("color", "==", "red"), ("color", "==", "blue")),
+        ("OR", ("stock", ">=", 12), ("sizes", "include", [36, 38])),
+    ),
+    make_filter("AND", ("AND", ("stock", ">", 10), ("stock", "<", 5))),
+]
+
+
+@pytest_asyncio.fixture
+async def seeded(client: AsyncClient):
+    """
+    Insert raw documents with mixed types, arrays and missing fields.
+    """
+    collection = Product.get_pymongo_collection()
+    await collection.insert_many(
+        [{**document, "price": 10} for document in PARITY_DOCUMENTS]
+    )
+    return collection
+
+
+def mongo_query(filter_data: dict) -> dict:
+    return build_query(FilterCreateSchema.model_validate(filter_data))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("filter_data", PARITY_FILTERS)
+async def test_snapshot_matches_mongo(seeded, filter_data):
+    """
+    Test that the snapshot selects exactly the documents MongoDB selects.
+    """
+    query = mongo_query(filter_data)
+    expected = [
+        document["_id"]
+        for document in await seeded.find(query).sort("_id", 1).to_list(None)
+    ]
+
+    engine = SnapshotEngine(refresh_seconds=60, max_staleness=60)
+    snapshot = await engine.refresh([query])
+    match = engine.match(query)
+
+    assert match is not None, f"Snapshot fell back for {query}"
+    actual = [snapshot.ids[row] for row in match.rows]
+    assert actual == expected, f"Snapshot differs from MongoDB for {query}"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_falls_back(seeded):
+    """
+    Test that stale snapshots, local writes in strict mode, `$text` and
+    anything not prepared at refresh are handed back to MongoDB.
+    """
+    now = [0.0]
+    engine = SnapshotEngine(
+        refresh_seconds=60,
+        max_staleness=10,
+        consistency="strict",
+        clock=lambda: now[0],
+    )
+    query = {"stock": {"$gt": 5}}
+    assert engine.match(query) is None, "Expected a fallback before any refresh."
+
+    await engine.refresh([query, {"tags": {"$regex": "^s", "$options": "i"}}])
+    assert engine.match(query) is not None, "Expected a fresh snapshot to be used."
+    for unprepared in (
+        {"$text": {"$search": "alpha"}},
+        {"color": "red"},
+        {"tags": {"$regex": "^n", "$options": "i"}},
+        {"tags": ["sale", "new"]},
+    ):
+        assert engine.match(unprepared) is None, f"Expected {unprepared} to fall back."
+
+    engine.mark_dirty()
+    assert engine.match(query) is None, "Expected strict mode to skip after a write."
+
+    await engine.refresh([query])
+    now[0] = 11.0
+    assert engine.match(query) is None, "Expected a stale snapshot to be skipped."
+    assert engine.stats()["fallbacks"] == 7, f"Unexpected stats {engine.stats()}"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_skips_large_collections(seeded):
+    """
+    Test that a collection above `max_documents` is not loaded at all.
+    """
+    engine = SnapshotEngine(refresh_seconds=60, max_staleness=60, max_documents=3)
+    assert await engine.refresh([{"stock": 1}]) is None, "Expected no snapshot."
+    assert engine.match({"stock": 1}) is None, "Expected a fallback."
+
+
+@pytest.mark.asyncio
+async def test_snapshot_compares_decimal_prices(client: AsyncClient):
+    """
+    Test that Decimal128 prices are compared exactly, as MongoDB does:
+    the decimal 0.10 is below the double 0.1 but equal to decimal 0.1.
+    """
+    response = await client.post(
+        "/products/",
+        json={
+            "products": [
+                {"name": "Dime", "price": "0.10"},
+                {"name": "Cheap", "price": "9.99"},
+                {"name": "Dear", "price": "120.50"},
+            ]
+        },
+    )
+    ids = {product["name"]: product["id"] for product in response.json()}
+    queries = [
+        {"price": {"$gte": 10, "$lt": 200}},
+        {"price": {"$gte": 0.1}},
+        {"price": {"$lt": 0.1}},
+        {"price": Decimal128("0.1")},
+        {"price": 0.1},
+    ]
+    engine = SnapshotEngine(refresh_seconds=60, max_staleness=60)
+    snapshot = await engine.refresh(queries)
+
+    def names(query: dict) -> list[str]:
+        rows = engine.match(query).rows
+        by_id = {value: key for key, value in ids.items()}
+        return [by_id[str(snapshot.ids[row])] for row in rows]
+
+    assert names(queries[0]) == ["Dear"], f"Got {names(queries[0])}"
+    assert names(queries[1]) == ["Cheap", "Dear"], f"Got {names(queries[1])}"
+    assert names(queries[2]) == ["Dime"], f"Got {names(queries[2])}"
+    assert names(queries[3]) == ["Dime"], f"Got {names(queries[3])}"
+    assert names(queries[4]) == [], f"Got {names(queries[4])}"
+
+
+@pytest.mark.asyncio
+async def test_search_served_from_snapshot(
+    client: AsyncClient, filter_one_template, products_template, monkeypatch
+):
+    """
+    Test that search pages and cursors from the snapshot equal the MongoDB ones.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    copies = [
+        {**product, "name": f"{product['name']} B"} for product in products_template
+    ]
+    await client.post("/products/", json={"products": products_template + copies})
+
+    urls = [
+        "/search/Filter1/?per_page=3",
+        "/search/Filter1/?per_page=3&page=2&fields=test1",
+        "/search/Filter1/?per_page=3&cursor=",
+    ]
+    expected = [(await client.get(url)).json() for url in urls]
+    cursor = expected[2]["next_page"].split("cursor=")[1].split("&")[0]
+    urls.append(f"/search/Filter1/?per_page=3&cursor={cursor}")
+    expected.append((await client.get(urls[-1])).json())
+
+    monkeypatch.setattr(settings, "SNAPSHOT_ENABLED", True)
+    await snapshot_engine.refresh()
+    hits = snapshot_engine.hits
+
+    for url, mongo_result in zip(urls, expected):
+        response = await client.get(url)
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+        assert response.json() == mongo_result, f"Snapshot result differs for {url}"
+    assert snapshot_engine.hits == hits + len(urls), "Expected snapshot hits."
+
+
+@pytest.mark.asyncio
+async def test_search_fallback_keeps_snapshot_order(
+    client: AsyncClient, filter_one_template, monkeypatch
+):
+    """
+    Test that page mode falls back to MongoDB in the snapshot's `_id` order,
+    not in natural order.
+    """
+    await client.post("/filters/", json=filter_one_template)
+    first, second = ObjectId(), ObjectId()
+    await Product.get_pymongo_collection().insert_many(
+        [
+            {"_id": second, "name": "Second", "price": 1, "test1": 150, "test2": 30},
+            {"_id": first, "name": "First", "price": 1, "test1": 150, "test2": 30},
+        ]
+    )
+    monkeypatch.setattr(settings, "SNAPSHOT_ENABLED", True)
+    snapshot_engine.request_refresh()
+
+    data = (await client.get("/search/Filter1/?per_page=1")).json()
+    assert data["products"][0]["name"] == "First", f"Got {data['products']}"